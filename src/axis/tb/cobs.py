@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: MIT
+"""
+
+Copyright (c) 2017-2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+
+def cobs_encode(block):
+    # Zero-delimited runs are located with bytes.find and copied whole; runs
+    # of 254 or more non-zero bytes are split into 0xFF blocks.  A run that
+    # ends exactly on a 0xFF block at the end of the input does not get a
+    # trailing code byte.
+    block = bytes(block)
+    mv = memoryview(block)
+    n = len(block)
+    enc = bytearray()
+
+    i = 0
+
+    while True:
+        j = block.find(0, i)
+        end = n if j < 0 else j
+        start = i
+
+        while end - i >= 254:
+            enc.append(255)
+            enc += mv[i:i+254]
+            i += 254
+
+        if j < 0:
+            if i < n or start == n:
+                enc.append(n-i+1)
+                enc += mv[i:n]
+            break
+
+        enc.append(j-i+1)
+        enc += mv[i:j]
+        i = j+1
+
+    return bytes(enc)
+
+
+def cobs_decode(block):
+    block = bytes(block)
+
+    if 0 in block:
+        return None
+
+    mv = memoryview(block)
+    n = len(block)
+    dec = bytearray()
+
+    i = 0
+
+    while i < n:
+        code = block[i]
+        j = i+code
+        if j > n:
+            return None
+        dec += mv[i+1:j]
+        if code < 255 and j < n:
+            dec.append(0)
+        i = j
+
+    return bytes(dec)
+
+
+class CobsFrameDecoder:
+    """Incremental decoder for a stream of zero-delimited COBS frames
+
+    Arbitrary-size chunks of the byte stream are passed to feed(), which
+    returns the list of frames completed by that chunk.  Each byte is
+    scanned for delimiters only once; bytes of an incomplete frame are held
+    until its delimiter arrives.  If max_len is set, a frame that grows
+    beyond max_len encoded bytes is discarded up to the next delimiter so
+    that buffering stays bounded.  Malformed and oversize frames are counted
+    in error_count and dropped; empty frames (back-to-back delimiters) are
+    ignored.
+    """
+
+    def __init__(self, max_len=None):
+        self.max_len = max_len
+
+        self.frame_count = 0
+        self.error_count = 0
+
+        self.reset()
+
+    def reset(self):
+        self._buf = bytearray()
+        self._discard = False
+
+    def decode_frame(self, block):
+        return cobs_decode(block)
+
+    def _frame(self, block, frames):
+        if self._discard:
+            self._discard = False
+            self.error_count += 1
+            return
+        if not block:
+            return
+        frame = self.decode_frame(block)
+        if frame is None:
+            self.error_count += 1
+        else:
+            self.frame_count += 1
+            frames.append(frame)
+
+    def feed(self, data):
+        data = bytes(data)
+        mv = memoryview(data)
+        frames = []
+
+        i = 0
+        n = len(data)
+
+        while i < n:
+            j = data.find(0, i)
+
+            if j < 0:
+                # no delimiter; hold the rest of the chunk
+                if not self._discard:
+                    self._buf += mv[i:]
+                    if self.max_len is not None and len(self._buf) > self.max_len:
+                        self._buf.clear()
+                        self._discard = True
+                break
+
+            if self._buf:
+                self._buf += mv[i:j]
+                if self.max_len is not None and len(self._buf) > self.max_len:
+                    self._discard = True
+                self._frame(self._buf, frames)
+                self._buf.clear()
+            else:
+                if self.max_len is not None and j-i > self.max_len:
+                    self._discard = True
+                self._frame(mv[i:j], frames)
+
+            i = j+1
+
+        return frames
@@ -0,0 +1 @@
+../../../lfsr/tb/prbs.py
\ No newline at end of file
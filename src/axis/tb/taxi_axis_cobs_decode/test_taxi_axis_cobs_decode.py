@@ -12,6 +12,7 @@ Authors:
 import itertools
 import logging
 import os
+import sys
 
 import cocotb_test.simulator
 
@@ -22,73 +23,17 @@ from cocotb.regression import TestFactory
 
 from cocotbext.axi import AxiStreamBus, AxiStreamFrame, AxiStreamSource, AxiStreamSink
 
-
-def cobs_encode(block):
-    block = bytearray(block)
-    enc = bytearray()
-
-    seg = bytearray()
-    code = 1
-
-    new_data = True
-
-    for b in block:
-        if b == 0:
-            enc.append(code)
-            enc.extend(seg)
-            code = 1
-            seg = bytearray()
-            new_data = True
-        else:
-            code += 1
-            seg.append(b)
-            new_data = True
-            if code == 255:
-                enc.append(code)
-                enc.extend(seg)
-                code = 1
-                seg = bytearray()
-                new_data = False
-
-    if new_data:
-        enc.append(code)
-        enc.extend(seg)
-
-    return bytes(enc)
-
-
-def cobs_decode(block):
-    block = bytearray(block)
-    dec = bytearray()
-
-    code = 0
-
-    i = 0
-
-    if 0 in block:
-        return None
-
-    while i < len(block):
-        code = block[i]
-        i += 1
-        if i+code-1 > len(block):
-            return None
-        dec.extend(block[i:i+code-1])
-        i += code-1
-        if code < 255 and i < len(block):
-            dec.append(0)
-
-    return bytes(dec)
-
-
-def prbs31(state=0x7fffffff):
-    while True:
-        for i in range(8):
-            if bool(state & 0x08000000) ^ bool(state & 0x40000000):
-                state = ((state & 0x3fffffff) << 1) | 1
-            else:
-                state = (state & 0x3fffffff) << 1
-        yield state & 0xff
+try:
+    from cobs import cobs_encode
+    from prbs import prbs31
+except ImportError:
+    # attempt import from current directory
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+    try:
+        from cobs import cobs_encode
+        from prbs import prbs31
+    finally:
+        del sys.path[0]
 
 
 class TB(object):
@@ -176,8 +121,7 @@ def nonzero_incrementing_payload_zero_framed(length):
 
 
 def prbs_payload(length):
-    gen = prbs31()
-    return bytearray([next(gen) for x in range(length)])
+    return bytearray(prbs31(invert=False).generate(length))
 
 
 if getattr(cocotb, 'top', None) is not None:
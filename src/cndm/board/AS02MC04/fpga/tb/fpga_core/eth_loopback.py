@@ -0,0 +1 @@
+../../lib/taxi/src/eth/tb/eth_loopback.py
\ No newline at end of file
@@ -148,12 +148,22 @@ int cndm_start_xmit(struct sk_buff *skb, struct net_device *ndev)
 		netif_tx_stop_queue(priv->tx_queue);
 	}
 
-	dma_wmb();
-	iowrite32(priv->txq_prod & 0xffff, priv->hw_addr + 0x104);
+	// defer the doorbell if the stack has more packets queued
+	if (!netdev_xmit_more() || netif_xmit_stopped(priv->tx_queue)) {
+		dma_wmb();
+		iowrite32(priv->txq_prod & 0xffff, priv->hw_addr + 0x104);
+	}
 
 	return NETDEV_TX_OK;
 
 tx_drop:
 	dev_kfree_skb_any(skb);
+
+	// flush any descriptors deferred by earlier calls
+	if (!netdev_xmit_more()) {
+		dma_wmb();
+		iowrite32(priv->txq_prod & 0xffff, priv->hw_addr + 0x104);
+	}
+
 	return NETDEV_TX_OK;
 }
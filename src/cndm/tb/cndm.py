@@ -10,233 +10,549 @@ Authors:
 
 import logging
 import struct
-from collections import deque
+import zlib
 
 from cocotb.queue import Queue
+from cocotb.triggers import Event
 
-class Port:
-    def __init__(self, driver, index, hw_regs):
-        self.driver = driver
-        self.log = driver.log
+
+# completion phase byte to entry valid flag, indexed by the wrap bit of the
+# consumer pointer; an entry is valid when its phase bit differs from the
+# wrap bit
+CPL_VALID = (
+    bytes(1 if b & 0x80 else 0 for b in range(256)),
+    bytes(0 if b & 0x80 else 1 for b in range(256)),
+)
+
+
+def cq_count_valid(mem, cons_ptr, size, limit=None):
+    # count valid completions starting at cons_ptr, scanning the phase
+    # bytes (offset 15 in each 16 byte entry) of each ring segment at once
+    index = cons_ptr & (size-1)
+    wrap = bool(cons_ptr & size)
+    limit = size if limit is None else min(limit, size)
+    count = 0
+
+    while count < limit:
+        n = min(size-index, limit-count)
+        valid = mem[index*16+15:(index+n)*16:16].translate(CPL_VALID[wrap])
+        k = valid.find(0)
+        if k >= 0:
+            return count+k
+        count += n
+        index = 0
+        wrap = not wrap
+
+    return count
+
+
+def ring_log_size(size):
+    # rings are a power of two in size, with a 4 bit log size field
+    log_size = (size).bit_length()-1
+    if size != 2**log_size or not 0 < log_size < 16:
+        raise ValueError(f"Invalid ring size {size}")
+    return log_size
+
+
+def flow_hash_steer(data, count):
+    # spread flows across queues based on the L2-L4 headers
+    return zlib.crc32(bytes(data[:54])) % count
+
+
+class PacketBuffer:
+    def __init__(self, pool, index, region, offset, size):
+        self.pool = pool
+        self.index = index
+        self.region = region
+        self.offset = offset
+        self.size = size
+        self.mem = memoryview(region.mem)[offset:offset+size]
+
+    def get_absolute_address(self, offset):
+        return self.region.get_absolute_address(self.offset+offset)
+
+    async def write(self, offset, data):
+        self.mem[offset:offset+len(data)] = data
+
+    def __getitem__(self, key):
+        return self.mem[key]
+
+
+class PacketPool:
+    """Fixed-size packet buffers carved out of large contiguous DMA regions
+
+    Buffers are allocated and freed in O(1) through a free list of slot
+    indices, with a per-slot ownership flag to catch double frees.  When
+    the pool runs out, another region of chunk_size slots is added.
+    """
+
+    def __init__(self, mem_pool, pkt_size=4096, chunk_size=1024):
+        self.mem_pool = mem_pool
+        self.pkt_size = pkt_size
+        self.chunk_size = chunk_size
+
+        self.regions = []
+        self.bufs = []
+        self.free_list = []
+        self.owned = bytearray()
+
+    def grow(self):
+        region = self.mem_pool.alloc_region(self.pkt_size*self.chunk_size)
+        self.regions.append(region)
+        base = len(self.bufs)
+        for k in range(self.chunk_size):
+            self.bufs.append(PacketBuffer(self, base+k, region, k*self.pkt_size, self.pkt_size))
+        self.free_list.extend(range(base+self.chunk_size-1, base-1, -1))
+        self.owned.extend(bytes(self.chunk_size))
+
+    def alloc(self):
+        if not self.free_list:
+            self.grow()
+        index = self.free_list.pop()
+        self.owned[index] = 1
+        return self.bufs[index]
+
+    def free(self, buf):
+        assert buf.pool is self
+        assert self.owned[buf.index], "buffer already free"
+        self.owned[buf.index] = 0
+        self.free_list.append(buf.index)
+
+    def count_free(self):
+        return len(self.free_list)
+
+    def count_used(self):
+        return len(self.bufs) - len(self.free_list)
+
+
+class RxPacket:
+    """Received packet data
+
+    data is a zero-copy view of the receive buffer.  The buffer returns to
+    the pool, to be refilled with the next received frame, when the packet
+    is released or garbage collected, so data is only valid while the
+    packet is held: release() invalidates data itself, but slices taken
+    from it are not tracked, so do not keep them past the packet.
+    Indexing and bytes() return copies and are always safe to keep.
+    """
+
+    def __init__(self, buf, length):
+        self.buf = buf
+        self.data = buf.mem[:length]
+
+    def release(self):
+        if self.buf is not None:
+            # invalidate the view so stale references fail loudly
+            self.data.release()
+            self.data = memoryview(b'')
+            self.buf.pool.free(self.buf)
+            self.buf = None
+
+    def __del__(self):
+        self.release()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return bytes(self.data[key])
+        return self.data[key]
+
+    def __bytes__(self):
+        return bytes(self.data)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({bytes(self.data)!r})"
+
+
+class TxQueue:
+    def __init__(self, port, index, hw_regs, size=256, cq_size=None):
+        self.port = port
+        self.driver = port.driver
+        self.log = port.log
         self.index = index
         self.hw_regs = hw_regs
 
-        self.rxq_log_size = (256).bit_length()-1
-        self.rxq_size = 2**self.rxq_log_size
-        self.rxq_mask = self.rxq_size-1
-        self.rxq = None
-        self.rxq_prod = 0
-        self.rxq_cons = 0
-
-        self.rx_info = [None] * self.rxq_size
-
-        self.rxcq_log_size = (256).bit_length()-1
-        self.rxcq_size = 2**self.rxcq_log_size
-        self.rxcq_mask = self.rxcq_size-1
-        self.rxcq = None
-        self.rxcq_prod = 0
-        self.rxcq_cons = 0
-
-        self.txq_log_size = (256).bit_length()-1
-        self.txq_size = 2**self.txq_log_size
-        self.txq_mask = self.txq_size-1
-        self.txq = None
-        self.txq_prod = 0
-        self.txq_cons = 0
-
-        self.tx_info = [None] * self.txq_size
-
-        self.txcq_log_size = (256).bit_length()-1
-        self.txcq_size = 2**self.txcq_log_size
-        self.txcq_mask = self.txcq_size-1
-        self.txcq = None
-        self.txcq_prod = 0
-        self.txcq_cons = 0
-
-        self.rx_queue = Queue()
+        self.log_size = ring_log_size(size)
+        self.size = 2**self.log_size
+        self.mask = self.size-1
+        self.ring = None
+        self.prod = 0
+        self.cons = 0
 
-    async def init(self):
+        self.info = [None] * self.size
 
-        self.rxq = self.driver.pool.alloc_region(self.rxq_size*16)
-        addr = self.rxq.get_absolute_address(0)
-        await self.hw_regs.write_dword(0x0200, 0x00000000)
-        await self.hw_regs.write_dword(0x0204, 0x00000000)
-        await self.hw_regs.write_dword(0x0208, addr & 0xffffffff)
-        await self.hw_regs.write_dword(0x020c, addr >> 32)
-        await self.hw_regs.write_dword(0x0200, 0x00000001 | (self.rxq_log_size << 16))
+        # set when completions free up descriptors
+        self.space_event = Event()
 
-        self.rxcq = self.driver.pool.alloc_region(self.rxcq_size*16)
-        addr = self.rxcq.get_absolute_address(0)
-        await self.hw_regs.write_dword(0x0400, 0x00000000)
-        await self.hw_regs.write_dword(0x0408, addr & 0xffffffff)
-        await self.hw_regs.write_dword(0x040c, addr >> 32)
-        await self.hw_regs.write_dword(0x0400, 0x00000001 | (self.rxcq_log_size << 16))
+        self.cq_log_size = ring_log_size(cq_size or size)
+        if self.cq_log_size < self.log_size:
+            # one completion per descriptor, so a smaller CQ can overflow
+            raise ValueError(f"CQ size {cq_size} smaller than ring size {size}")
+        self.cq_size = 2**self.cq_log_size
+        self.cq_mask = self.cq_size-1
+        self.cq = None
+        self.cq_cons = 0
 
-        self.txq = self.driver.pool.alloc_region(self.txq_size*16)
-        addr = self.txq.get_absolute_address(0)
+    async def init(self):
+        self.ring = self.driver.pool.alloc_region(self.size*16)
+        addr = self.ring.get_absolute_address(0)
         await self.hw_regs.write_dword(0x0100, 0x00000000)
         await self.hw_regs.write_dword(0x0104, 0x00000000)
         await self.hw_regs.write_dword(0x0108, addr & 0xffffffff)
         await self.hw_regs.write_dword(0x010c, addr >> 32)
-        await self.hw_regs.write_dword(0x0100, 0x00000001 | (self.txq_log_size << 16))
+        await self.hw_regs.write_dword(0x0100, 0x00000001 | (self.log_size << 16))
 
-        self.txcq = self.driver.pool.alloc_region(self.txcq_size*16)
-        addr = self.txcq.get_absolute_address(0)
+        self.cq = self.driver.pool.alloc_region(self.cq_size*16)
+        addr = self.cq.get_absolute_address(0)
         await self.hw_regs.write_dword(0x0300, 0x00000000)
         await self.hw_regs.write_dword(0x0308, addr & 0xffffffff)
         await self.hw_regs.write_dword(0x030c, addr >> 32)
-        await self.hw_regs.write_dword(0x0300, 0x00000001 | (self.txcq_log_size << 16))
+        await self.hw_regs.write_dword(0x0300, 0x00000001 | (self.cq_log_size << 16))
 
-        # wait for writes to complete
-        await self.hw_regs.read_dword(0)
+    def is_full(self):
+        return self.prod - self.cons >= self.size
 
-        await self.refill_rx_buffers()
+    async def start_xmit(self, data, xmit_more=False):
+        while self.is_full():
+            # ring full; hand over any deferred descriptors and wait for
+            # completions to free some up
+            self.space_event.clear()
+            await self.ring_doorbell()
+            await self.space_event.wait()
 
-    async def start_xmit(self, data):
         headroom = 10
         tx_buf = self.driver.alloc_pkt()
+        assert len(data) <= tx_buf.size - headroom
         await tx_buf.write(headroom, data)
-        index = self.txq_prod & self.txq_mask
+        index = self.prod & self.mask
         ptr = tx_buf.get_absolute_address(0)
-        struct.pack_into('<xxxxLQ', self.txq.mem, 16*index, len(data), ptr+headroom)
-        self.tx_info[index] = tx_buf
-        self.txq_prod += 1
-        await self.hw_regs.write_dword(0x0104, self.txq_prod & 0xffff)
+        struct.pack_into('<xxxxLQ', self.ring.mem, 16*index, len(data), ptr+headroom)
+        self.info[index] = tx_buf
+        self.prod += 1
 
-    async def recv(self):
-        return await self.rx_queue.get()
+        # defer the doorbell if more packets are coming
+        if not xmit_more:
+            await self.ring_doorbell()
 
-    async def recv_nowait(self):
-        return self.rx_queue.get_nowait()
+    async def ring_doorbell(self):
+        await self.hw_regs.write_dword(0x0104, self.prod & 0xffff)
 
-    def free_tx_desc(self, index):
-        pkt = self.tx_info[index]
+    def free_desc(self, index):
+        pkt = self.info[index]
         self.driver.free_pkt(pkt)
-        self.tx_info[index] = None
-
-    def free_tx_buf(self):
-        while self.txq_cons != self.txq_prod:
-            index = self.txq_cons & self.txq_mask
-            self.free_tx_desc(index)
-            self.txq_cons += 1
+        self.info[index] = None
 
-    async def process_tx_cq(self):
+    def free_buf(self):
+        while self.cons != self.prod:
+            index = self.cons & self.mask
+            self.free_desc(index)
+            self.cons += 1
 
-        cq_cons_ptr = self.txcq_cons
-        cons_ptr = self.txq_cons
+    def cq_pending(self):
+        return cq_count_valid(self.cq.mem, self.cq_cons, self.cq_size, 1) != 0
 
-        while True:
-            cq_index = cq_cons_ptr & self.txcq_mask
-            index = cons_ptr & self.txq_mask
+    async def process_cq(self, budget=None):
 
-            cpl_data = struct.unpack_from("<LLLL", self.txcq.mem, cq_index*16)
+        cq_cons_ptr = self.cq_cons
+        cons_ptr = self.cons
 
-            self.log.info("TX CQ index %d data %s", cq_index, cpl_data)
+        done = cq_count_valid(self.cq.mem, cq_cons_ptr, self.cq_size, budget)
 
-            if bool(cpl_data[-1] & 0x80000000) == bool(cq_cons_ptr & self.txcq_size):
-                self.log.info("CQ empty")
-                break
+        self.log.debug("TX CQ %d: %d completions at index %d", self.index, done, cq_cons_ptr & self.cq_mask)
 
-            pkt = self.tx_info[index]
+        for k in range(done):
+            index = cons_ptr & self.mask
 
-            self.free_tx_desc(index)
+            self.free_desc(index)
 
             cq_cons_ptr += 1
             cons_ptr += 1
 
-        self.txcq_cons = cq_cons_ptr
-        self.txq_cons = cons_ptr
+        self.cq_cons = cq_cons_ptr
+        self.cons = cons_ptr
+
+        if done:
+            self.space_event.set()
+
+        return done
+
+
+class RxQueue:
+    def __init__(self, port, index, hw_regs, size=256, cq_size=None):
+        self.port = port
+        self.driver = port.driver
+        self.log = port.log
+        self.index = index
+        self.hw_regs = hw_regs
+
+        self.log_size = ring_log_size(size)
+        self.size = 2**self.log_size
+        self.mask = self.size-1
+        self.ring = None
+        self.prod = 0
+        self.cons = 0
+
+        self.info = [None] * self.size
+
+        self.cq_log_size = ring_log_size(cq_size or size)
+        if self.cq_log_size < self.log_size:
+            # one completion per descriptor, so a smaller CQ can overflow
+            raise ValueError(f"CQ size {cq_size} smaller than ring size {size}")
+        self.cq_size = 2**self.cq_log_size
+        self.cq_mask = self.cq_size-1
+        self.cq = None
+        self.cq_cpl = None
+        self.cq_cons = 0
+
+    async def init(self):
+        self.ring = self.driver.pool.alloc_region(self.size*16)
+        addr = self.ring.get_absolute_address(0)
+        await self.hw_regs.write_dword(0x0200, 0x00000000)
+        await self.hw_regs.write_dword(0x0204, 0x00000000)
+        await self.hw_regs.write_dword(0x0208, addr & 0xffffffff)
+        await self.hw_regs.write_dword(0x020c, addr >> 32)
+        await self.hw_regs.write_dword(0x0200, 0x00000001 | (self.log_size << 16))
+
+        self.cq = self.driver.pool.alloc_region(self.cq_size*16)
+        self.cq_cpl = memoryview(self.cq.mem).cast('I')
+        addr = self.cq.get_absolute_address(0)
+        await self.hw_regs.write_dword(0x0400, 0x00000000)
+        await self.hw_regs.write_dword(0x0408, addr & 0xffffffff)
+        await self.hw_regs.write_dword(0x040c, addr >> 32)
+        await self.hw_regs.write_dword(0x0400, 0x00000001 | (self.cq_log_size << 16))
 
-    def free_rx_desc(self, index):
-        pkt = self.rx_info[index]
+    def free_desc(self, index):
+        pkt = self.info[index]
         self.driver.free_pkt(pkt)
-        self.rx_info[index] = None
+        self.info[index] = None
 
-    def free_rx_buf(self):
-        while self.rxq_cons != self.rxq_prod:
-            index = self.rxq_cons & self.rxq_mask
-            self.free_rx_desc(index)
-            self.rxq_cons += 1
+    def free_buf(self):
+        while self.cons != self.prod:
+            index = self.cons & self.mask
+            self.free_desc(index)
+            self.cons += 1
 
-    def prepare_rx_desc(self, index):
+    def prepare_desc(self, index):
         pkt = self.driver.alloc_pkt()
-        self.rx_info[index] = pkt
+        self.info[index] = pkt
 
         length = pkt.size
         ptr = pkt.get_absolute_address(0)
 
-        struct.pack_into('<xxxxLQ', self.rxq.mem, 16*index, length, ptr)
+        struct.pack_into('<xxxxLQ', self.ring.mem, 16*index, length, ptr)
 
-    async def refill_rx_buffers(self):
-        missing = self.rxq_size - (self.rxq_prod - self.rxq_cons)
+    async def refill_buffers(self):
+        missing = self.size - (self.prod - self.cons)
 
-        if missing < 8:
+        # always fill an empty ring, even if it is smaller than the threshold
+        if missing < min(self.port.rx_refill_threshold, self.size):
             return
 
         for k in range(missing):
-            self.prepare_rx_desc(self.rxq_prod & self.rxq_mask)
-            self.rxq_prod += 1
+            self.prepare_desc(self.prod & self.mask)
+            self.prod += 1
 
-        await self.hw_regs.write_dword(0x0204, self.rxq_prod & 0xffff)
+        await self.hw_regs.write_dword(0x0204, self.prod & 0xffff)
 
-    async def process_rx_cq(self):
+    def cq_pending(self):
+        return cq_count_valid(self.cq.mem, self.cq_cons, self.cq_size, 1) != 0
 
-        cq_cons_ptr = self.rxcq_cons
-        cons_ptr = self.rxq_cons
+    async def process_cq(self, budget=None):
 
-        while True:
-            cq_index = cq_cons_ptr & self.rxcq_mask
-            index = cons_ptr & self.rxq_mask
-
-            cpl_data = struct.unpack_from("<LLLL", self.rxcq.mem, cq_index*16)
+        cq_cons_ptr = self.cq_cons
+        cons_ptr = self.cons
 
-            self.log.info("RX CQ index %d data %s", cq_index, cpl_data)
+        done = cq_count_valid(self.cq.mem, cq_cons_ptr, self.cq_size, budget)
 
-            if bool(cpl_data[-1] & 0x80000000) == bool(cq_cons_ptr & self.rxcq_size):
-                self.log.info("CQ empty")
-                break
+        self.log.debug("RX CQ %d: %d completions at index %d", self.index, done, cq_cons_ptr & self.cq_mask)
 
-            pkt = self.rx_info[index]
-            length = cpl_data[1]
+        for k in range(done):
+            cq_index = cq_cons_ptr & self.cq_mask
+            index = cons_ptr & self.mask
 
-            data = pkt[:length]
+            pkt = self.info[index]
+            length = self.cq_cpl[cq_index*4+1]
 
-            self.log.info("Packet: %s", data)
+            # hand the buffer over to the packet; refill replaces it
+            data = RxPacket(pkt, length)
+            self.info[index] = None
 
-            self.rx_queue.put_nowait(data)
+            self.log.debug("Packet: %s", data)
 
-            self.free_rx_desc(index)
+            self.port.rx_queue.put_nowait(data)
 
             cq_cons_ptr += 1
             cons_ptr += 1
 
-        self.rxcq_cons = cq_cons_ptr
-        self.rxq_cons = cons_ptr
+        self.cq_cons = cq_cons_ptr
+        self.cons = cons_ptr
+
+        await self.refill_buffers()
+
+        return done
+
+
+class Port:
+    def __init__(self, driver, index, hw_regs, txq_count=1, rxq_count=1,
+            txq_size=256, rxq_size=256, txcq_size=None, rxcq_size=None,
+            queue_stride=None, tx_steer=None, irq_coalesce=False):
+        self.driver = driver
+        self.log = driver.log
+        self.index = index
+        self.hw_regs = hw_regs
+
+        # queue k uses the register block at k*queue_stride in the port window;
+        # the cndm_micro hardware implements a single queue pair per port, so
+        # more queues require an explicit queue_stride from the caller
+        if queue_stride is None:
+            if txq_count > 1 or rxq_count > 1:
+                raise ValueError("Multiple queues require queue_stride (cndm_micro has one queue pair per port)")
+            queue_stride = 0
+        self.txqs = [TxQueue(self, k, hw_regs.create_window(k*queue_stride), txq_size, txcq_size)
+            for k in range(txq_count)]
+        self.rxqs = [RxQueue(self, k, hw_regs.create_window(k*queue_stride), rxq_size, rxcq_size)
+            for k in range(rxq_count)]
+
+        # tx_steer(data, count) returns the TX queue index for a packet
+        self.tx_steer = tx_steer or flow_hash_steer
+
+        self.rx_queue = Queue()
+
+        # interrupt moderation
+        # with irq_coalesce set, an interrupt schedules a poll unless one is
+        # already running, and the poll handles at most napi_budget
+        # completions per CQ per pass, repeating until all CQs drain
+        self.irq_coalesce = irq_coalesce
+        self.napi_budget = 64
+        self.rx_refill_threshold = 8
+        self.polling = False
+
+        self.irq_count = 0
+        self.poll_count = 0
+
+    async def init(self):
+        for q in self.rxqs:
+            await q.init()
+        for q in self.txqs:
+            await q.init()
+
+        # wait for writes to complete
+        await self.hw_regs.read_dword(0)
 
-        await self.refill_rx_buffers()
+        for q in self.rxqs:
+            await q.refill_buffers()
+
+    def select_txq(self, data):
+        if len(self.txqs) == 1:
+            return self.txqs[0]
+        return self.txqs[self.tx_steer(data, len(self.txqs))]
+
+    async def start_xmit(self, data, xmit_more=False, queue=None):
+        if queue is None:
+            txq = self.select_txq(data)
+        else:
+            txq = self.txqs[queue]
+        await txq.start_xmit(data, xmit_more)
+
+    async def start_xmit_batch(self, pkts, queue=None):
+        # queue all packets, then ring the doorbell of each queue used once
+        # (a queue that fills up rings early and waits for completions)
+        used = {}
+        for data in pkts:
+            if queue is None:
+                txq = self.select_txq(data)
+            else:
+                txq = self.txqs[queue]
+            await txq.start_xmit(data, xmit_more=True)
+            used[txq.index] = txq
+        for txq in used.values():
+            await txq.ring_doorbell()
+
+    async def recv(self):
+        return await self.rx_queue.get()
+
+    async def recv_nowait(self):
+        return self.rx_queue.get_nowait()
+
+    def free_tx_buf(self):
+        for q in self.txqs:
+            q.free_buf()
+
+    def free_rx_buf(self):
+        for q in self.rxqs:
+            q.free_buf()
+
+    async def process_tx_cq(self, budget=None):
+        done = 0
+        for q in self.txqs:
+            done = max(done, await q.process_cq(budget))
+        return done
+
+    async def process_rx_cq(self, budget=None):
+        done = 0
+        for q in self.rxqs:
+            done = max(done, await q.process_cq(budget))
+        return done
+
+    def cq_pending(self):
+        return any(q.cq_pending() for q in self.rxqs) or any(q.cq_pending() for q in self.txqs)
+
+    async def poll(self):
+        while True:
+            self.poll_count += 1
+            rx_done = await self.process_rx_cq(self.napi_budget)
+            tx_done = await self.process_tx_cq(self.napi_budget)
+
+            if rx_done < self.napi_budget and tx_done < self.napi_budget:
+                # re-arm, then check for completions that arrived while
+                # interrupts were being ignored
+                self.polling = False
+                if not self.cq_pending():
+                    break
+                self.polling = True
 
     async def interrupt_handler(self):
         self.log.info("Interrupt")
-        await self.process_rx_cq()
-        await self.process_tx_cq()
+        self.irq_count += 1
+
+        if not self.irq_coalesce:
+            await self.process_rx_cq()
+            await self.process_tx_cq()
+            return
+
+        if self.polling:
+            # poll in progress will pick up the new completions
+            return
+
+        self.polling = True
+        await self.poll()
 
 
 class Driver:
-    def __init__(self):
+    def __init__(self, pkt_size=4096, **port_kwargs):
         self.log = logging.getLogger("cocotb.cndm")
 
+        # buffer size for TX and RX packets; RX descriptors cover the whole
+        # buffer, so this also sets the largest frame that can be received
+        self.pkt_size = pkt_size
+
+        # passed through to Port (queue counts, ring sizes, steering,
+        # interrupt coalescing)
+        self.port_kwargs = port_kwargs
+
         self.dev = None
         self.pool = None
+        self.pkt_pool = None
         self.hw_regs = None
 
         self.ports = []
 
-        self.free_packets = deque()
-        self.allocated_packets = []
-
     async def init_pcie_dev(self, dev):
         self.dev = dev
         self.pool = dev.rc.mem_pool
+        self.pkt_pool = PacketPool(self.pool, self.pkt_size)
 
         await dev.enable_device()
         await dev.set_master()
@@ -256,21 +572,15 @@ class Driver:
         self.log.info("Port stride: 0x%x", self.port_stride)
 
         for k in range(self.port_count):
-            port = Port(self, k, self.hw_regs.create_window(self.port_offset + self.port_stride*k))
+            port = Port(self, k, self.hw_regs.create_window(self.port_offset + self.port_stride*k), **self.port_kwargs)
             await port.init()
             self.dev.request_irq(k, port.interrupt_handler)
 
             self.ports.append(port)
 
     def alloc_pkt(self):
-        if self.free_packets:
-            return self.free_packets.popleft()
-
-        pkt = self.pool.alloc_region(4096)
-        self.allocated_packets.append(pkt)
-        return pkt
+        return self.pkt_pool.alloc()
 
     def free_pkt(self, pkt):
         assert pkt is not None
-        assert pkt in self.allocated_packets
-        self.free_packets.append(pkt)
+        self.pkt_pool.free(pkt)
@@ -0,0 +1 @@
+../../../eth/tb/eth_loopback.py
\ No newline at end of file
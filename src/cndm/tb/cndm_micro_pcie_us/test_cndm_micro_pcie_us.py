@@ -9,6 +9,7 @@ Authors:
 
 """
 
+import json
 import logging
 import os
 import sys
@@ -19,18 +20,22 @@ import cocotb_test.simulator
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge, FallingEdge, Timer
+from cocotb.utils import get_sim_time
 
 from cocotbext.axi import AxiStreamBus
 from cocotbext.eth import EthMac
 from cocotbext.pcie.core import RootComplex
+from cocotbext.pcie.core.tlp import TlpType
 from cocotbext.pcie.xilinx.us import UltraScalePlusPcieDevice
 
 try:
+    from eth_loopback import EthLoopback
     import cndm
 except ImportError:
     # attempt import from current directory
     sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
     try:
+        from eth_loopback import EthLoopback
         import cndm
     finally:
         del sys.path[0]
@@ -342,8 +347,7 @@ class TB:
         #         gbx_cfg=gbx_cfg
         #     ))
         #
-        self.loopback_enable = False
-        cocotb.start_soon(self._run_loopback())
+        self.loopback = EthLoopback([mac.tx for mac in self.port_mac], [mac.rx for mac in self.port_mac])
 
     async def init(self):
 
@@ -373,14 +377,69 @@ class TB:
 
         await self.rc.enumerate()
 
-    async def _run_loopback(self):
-        while True:
-            await RisingEdge(self.dut.pcie_clk)
+class TlpCounter:
+    """Count TLPs on the device link, classified by the host buffer they target"""
+
+    def __init__(self, port):
+        self.port = port
+        self.ranges = []
+        self.pools = []
+        self.counts = {}
+
+        self._send = port.send
+        self._rx_handler = port.rx_handler
+        port.send = self._handle_tx
+        port.rx_handler = self._handle_rx
+
+    def add_range(self, region, name):
+        addr = region.get_absolute_address(0)
+        self.ranges.append((addr, addr+region.size, name))
+
+    def add_pool(self, pool, name):
+        # all regions of a PacketPool, including ones added later by grow()
+        self.pools.append((pool, name, []))
+
+    def classify(self, addr):
+        for start, end, name in self.ranges:
+            if start <= addr < end:
+                return name
+        for pool, name, ranges in self.pools:
+            for region in pool.regions[len(ranges):]:
+                start = region.get_absolute_address(0)
+                ranges.append((start, start+region.size))
+            for start, end in ranges:
+                if start <= addr < end:
+                    return name
+        return "other"
+
+    def snapshot(self):
+        return dict(self.counts)
+
+    def _count(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    async def _handle_tx(self, tlp):
+        # upstream (device to host)
+        if tlp.fmt_type in {TlpType.MEM_READ, TlpType.MEM_READ_64}:
+            self._count(self.classify(tlp.address) + "_rd")
+        elif tlp.fmt_type in {TlpType.MEM_WRITE, TlpType.MEM_WRITE_64}:
+            self._count(self.classify(tlp.address) + "_wr")
+        else:
+            self._count("up_other")
+        await self._send(tlp)
+
+    async def _handle_rx(self, tlp):
+        # downstream (host to device)
+        if tlp.fmt_type in {TlpType.MEM_WRITE, TlpType.MEM_WRITE_64}:
+            self._count("mmio_wr")
+        elif tlp.fmt_type in {TlpType.MEM_READ, TlpType.MEM_READ_64}:
+            self._count("mmio_rd")
+        elif tlp.fmt_type in {TlpType.CPL, TlpType.CPL_DATA}:
+            self._count("rd_cpl")
+        else:
+            self._count("down_other")
+        await self._rx_handler(tlp)
 
-            if self.loopback_enable:
-                for mac in self.port_mac:
-                    while not mac.tx.empty():
-                        await mac.rx.send(await mac.tx.recv())
 
 @cocotb.test()
 async def run_test(dut):
@@ -389,8 +448,11 @@ async def run_test(dut):
 
     await tb.init()
 
-    tb.log.info("Init driver model")
-    driver = cndm.Driver()
+    # IRQ_COALESCE=1 runs with interrupt coalescing in the driver model
+    irq_coalesce = bool(int(os.getenv("IRQ_COALESCE", "0")))
+
+    tb.log.info("Init driver model (interrupt coalescing %s)", "on" if irq_coalesce else "off")
+    driver = cndm.Driver(irq_coalesce=irq_coalesce)
     await driver.init_pcie_dev(tb.rc.find_device(tb.dev.functions[0].pcie_id))
 
     tb.log.info("Init complete")
@@ -419,7 +481,7 @@ async def run_test(dut):
     count = 64
     pkts = [bytearray([(x+k) % 256 for x in range(60)]) for k in range(count)]
 
-    tb.loopback_enable = True
+    tb.loopback.enable = True
 
     for p in pkts:
         await driver.ports[0].start_xmit(p)
@@ -431,14 +493,32 @@ async def run_test(dut):
 
         assert bytes(pkt) == pkts[k]
 
-    tb.loopback_enable = False
+    tb.loopback.enable = False
+
+    tb.log.info("Batched small packets")
+
+    count = 64
+    pkts = [bytearray([(x+k) % 256 for x in range(60)]) for k in range(count)]
+
+    tb.loopback.enable = True
+
+    await driver.ports[0].start_xmit_batch(pkts)
+
+    for k in range(count):
+        pkt = await driver.ports[0].recv()
+
+        tb.log.info("Got RX packet: %s", pkt)
+
+        assert bytes(pkt) == pkts[k]
+
+    tb.loopback.enable = False
 
     tb.log.info("Multiple large packets")
 
     count = 64
     pkts = [bytearray([(x+k) % 256 for x in range(1514)]) for k in range(count)]
 
-    tb.loopback_enable = True
+    tb.loopback.enable = True
 
     for p in pkts:
         await driver.ports[0].start_xmit(p)
@@ -450,7 +530,195 @@ async def run_test(dut):
 
         assert bytes(pkt) == pkts[k]
 
-    tb.loopback_enable = False
+    tb.loopback.enable = False
+
+    for port in driver.ports:
+        tb.log.info("Port %d: %d interrupts, %d polls", port.index, port.irq_count, port.poll_count)
+
+    if irq_coalesce:
+        # let the last completions drain, then check that all of them were
+        # handled by polls and the ports are re-armed
+        for k in range(1000):
+            await RisingEdge(dut.pcie_clk)
+
+        for port in driver.ports:
+            assert port.poll_count >= 1
+            assert not port.polling
+            assert not port.cq_pending()
+
+    await RisingEdge(dut.pcie_clk)
+    await RisingEdge(dut.pcie_clk)
+
+
+@cocotb.test()
+async def run_test_small_ring(dut):
+
+    tb = TB(dut)
+
+    await tb.init()
+
+    tb.log.info("Init driver model with a 16 entry TX ring and interrupt coalescing")
+    driver = cndm.Driver(txq_size=16, irq_coalesce=True)
+    await driver.init_pcie_dev(tb.rc.find_device(tb.dev.functions[0].pcie_id))
+
+    tb.log.info("Init complete")
+
+    txq = driver.ports[0].txqs[0]
+
+    for size in [60, 1514]:
+        tb.log.info("Batch of %d byte packets, larger than the TX ring", size)
+
+        count = 64
+        pkts = [bytearray([(x+k) % 256 for x in range(size)]) for k in range(count)]
+
+        tb.loopback.enable = True
+
+        await driver.ports[0].start_xmit_batch(pkts)
+
+        for k in range(count):
+            pkt = await driver.ports[0].recv()
+
+            tb.log.info("Got RX packet: %s", pkt)
+
+            assert bytes(pkt) == pkts[k]
+
+        tb.loopback.enable = False
+
+        assert txq.prod - txq.cons <= txq.size
+
+    port = driver.ports[0]
+    tb.log.info("Port %d: %d interrupts, %d polls", port.index, port.irq_count, port.poll_count)
+
+    for k in range(1000):
+        await RisingEdge(dut.pcie_clk)
+
+    assert port.poll_count >= 1
+    assert not port.polling
+    assert not port.cq_pending()
+
+    await RisingEdge(dut.pcie_clk)
+    await RisingEdge(dut.pcie_clk)
+
+
+async def run_benchmark_size(tb, port, counter, size, count, window):
+    pkts = [(k.to_bytes(4, 'big')*((size+3)//4))[:size] for k in range(count)]
+    tx_time = [0]*count
+    latency = []
+
+    tlp_start = counter.snapshot()
+    start_time = get_sim_time('ns')
+
+    sent = 0
+    received = 0
+
+    async def receive():
+        nonlocal received
+        while received < count:
+            pkt = await port.recv()
+            latency.append(get_sim_time('ns') - tx_time[received])
+            assert bytes(pkt) == pkts[received]
+            received += 1
+
+    rx_cr = cocotb.start_soon(receive())
+
+    # keep up to window packets in flight, queued with one doorbell per batch
+    while sent < count:
+        n = min(window - (sent - received), count - sent)
+        if n <= 0:
+            await RisingEdge(tb.dut.pcie_clk)
+            continue
+        t = get_sim_time('ns')
+        for k in range(sent, sent+n):
+            tx_time[k] = t
+        await port.start_xmit_batch(pkts[sent:sent+n])
+        sent += n
+
+    await rx_cr.join()
+
+    elapsed = get_sim_time('ns') - start_time
+    tlp_end = counter.snapshot()
+    tlps = {k: (tlp_end.get(k, 0) - tlp_start.get(k, 0))/count
+        for k in sorted(tlp_end) if tlp_end.get(k, 0) != tlp_start.get(k, 0)}
+
+    latency.sort()
+
+    def percentile(p):
+        return latency[min(len(latency)-1, int(len(latency)*p/100))]
+
+    return {
+        'size': size,
+        'count': count,
+        'window': window,
+        'time_ns': elapsed,
+        'gbps': count*size*8/elapsed,
+        'mpps': count/elapsed*1e3,
+        'tlp_per_pkt': sum(tlps.values()),
+        'tlp_per_pkt_by_type': tlps,
+        'latency_ns': {
+            'min': latency[0],
+            'p50': percentile(50),
+            'p90': percentile(90),
+            'p99': percentile(99),
+            'max': latency[-1],
+        },
+    }
+
+
+# benchmark mode; run with BENCH=1 (and TESTCASE=run_benchmark when using make)
+# BENCH_SIZES, BENCH_COUNT, and BENCH_WINDOW set the packet size sweep, the
+# number of packets per size, and the number of packets in flight, and
+# BENCH_OUTPUT names a JSON file for the results; IRQ_COALESCE=1 enables
+# interrupt coalescing in the driver model
+@cocotb.test(skip=not os.getenv("BENCH"))
+async def run_benchmark(dut):
+
+    sizes = [int(x) for x in os.getenv("BENCH_SIZES", "64,128,256,512,1024,1514").split(',')]
+    count = int(os.getenv("BENCH_COUNT", "256"))
+    window = int(os.getenv("BENCH_WINDOW", "64"))
+
+    tb = TB(dut)
+
+    await tb.init()
+
+    tb.log.info("Init driver model")
+    headroom = 10
+    driver = cndm.Driver(pkt_size=max(4096, -(-(max(sizes)+headroom) // 4096)*4096),
+        irq_coalesce=bool(int(os.getenv("IRQ_COALESCE", "0"))))
+    await driver.init_pcie_dev(tb.rc.find_device(tb.dev.functions[0].pcie_id))
+
+    counter = TlpCounter(tb.dev.upstream_port)
+    for port in driver.ports:
+        for q in port.txqs + port.rxqs:
+            counter.add_range(q.ring, "desc")
+            counter.add_range(q.cq, "cpl")
+    counter.add_pool(driver.pkt_pool, "data")
+
+    tb.log.info("Init complete")
+
+    port = driver.ports[0]
+    tb.loopback.enable = True
+
+    results = []
+
+    for size in sizes:
+        tb.log.info("Benchmark: %d byte packets", size)
+
+        result = await run_benchmark_size(tb, port, counter, size, count, window)
+        results.append(result)
+
+        tb.log.info("%d bytes: %.3f Gbps, %.3f Mpps, %.2f TLP/pkt, latency p50 %d ns p99 %d ns",
+            size, result['gbps'], result['mpps'], result['tlp_per_pkt'],
+            result['latency_ns']['p50'], result['latency_ns']['p99'])
+        tb.log.info("TLPs per packet: %s", result['tlp_per_pkt_by_type'])
+
+    tb.loopback.enable = False
+
+    tb.log.info("Results: %s", json.dumps(results))
+
+    output = os.getenv("BENCH_OUTPUT")
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
 
     await RisingEdge(dut.pcie_clk)
     await RisingEdge(dut.pcie_clk)
@@ -27,12 +27,14 @@ from cocotbext.pcie.xilinx.us import UltraScalePlusPcieDevice
 
 try:
     from baser import BaseRSerdesSource, BaseRSerdesSink
+    from eth_loopback import EthLoopback
     import cndm_proto
 except ImportError:
     # attempt import from current directory
     sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
     try:
         from baser import BaseRSerdesSource, BaseRSerdesSink
+        from eth_loopback import EthLoopback
         import cndm_proto
     finally:
         del sys.path[0]
@@ -326,8 +328,7 @@ class TB:
         dut.sfp_tx_fault.setimmediatevalue(0)
         dut.sfp_los.setimmediatevalue(0)
 
-        self.loopback_enable = False
-        cocotb.start_soon(self._run_loopback())
+        self.loopback = EthLoopback(self.sfp_sinks, self.sfp_sources)
 
     async def init(self):
 
@@ -351,15 +352,6 @@ class TB:
 
         await self.rc.enumerate()
 
-    async def _run_loopback(self):
-        while True:
-            await RisingEdge(self.dut.pcie_clk)
-
-            if self.loopback_enable:
-                for src, snk in zip(self.sfp_sources, self.sfp_sinks):
-                    while not snk.empty():
-                        await src.send(await snk.recv())
-
 @cocotb.test()
 async def run_test(dut):
 
@@ -405,7 +397,7 @@ async def run_test(dut):
     count = 64
     pkts = [bytearray([(x+k) % 256 for x in range(60)]) for k in range(count)]
 
-    tb.loopback_enable = True
+    tb.loopback.enable = True
 
     for p in pkts:
         await driver.ports[0].start_xmit(p)
@@ -417,14 +409,14 @@ async def run_test(dut):
 
         assert bytes(pkt) == pkts[k].ljust(60, b'\x00')
 
-    tb.loopback_enable = False
+    tb.loopback.enable = False
 
     tb.log.info("Multiple large packets")
 
     count = 64
     pkts = [bytearray([(x+k) % 256 for x in range(1514)]) for k in range(count)]
 
-    tb.loopback_enable = True
+    tb.loopback.enable = True
 
     for p in pkts:
         await driver.ports[0].start_xmit(p)
@@ -436,7 +428,7 @@ async def run_test(dut):
 
         assert bytes(pkt) == pkts[k].ljust(60, b'\x00')
 
-    tb.loopback_enable = False
+    tb.loopback.enable = False
 
     await RisingEdge(dut.clk_125mhz)
     await RisingEdge(dut.clk_125mhz)
@@ -14,6 +14,37 @@ from collections import deque
 
 from cocotb.queue import Queue
 
+
+# completion phase byte to entry valid flag, indexed by the wrap bit of the
+# consumer pointer; an entry is valid when its phase bit differs from the
+# wrap bit
+CPL_VALID = (
+    bytes(1 if b & 0x80 else 0 for b in range(256)),
+    bytes(0 if b & 0x80 else 1 for b in range(256)),
+)
+
+
+def cq_count_valid(mem, cons_ptr, size, limit=None):
+    # count valid completions starting at cons_ptr, scanning the phase
+    # bytes (offset 15 in each 16 byte entry) of each ring segment at once
+    index = cons_ptr & (size-1)
+    wrap = bool(cons_ptr & size)
+    limit = size if limit is None else min(limit, size)
+    count = 0
+
+    while count < limit:
+        n = min(size-index, limit-count)
+        valid = mem[index*16+15:(index+n)*16:16].translate(CPL_VALID[wrap])
+        k = valid.find(0)
+        if k >= 0:
+            return count+k
+        count += n
+        index = 0
+        wrap = not wrap
+
+    return count
+
+
 class Port:
     def __init__(self, driver, index, hw_regs):
         self.driver = driver
@@ -34,6 +65,7 @@ class Port:
         self.rxcq_size = 2**self.rxcq_log_size
         self.rxcq_mask = self.rxcq_size-1
         self.rxcq = None
+        self.rxcq_cpl = None
         self.rxcq_prod = 0
         self.rxcq_cons = 0
 
@@ -55,6 +87,18 @@ class Port:
 
         self.rx_queue = Queue()
 
+        # interrupt moderation
+        # with irq_coalesce set, an interrupt schedules a poll unless one is
+        # already running, and the poll handles at most napi_budget
+        # completions per CQ per pass, repeating until both CQs drain
+        self.irq_coalesce = False
+        self.napi_budget = 64
+        self.rx_refill_threshold = 8
+        self.polling = False
+
+        self.irq_count = 0
+        self.poll_count = 0
+
     async def init(self):
 
         self.rxq = self.driver.pool.alloc_region(self.rxq_size*16)
@@ -66,6 +110,7 @@ class Port:
         await self.hw_regs.write_dword(0x0200, 0x00000001 | (self.rxq_log_size << 16))
 
         self.rxcq = self.driver.pool.alloc_region(self.rxcq_size*16)
+        self.rxcq_cpl = memoryview(self.rxcq.mem).cast('I')
         addr = self.rxcq.get_absolute_address(0)
         await self.hw_regs.write_dword(0x0400, 0x00000000)
         await self.hw_regs.write_dword(0x0408, addr & 0xffffffff)
@@ -120,24 +165,20 @@ class Port:
             self.free_tx_desc(index)
             self.txq_cons += 1
 
-    async def process_tx_cq(self):
+    def tx_cq_pending(self):
+        return cq_count_valid(self.txcq.mem, self.txcq_cons, self.txcq_size, 1) != 0
+
+    async def process_tx_cq(self, budget=None):
 
         cq_cons_ptr = self.txcq_cons
         cons_ptr = self.txq_cons
 
-        while True:
-            cq_index = cq_cons_ptr & self.txcq_mask
-            index = cons_ptr & self.txq_mask
-
-            cpl_data = struct.unpack_from("<LLLL", self.txcq.mem, cq_index*16)
-
-            self.log.info("TX CQ index %d data %s", cq_index, cpl_data)
+        done = cq_count_valid(self.txcq.mem, cq_cons_ptr, self.txcq_size, budget)
 
-            if bool(cpl_data[-1] & 0x80000000) == bool(cq_cons_ptr & self.txcq_size):
-                self.log.info("CQ empty")
-                break
+        self.log.debug("TX CQ %d completions at index %d", done, cq_cons_ptr & self.txcq_mask)
 
-            pkt = self.tx_info[index]
+        for k in range(done):
+            index = cons_ptr & self.txq_mask
 
             self.free_tx_desc(index)
 
@@ -147,6 +188,8 @@ class Port:
         self.txcq_cons = cq_cons_ptr
         self.txq_cons = cons_ptr
 
+        return done
+
     def free_rx_desc(self, index):
         pkt = self.rx_info[index]
         self.driver.free_pkt(pkt)
@@ -170,7 +213,8 @@ class Port:
     async def refill_rx_buffers(self):
         missing = self.rxq_size - (self.rxq_prod - self.rxq_cons)
 
-        if missing < 8:
+        # always fill an empty ring, even if it is smaller than the threshold
+        if missing < min(self.rx_refill_threshold, self.rxq_size):
             return
 
         for k in range(missing):
@@ -179,29 +223,28 @@ class Port:
 
         await self.hw_regs.write_dword(0x0204, self.rxq_prod & 0xffff)
 
-    async def process_rx_cq(self):
+    def rx_cq_pending(self):
+        return cq_count_valid(self.rxcq.mem, self.rxcq_cons, self.rxcq_size, 1) != 0
+
+    async def process_rx_cq(self, budget=None):
 
         cq_cons_ptr = self.rxcq_cons
         cons_ptr = self.rxq_cons
 
-        while True:
-            cq_index = cq_cons_ptr & self.rxcq_mask
-            index = cons_ptr & self.rxq_mask
-
-            cpl_data = struct.unpack_from("<LLLL", self.rxcq.mem, cq_index*16)
+        done = cq_count_valid(self.rxcq.mem, cq_cons_ptr, self.rxcq_size, budget)
 
-            self.log.info("RX CQ index %d data %s", cq_index, cpl_data)
+        self.log.debug("RX CQ %d completions at index %d", done, cq_cons_ptr & self.rxcq_mask)
 
-            if bool(cpl_data[-1] & 0x80000000) == bool(cq_cons_ptr & self.rxcq_size):
-                self.log.info("CQ empty")
-                break
+        for k in range(done):
+            cq_index = cq_cons_ptr & self.rxcq_mask
+            index = cons_ptr & self.rxq_mask
 
             pkt = self.rx_info[index]
-            length = cpl_data[1]
+            length = self.rxcq_cpl[cq_index*4+1]
 
             data = pkt[:length]
 
-            self.log.info("Packet: %s", data)
+            self.log.debug("Packet: %s", data)
 
             self.rx_queue.put_nowait(data)
 
@@ -215,10 +258,37 @@ class Port:
 
         await self.refill_rx_buffers()
 
+        return done
+
+    async def poll(self):
+        while True:
+            self.poll_count += 1
+            rx_done = await self.process_rx_cq(self.napi_budget)
+            tx_done = await self.process_tx_cq(self.napi_budget)
+
+            if rx_done < self.napi_budget and tx_done < self.napi_budget:
+                # re-arm, then check for completions that arrived while
+                # interrupts were being ignored
+                self.polling = False
+                if not self.rx_cq_pending() and not self.tx_cq_pending():
+                    break
+                self.polling = True
+
     async def interrupt_handler(self):
         self.log.info("Interrupt")
-        await self.process_rx_cq()
-        await self.process_tx_cq()
+        self.irq_count += 1
+
+        if not self.irq_coalesce:
+            await self.process_rx_cq()
+            await self.process_tx_cq()
+            return
+
+        if self.polling:
+            # poll in progress will pick up the new completions
+            return
+
+        self.polling = True
+        await self.poll()
 
 
 class Driver:
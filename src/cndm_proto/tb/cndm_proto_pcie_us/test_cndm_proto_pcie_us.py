@@ -26,11 +26,13 @@ from cocotbext.pcie.core import RootComplex
 from cocotbext.pcie.xilinx.us import UltraScalePlusPcieDevice
 
 try:
+    from eth_loopback import EthLoopback
     import cndm_proto
 except ImportError:
     # attempt import from current directory
     sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
     try:
+        from eth_loopback import EthLoopback
         import cndm_proto
     finally:
         del sys.path[0]
@@ -295,8 +297,7 @@ class TB:
             )
             self.port_mac.append(mac)
 
-        self.loopback_enable = False
-        cocotb.start_soon(self._run_loopback())
+        self.loopback = EthLoopback([mac.tx for mac in self.port_mac], [mac.rx for mac in self.port_mac])
 
     async def init(self):
 
@@ -326,15 +327,6 @@ class TB:
 
         await self.rc.enumerate()
 
-    async def _run_loopback(self):
-        while True:
-            await RisingEdge(self.dut.pcie_clk)
-
-            if self.loopback_enable:
-                for mac in self.port_mac:
-                    while not mac.tx.empty():
-                        await mac.rx.send(await mac.tx.recv())
-
 @cocotb.test()
 async def run_test(dut):
 
@@ -346,6 +338,12 @@ async def run_test(dut):
     driver = cndm_proto.Driver()
     await driver.init_pcie_dev(tb.rc.find_device(tb.dev.functions[0].pcie_id))
 
+    # IRQ_COALESCE=1 runs with interrupt coalescing in the driver model
+    irq_coalesce = bool(int(os.getenv("IRQ_COALESCE", "0")))
+    tb.log.info("Interrupt coalescing %s", "on" if irq_coalesce else "off")
+    for port in driver.ports:
+        port.irq_coalesce = irq_coalesce
+
     tb.log.info("Init complete")
 
     tb.log.info("Send and receive single packet on each port")
@@ -372,7 +370,7 @@ async def run_test(dut):
     count = 64
     pkts = [bytearray([(x+k) % 256 for x in range(60)]) for k in range(count)]
 
-    tb.loopback_enable = True
+    tb.loopback.enable = True
 
     for p in pkts:
         await driver.ports[0].start_xmit(p)
@@ -384,14 +382,14 @@ async def run_test(dut):
 
         assert bytes(pkt) == pkts[k]
 
-    tb.loopback_enable = False
+    tb.loopback.enable = False
 
     tb.log.info("Multiple large packets")
 
     count = 64
     pkts = [bytearray([(x+k) % 256 for x in range(1514)]) for k in range(count)]
 
-    tb.loopback_enable = True
+    tb.loopback.enable = True
 
     for p in pkts:
         await driver.ports[0].start_xmit(p)
@@ -403,7 +401,22 @@ async def run_test(dut):
 
         assert bytes(pkt) == pkts[k]
 
-    tb.loopback_enable = False
+    tb.loopback.enable = False
+
+    for port in driver.ports:
+        tb.log.info("Port %d: %d interrupts, %d polls", port.index, port.irq_count, port.poll_count)
+
+    if irq_coalesce:
+        # let the last completions drain, then check that all of them were
+        # handled by polls and the ports are re-armed
+        for k in range(1000):
+            await RisingEdge(dut.pcie_clk)
+
+        for port in driver.ports:
+            assert port.poll_count >= 1
+            assert not port.polling
+            assert not port.rx_cq_pending()
+            assert not port.tx_cq_pending()
 
     await RisingEdge(dut.pcie_clk)
     await RisingEdge(dut.pcie_clk)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: CERN-OHL-S-2.0
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+import logging
+
+import cocotb
+from cocotb.queue import Queue
+from cocotb.triggers import Event, Timer
+from cocotb.utils import get_sim_steps, get_sim_time
+
+
+class EthLoopback:
+    """Event-driven frame loopback
+
+    Forwards frames from each sink (anything with wait(), empty() and
+    recv_nowait(), such as EthMacTx or BaseRSerdesSink) to the matching
+    source (anything with send(), such as EthMacRx or BaseRSerdesSource).
+    Each pair is serviced by its own coroutine that sleeps until a frame
+    arrives, so an idle loopback costs nothing.
+
+    Frames are optionally delayed by latency (in latency_unit) and limited to
+    rate bits per second.  While the loopback is disabled, frames are left in
+    the sinks for the testbench to receive directly.
+    """
+
+    def __init__(self, sinks, sources, latency=0, latency_unit='ns', rate=None, enable=False):
+        self.log = logging.getLogger("cocotb.eth_loopback")
+
+        self.sinks = list(sinks)
+        self.sources = list(sources)
+
+        if len(self.sinks) != len(self.sources):
+            raise ValueError("Sink and source lists must have the same length")
+
+        self.latency = latency
+        self.latency_unit = latency_unit
+        self.rate = rate
+
+        self.frame_count = [0]*len(self.sinks)
+        self.byte_count = [0]*len(self.sinks)
+
+        self._enable_event = Event()
+        self.enable = enable
+
+        self._run_cr = []
+        for k in range(len(self.sinks)):
+            queue = Queue()
+            self._run_cr.append(cocotb.start_soon(self._run_rx(k, queue)))
+            self._run_cr.append(cocotb.start_soon(self._run_tx(k, queue)))
+
+    @property
+    def enable(self):
+        return self._enable_event.is_set()
+
+    @enable.setter
+    def enable(self, value):
+        if value:
+            self._enable_event.set()
+        else:
+            self._enable_event.clear()
+
+    def stop(self):
+        for cr in self._run_cr:
+            cr.kill()
+        self._run_cr = []
+
+    async def _run_rx(self, k, queue):
+        sink = self.sinks[k]
+
+        while True:
+            if not self.enable:
+                await self._enable_event.wait()
+
+            await sink.wait()
+
+            while self.enable and not sink.empty():
+                frame = sink.recv_nowait()
+                queue.put_nowait((get_sim_time('step'), frame))
+
+    async def _run_tx(self, k, queue):
+        source = self.sources[k]
+
+        while True:
+            t, frame = await queue.get()
+
+            if self.latency:
+                # hold the frame until latency after it was received
+                delay = t + get_sim_steps(self.latency, self.latency_unit, round_mode='round') - get_sim_time('step')
+                if delay > 0:
+                    await Timer(delay, 'step')
+
+            await source.send(frame)
+
+            self.frame_count[k] += 1
+            self.byte_count[k] += len(frame)
+
+            if self.rate:
+                # wait for the frame time at the configured rate
+                delay = get_sim_steps(len(frame)*8/self.rate, 'sec', round_mode='round')
+                if delay > 0:
+                    await Timer(delay, 'step')
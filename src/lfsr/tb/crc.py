@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: CERN-OHL-S-2.0
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+import zlib
+
+
+def _reflect(val, width):
+    return int(f"{val:0{width}b}"[::-1], 2)
+
+
+class Crc:
+    """Table-driven CRC reference matching taxi_lfsr_crc
+
+    Parameters follow taxi_lfsr_crc: width (LFSR_W), poly (LFSR_POLY, with
+    the x^width term suppressed), init (LFSR_INIT, default all ones),
+    reverse (REVERSE, reflected input and output, LSB first), and invert
+    (INVERT, complement the output).
+
+    States are in the same bit order as the RTL LFSR state, so update()
+    and step() can be compared directly against state_out.  Bulk data is
+    processed eight bytes at a time with slice-by-8 tables.
+    """
+
+    def __init__(self, width=32, poly=0x04c11db7, init=None, reverse=True, invert=True):
+        self.width = width
+        self.poly = poly
+        self.mask = 2**width-1
+        self.init = self.mask if init is None else init & self.mask
+        self.reverse = reverse
+        self.invert = invert
+
+        if reverse:
+            self._poly = _reflect(poly, width)
+            self._pad = 0
+        else:
+            # work MSB-aligned on at least 8 bits so that narrow CRCs can
+            # use byte tables too
+            self._pad = max(0, 8-width)
+            self._poly = poly << self._pad
+
+        self._w = width+self._pad
+        self._wmask = 2**self._w-1
+
+        self.tables = [[self._shift_bits(b if reverse else b << (self._w-8), 8) for b in range(256)]]
+        t0 = self.tables[0]
+        for k in range(1, 8):
+            prev = self.tables[-1]
+            if reverse:
+                self.tables.append([(v >> 8) ^ t0[v & 0xff] for v in prev])
+            else:
+                self.tables.append([((v << 8) & self._wmask) ^ t0[v >> (self._w-8)] if self._w >= 8 else 0 for v in prev])
+
+        # zlib implements the common Ethernet CRC-32 in C
+        self._zlib = (width == 32 and poly == 0x04c11db7 and reverse and self.init == self.mask)
+
+    def _shift_bits(self, reg, n):
+        # shift n zero bits through the (padded) register
+        if self.reverse:
+            for k in range(n):
+                reg = (reg >> 1) ^ (self._poly if reg & 1 else 0)
+        else:
+            top = 1 << (self._w-1)
+            for k in range(n):
+                reg = ((reg << 1) & self._wmask) ^ (self._poly if reg & top else 0)
+        return reg
+
+    def update(self, data, state=None):
+        # feed bytes through the CRC register; returns the new state
+        if state is None:
+            state = self.init
+
+        if self._zlib:
+            return ~zlib.crc32(data, ~state & self.mask) & self.mask
+
+        data = bytes(data)
+        n = len(data)
+        n8 = n & ~7
+        t0, t1, t2, t3, t4, t5, t6, t7 = self.tables
+
+        if self.reverse:
+            reg = state
+            for i in range(0, n8, 8):
+                x = (reg & 0xffffffffffffffff) ^ int.from_bytes(data[i:i+8], 'little')
+                reg = ((reg >> 64) ^ t7[x & 0xff] ^ t6[(x >> 8) & 0xff] ^ t5[(x >> 16) & 0xff] ^ t4[(x >> 24) & 0xff]
+                    ^ t3[(x >> 32) & 0xff] ^ t2[(x >> 40) & 0xff] ^ t1[(x >> 48) & 0xff] ^ t0[x >> 56])
+            for b in data[n8:]:
+                reg = (reg >> 8) ^ t0[(reg ^ b) & 0xff]
+            return reg
+
+        w = self._w
+        wmask = self._wmask
+        reg = state << self._pad
+        for i in range(0, n8, 8):
+            d = int.from_bytes(data[i:i+8], 'big')
+            if w >= 64:
+                x = (reg >> (w-64)) ^ d
+                reg = (reg << 64) & wmask
+            else:
+                x = (reg << (64-w)) ^ d
+                reg = 0
+            reg ^= (t7[x >> 56] ^ t6[(x >> 48) & 0xff] ^ t5[(x >> 40) & 0xff] ^ t4[(x >> 32) & 0xff]
+                ^ t3[(x >> 24) & 0xff] ^ t2[(x >> 16) & 0xff] ^ t1[(x >> 8) & 0xff] ^ t0[x & 0xff])
+        for b in data[n8:]:
+            reg = ((reg << 8) & wmask) ^ t0[(reg >> (w-8)) ^ b]
+        return reg >> self._pad
+
+    def finalize(self, state):
+        return state ^ self.mask if self.invert else state
+
+    def compute(self, data):
+        return self.finalize(self.update(data))
+
+    __call__ = compute
+
+    def step(self, state, data, data_w):
+        # next state after one cycle of the RTL with a data_w bit data_in
+        # word (LSB first if reverse, otherwise MSB first)
+        if data_w % 8 == 0:
+            return self.update(data.to_bytes(data_w//8, 'little' if self.reverse else 'big'), state)
+
+        reg = state << self._pad
+        for k in range(data_w):
+            if self.reverse:
+                reg ^= (data >> k) & 1
+            else:
+                reg ^= ((data >> (data_w-1-k)) & 1) << (self._w-1)
+            reg = self._shift_bits(reg, 1)
+        return reg >> self._pad
+
+    def steps(self, data, data_w, state=None):
+        # states after each data_w bit word of data, as seen on state_out
+        # cycle by cycle; data is a byte string (data_w a multiple of 8)
+        if state is None:
+            state = self.init
+        n = data_w//8
+        data = bytes(data)
+        states = []
+        for i in range(0, len(data), n):
+            state = self.update(data[i:i+n], state)
+            states.append(state)
+        return states
+
+
+crc32 = Crc(32, 0x04c11db7)
+crc32c = Crc(32, 0x1edc6f41)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: CERN-OHL-S-2.0
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+_tables = {}
+
+_invert = bytes(x ^ 0xff for x in range(256))
+
+
+class Lfsr:
+    """Table-driven PRBS generator and scrambler reference
+
+    Fibonacci LFSRs (galois=False) shift left, feeding back the parity of
+    the taps given by poly (in taxi_lfsr format, with the x^width term
+    suppressed), as used for PRBS generators and the 64b66b scrambler.
+    Galois LFSRs (galois=True) shift the output out of the register and
+    XOR in poly, as used for the PCIe scramblers.  reverse selects LSB
+    first bit order within each byte (and the reflected polynomial for
+    Galois), otherwise bits are MSB first.  invert complements the output
+    and self_sync selects a self-synchronizing scrambler.
+
+    Each byte is processed with one lookup per byte of state, using tables
+    of the state transition over eight bit times.  state holds the current
+    LFSR state and may be read or written at any point in the stream.
+    """
+
+    def __init__(self, width, poly, init=None, galois=False, reverse=False, invert=False, self_sync=False):
+        self.width = width
+        self.poly = poly
+        self.mask = 2**width-1
+        self.init = self.mask if init is None else init & self.mask
+        self.galois = galois
+        self.reverse = reverse
+        self.invert = invert
+        self.self_sync = self_sync
+
+        if galois and self_sync:
+            raise ValueError("Self-synchronizing scrambler requires Fibonacci LFSR")
+
+        if galois:
+            if reverse:
+                self._poly = int(f"{poly:0{width}b}"[::-1], 2)
+            else:
+                self._poly = poly
+        else:
+            self._taps = (poly >> 1) | (1 << (width-1))
+
+        self.state = self.init
+
+    def reset(self, state=None):
+        self.state = self.init if state is None else state & self.mask
+
+    def _step(self, state, data, mode):
+        # eight bit times, bit by bit
+        out = 0
+        for i in range(8):
+            k = i if self.reverse else 7-i
+            d = (data >> k) & 1
+
+            if self.galois:
+                if self.reverse:
+                    fb = state & 1
+                    state = (state >> 1) ^ (self._poly if fb else 0)
+                else:
+                    fb = state >> (self.width-1)
+                    state = ((state << 1) & self.mask) ^ (self._poly if fb else 0)
+                o = fb ^ d
+            else:
+                fb = (state & self._taps).bit_count() & 1
+                o = fb ^ d
+                if not self.self_sync or mode == 'gen':
+                    fb_in = fb
+                elif mode == 'scramble':
+                    fb_in = o
+                else:
+                    fb_in = d
+                state = ((state << 1) & self.mask) | fb_in
+
+            out |= o << k
+        return state, out
+
+    def _get_tables(self, mode):
+        key = (self.width, self.poly, self.galois, self.reverse, self.self_sync, mode)
+        tables = _tables.get(key)
+        if tables is not None:
+            return tables
+
+        def build(f):
+            # the step is linear, so build each table from single bit entries
+            t = [0]*256
+            for v in range(1, 256):
+                low = v & -v
+                if v == low:
+                    s, o = f(v)
+                    t[v] = (s << 8) | o
+                else:
+                    t[v] = t[v ^ low] ^ t[low]
+            return t
+
+        state_tables = []
+        for k in range(0, self.width, 8):
+            state_tables.append((k, build(lambda v: self._step((v << k) & self.mask, 0, mode))))
+
+        data_table = build(lambda v: self._step(0, v, mode))
+
+        tables = (state_tables, data_table)
+        _tables[key] = tables
+        return tables
+
+    def _run(self, data, n, mode):
+        state_tables, data_table = self._get_tables(mode)
+        state = self.state
+        out = bytearray(n)
+
+        if data is None:
+            data = bytes(n)
+
+        # unrolled for up to 64 bit state, unused tables are all zero
+        t = [tbl for k, tbl in state_tables]
+        if len(t) <= 2:
+            t0, t1 = t + [[0]*256]*(2-len(t))
+            for i in range(n):
+                x = data_table[data[i]] ^ t0[state & 0xff] ^ t1[(state >> 8) & 0xff]
+                out[i] = x & 0xff
+                state = x >> 8
+        elif len(t) <= 4:
+            t0, t1, t2, t3 = t + [[0]*256]*(4-len(t))
+            for i in range(n):
+                x = (data_table[data[i]] ^ t0[state & 0xff] ^ t1[(state >> 8) & 0xff]
+                    ^ t2[(state >> 16) & 0xff] ^ t3[(state >> 24) & 0xff])
+                out[i] = x & 0xff
+                state = x >> 8
+        elif len(t) <= 8:
+            t0, t1, t2, t3, t4, t5, t6, t7 = t + [[0]*256]*(8-len(t))
+            for i in range(n):
+                x = (data_table[data[i]] ^ t0[state & 0xff] ^ t1[(state >> 8) & 0xff]
+                    ^ t2[(state >> 16) & 0xff] ^ t3[(state >> 24) & 0xff]
+                    ^ t4[(state >> 32) & 0xff] ^ t5[(state >> 40) & 0xff]
+                    ^ t6[(state >> 48) & 0xff] ^ t7[(state >> 56) & 0xff])
+                out[i] = x & 0xff
+                state = x >> 8
+        else:
+            for i in range(n):
+                x = data_table[data[i]]
+                for k, tbl in state_tables:
+                    x ^= tbl[(state >> k) & 0xff]
+                out[i] = x & 0xff
+                state = x >> 8
+
+        self.state = state
+
+        if self.invert:
+            return bytes(out.translate(_invert))
+        return bytes(out)
+
+    def generate(self, n):
+        # next n bytes of the PRBS sequence
+        return self._run(None, n, 'gen')
+
+    def scramble(self, data):
+        data = bytes(data)
+        return self._run(data, len(data), 'scramble')
+
+    def descramble(self, data):
+        data = bytes(data)
+        return self._run(data, len(data), 'descramble')
+
+    def __iter__(self):
+        while True:
+            yield from self.generate(256)
+
+    def sync(self, data):
+        # load the state from a received PRBS sequence or self-synchronized
+        # scrambled stream, needs at least width bits
+        if self.galois:
+            raise ValueError("Cannot sync Galois LFSR from output")
+        if len(data)*8 < self.width:
+            raise ValueError(f"Need at least {self.width} bits to sync")
+
+        data = bytes(data)
+        if self.invert and not self.self_sync:
+            data = data.translate(_invert)
+
+        state = 0
+        for d in data:
+            for i in range(8):
+                k = i if self.reverse else 7-i
+                state = ((state << 1) & self.mask) | ((d >> k) & 1)
+        self.state = state
+
+
+def prbs9(state=0x1ff, invert=True):
+    return Lfsr(9, 0x021, state, invert=invert)
+
+
+def prbs31(state=0x7fffffff, invert=True):
+    return Lfsr(31, 0x10000001, state, invert=invert)
+
+
+def scrambler_64b66b(state=0x3ffffffffffffff):
+    return Lfsr(58, 0x8000000001, state, reverse=True, self_sync=True)
+
+
+def scrambler_pcie(state=0xffff):
+    return Lfsr(16, 0x0039, state, galois=True, reverse=True)
+
+
+def scrambler_pcie_gen3(state=0x1efedc):
+    return Lfsr(23, 0x210125, state, galois=True, reverse=True)
@@ -0,0 +1 @@
+../crc.py
\ No newline at end of file
@@ -0,0 +1 @@
+../prbs.py
\ No newline at end of file
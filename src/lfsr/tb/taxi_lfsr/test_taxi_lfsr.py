@@ -12,7 +12,7 @@ Authors:
 import itertools
 import logging
 import os
-import zlib
+import sys
 
 import pytest
 import cocotb_test.simulator
@@ -21,6 +21,18 @@ import cocotb
 from cocotb.triggers import Timer
 from cocotb.regression import TestFactory
 
+try:
+    from crc import Crc
+    from prbs import prbs9, prbs31
+except ImportError:
+    # attempt import from current directory
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+    try:
+        from crc import Crc
+        from prbs import prbs9, prbs31
+    finally:
+        del sys.path[0]
+
 
 class TB:
     def __init__(self, dut):
@@ -37,22 +49,7 @@ def chunks(lst, n, padvalue=None):
     return itertools.zip_longest(*[iter(lst)]*n, fillvalue=padvalue)
 
 
-def crc32(data):
-    return zlib.crc32(data) & 0xffffffff
-
-
-def crc32c(data, crc=0xffffffff, poly=0x82f63b78):
-    for d in data:
-        crc = crc ^ d
-        for bit in range(0, 8):
-            if crc & 1:
-                crc = (crc >> 1) ^ poly
-            else:
-                crc = crc >> 1
-    return ~crc & 0xffffffff
-
-
-async def run_test_crc(dut, ref_crc):
+async def run_test_crc(dut):
 
     data_width = len(dut.data_in)
     byte_lanes = data_width // 8
@@ -60,6 +57,11 @@ async def run_test_crc(dut, ref_crc):
     state_width = len(dut.state_in)
     state_mask = 2**state_width-1
 
+    reverse = bool(int(dut.REVERSE.value))
+    byteorder = 'little' if reverse else 'big'
+
+    ref_crc = Crc(state_width, int(dut.LFSR_POLY.value), reverse=reverse)
+
     tb = TB(dut)
 
     await Timer(10, 'ns')
@@ -67,11 +69,11 @@ async def run_test_crc(dut, ref_crc):
     block = bytes([(x+1)*0x11 for x in range(byte_lanes)])
 
     dut.state_in.value = state_mask
-    dut.data_in.value = int.from_bytes(block, 'little')
+    dut.data_in.value = int.from_bytes(block, byteorder)
     await Timer(10, 'ns')
 
-    val = ~int(dut.state_out.value) & state_mask
-    ref = ref_crc(block)
+    val = int(dut.state_out.value)
+    ref = ref_crc.update(block)
 
     tb.log.info("CRC: 0x%x (ref: 0x%x)", val, ref)
 
@@ -82,13 +84,14 @@ async def run_test_crc(dut, ref_crc):
     block = bytearray(itertools.islice(itertools.cycle(range(256)), 1024))
 
     dut.state_in.value = state_mask
-    for b in chunks(block, byte_lanes):
-        dut.data_in.value = int.from_bytes(b, 'little')
+    for b, ref in zip(chunks(block, byte_lanes), ref_crc.steps(block, data_width)):
+        dut.data_in.value = int.from_bytes(b, byteorder)
         await Timer(10, 'ns')
+        assert int(dut.state_out.value) == ref
         dut.state_in.value = dut.state_out.value
 
-    val = ~int(dut.state_out.value) & state_mask
-    ref = ref_crc(block)
+    val = int(dut.state_out.value)
+    ref = ref_crc.update(block)
 
     tb.log.info("CRC: 0x%x (ref: 0x%x)", val, ref)
 
@@ -97,26 +100,6 @@ async def run_test_crc(dut, ref_crc):
     await Timer(10, 'ns')
 
 
-def prbs9(state=0x1ff):
-    while True:
-        for i in range(8):
-            if bool(state & 0x10) ^ bool(state & 0x100):
-                state = ((state & 0xff) << 1) | 1
-            else:
-                state = (state & 0xff) << 1
-        yield ~state & 0xff
-
-
-def prbs31(state=0x7fffffff):
-    while True:
-        for i in range(8):
-            if bool(state & 0x08000000) ^ bool(state & 0x40000000):
-                state = ((state & 0x3fffffff) << 1) | 1
-            else:
-                state = (state & 0x3fffffff) << 1
-        yield ~state & 0xff
-
-
 async def run_test_prbs(dut, ref_prbs):
 
     data_width = len(dut.data_in)
@@ -132,7 +115,7 @@ async def run_test_prbs(dut, ref_prbs):
 
     dut.state_in.value = state_mask
     dut.data_in.value = 0
-    gen = chunks(ref_prbs(), byte_lanes)
+    gen = chunks(ref_prbs().generate(512*byte_lanes), byte_lanes)
 
     await Timer(10, 'ns')
 
@@ -151,14 +134,8 @@ async def run_test_prbs(dut, ref_prbs):
 
 if getattr(cocotb, 'top', None) is not None:
 
-    if cocotb.top.LFSR_POLY.value == 0x4c11db7:
-        factory = TestFactory(run_test_crc)
-        factory.add_option("ref_crc", [crc32])
-        factory.generate_tests()
-
-    if cocotb.top.LFSR_POLY.value == 0x1edc6f41:
+    if cocotb.top.LFSR_GALOIS.value:
         factory = TestFactory(run_test_crc)
-        factory.add_option("ref_crc", [crc32c])
         factory.generate_tests()
 
     if cocotb.top.LFSR_POLY.value == 0x021:
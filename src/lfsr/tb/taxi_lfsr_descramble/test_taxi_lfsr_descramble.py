@@ -12,6 +12,7 @@ Authors:
 import itertools
 import logging
 import os
+import sys
 
 import pytest
 import cocotb_test.simulator
@@ -21,6 +22,16 @@ from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge
 from cocotb.regression import TestFactory
 
+try:
+    from prbs import scrambler_64b66b, scrambler_pcie, scrambler_pcie_gen3
+except ImportError:
+    # attempt import from current directory
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+    try:
+        from prbs import scrambler_64b66b, scrambler_pcie, scrambler_pcie_gen3
+    finally:
+        del sys.path[0]
+
 
 class TB:
     def __init__(self, dut):
@@ -50,61 +61,7 @@ def chunks(lst, n, padvalue=None):
     return itertools.zip_longest(*[iter(lst)]*n, fillvalue=padvalue)
 
 
-def scramble_64b66b(data, state=0x3ffffffffffffff):
-    data_out = bytearray()
-    for d in data:
-        b = 0
-        for i in range(8):
-            if bool(state & (1 << 38)) ^ bool(state & (1 << 57)) ^ bool(d & (1 << i)):
-                state = ((state & 0x1ffffffffffffff) << 1) | 1
-                b = b | (1 << i)
-            else:
-                state = (state & 0x1ffffffffffffff) << 1
-        data_out.append(b)
-    return data_out
-
-
-def descramble_64b66b(data, state=0x3ffffffffffffff):
-    data_out = bytearray()
-    for d in data:
-        b = 0
-        for i in range(8):
-            if bool(state & (1 << 38)) ^ bool(state & (1 << 57)) ^ bool(d & (1 << i)):
-                b = b | (1 << i)
-            state = (state & 0x1ffffffffffffff) << 1 | bool(d & (1 << i))
-        data_out += bytearray([b])
-    return data_out
-
-
-def scramble_pcie(data, state=0xffff, poly=0x9c00):
-    data_out = bytearray()
-    for d in data:
-        b = 0
-        for i in range(8):
-            if state & 1:
-                state = (state >> 1) ^ poly
-                b = b | (1 << i)
-            else:
-                state = state >> 1
-        data_out.append(b ^ d)
-    return data_out
-
-
-def scramble_pcie_gen3(data, state=0x1efedc, poly=0x524042):
-    data_out = bytearray()
-    for d in data:
-        b = 0
-        for i in range(8):
-            if state & 1:
-                state = (state >> 1) ^ poly
-                b = b | (1 << i)
-            else:
-                state = state >> 1
-        data_out.append(b ^ d)
-    return data_out
-
-
-async def run_test_descramble(dut, ref_scramble, ref_descramble):
+async def run_test_descramble(dut, ref_scramble):
 
     data_width = len(dut.data_in)
     byte_lanes = data_width // 8
@@ -115,9 +72,9 @@ async def run_test_descramble(dut, ref_scramble, ref_descramble):
 
     block = bytearray(itertools.islice(itertools.cycle(range(256)), 1024))
 
-    scr = ref_scramble(block)
+    scr = ref_scramble().scramble(block)
 
-    dscr = ref_descramble(scr)
+    dscr = ref_scramble().descramble(scr)
 
     assert dscr == block
 
@@ -150,17 +107,17 @@ if getattr(cocotb, 'top', None) is not None:
     # if cocotb.top.LFSR_POLY.value == 0x8000000001:
     if int(cocotb.top.LFSR_W.value) == 58:
         factory = TestFactory(run_test_descramble)
-        factory.add_option(("ref_scramble", "ref_descramble"), [(scramble_64b66b, descramble_64b66b)])
+        factory.add_option("ref_scramble", [scrambler_64b66b])
         factory.generate_tests()
 
     if cocotb.top.LFSR_POLY.value == 0x0039:
         factory = TestFactory(run_test_descramble)
-        factory.add_option(("ref_scramble", "ref_descramble"), [(scramble_pcie, scramble_pcie)])
+        factory.add_option("ref_scramble", [scrambler_pcie])
         factory.generate_tests()
 
     if cocotb.top.LFSR_POLY.value == 0x210125:
         factory = TestFactory(run_test_descramble)
-        factory.add_option(("ref_scramble", "ref_descramble"), [(scramble_pcie_gen3, scramble_pcie_gen3)])
+        factory.add_option("ref_scramble", [scrambler_pcie_gen3])
         factory.generate_tests()
 
 
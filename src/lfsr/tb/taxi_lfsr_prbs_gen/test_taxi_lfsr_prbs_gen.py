@@ -12,6 +12,7 @@ Authors:
 import itertools
 import logging
 import os
+import sys
 
 import pytest
 import cocotb_test.simulator
@@ -21,6 +22,16 @@ from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge
 from cocotb.regression import TestFactory
 
+try:
+    from prbs import prbs9, prbs31, scrambler_pcie, scrambler_pcie_gen3
+except ImportError:
+    # attempt import from current directory
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+    try:
+        from prbs import prbs9, prbs31, scrambler_pcie, scrambler_pcie_gen3
+    finally:
+        del sys.path[0]
+
 
 class TB:
     def __init__(self, dut):
@@ -49,26 +60,6 @@ def chunks(lst, n, padvalue=None):
     return itertools.zip_longest(*[iter(lst)]*n, fillvalue=padvalue)
 
 
-def prbs9(state=0x1ff):
-    while True:
-        for i in range(8):
-            if bool(state & 0x10) ^ bool(state & 0x100):
-                state = ((state & 0xff) << 1) | 1
-            else:
-                state = (state & 0xff) << 1
-        yield ~state & 0xff
-
-
-def prbs31(state=0x7fffffff):
-    while True:
-        for i in range(8):
-            if bool(state & 0x08000000) ^ bool(state & 0x40000000):
-                state = ((state & 0x3fffffff) << 1) | 1
-            else:
-                state = (state & 0x3fffffff) << 1
-        yield ~state & 0xff
-
-
 async def run_test_prbs(dut, ref_prbs):
 
     data_width = len(dut.data_out)
@@ -78,7 +69,7 @@ async def run_test_prbs(dut, ref_prbs):
 
     await tb.reset()
 
-    gen = chunks(ref_prbs(), byte_lanes)
+    gen = chunks(ref_prbs().generate(512*byte_lanes), byte_lanes)
 
     dut.enable.value = 1
     await RisingEdge(dut.clk)
@@ -94,34 +85,6 @@ async def run_test_prbs(dut, ref_prbs):
         await RisingEdge(dut.clk)
 
 
-def scramble_pcie(data, state=0xffff, poly=0x9c00):
-    data_out = bytearray()
-    for d in data:
-        b = 0
-        for i in range(8):
-            if state & 1:
-                state = (state >> 1) ^ poly
-                b = b | (1 << i)
-            else:
-                state = state >> 1
-        data_out.append(b ^ d)
-    return data_out
-
-
-def scramble_pcie_gen3(data, state=0x1efedc, poly=0x524042):
-    data_out = bytearray()
-    for d in data:
-        b = 0
-        for i in range(8):
-            if state & 1:
-                state = (state >> 1) ^ poly
-                b = b | (1 << i)
-            else:
-                state = state >> 1
-        data_out.append(b ^ d)
-    return data_out
-
-
 async def run_test_scramble(dut, ref_scramble):
 
     data_width = len(dut.data_out)
@@ -133,7 +96,7 @@ async def run_test_scramble(dut, ref_scramble):
 
     block = bytearray(512*byte_lanes)
 
-    scr = ref_scramble(block)
+    scr = ref_scramble().scramble(block)
     scr_iter = iter(chunks(scr, byte_lanes))
 
     dut.enable.value = 1
@@ -164,12 +127,12 @@ if getattr(cocotb, 'top', None) is not None:
 
     if cocotb.top.LFSR_POLY.value == 0x0039:
         factory = TestFactory(run_test_scramble)
-        factory.add_option("ref_scramble", [scramble_pcie])
+        factory.add_option("ref_scramble", [scrambler_pcie])
         factory.generate_tests()
 
     if cocotb.top.LFSR_POLY.value == 0x210125:
         factory = TestFactory(run_test_scramble)
-        factory.add_option("ref_scramble", [scramble_pcie_gen3])
+        factory.add_option("ref_scramble", [scrambler_pcie_gen3])
         factory.generate_tests()
 
 
@@ -12,6 +12,7 @@ Authors:
 import itertools
 import logging
 import os
+import sys
 
 import cocotb_test.simulator
 
@@ -23,6 +24,16 @@ from cocotb.regression import TestFactory
 from cocotbext.axi import AxiStreamSource, AxiStreamSink, AxiStreamBus
 from cocotbext.uart import UartSource, UartSink
 
+try:
+    from prbs import prbs31
+except ImportError:
+    # attempt import from current directory
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+    try:
+        from prbs import prbs31
+    finally:
+        del sys.path[0]
+
 
 class TB:
     def __init__(self, dut, baud=3e6):
@@ -103,16 +114,6 @@ async def run_test_rx(dut, payload_lengths=None, payload_data=None):
     await RisingEdge(dut.clk)
 
 
-def prbs31(state=0x7fffffff):
-    while True:
-        for i in range(8):
-            if bool(state & 0x08000000) ^ bool(state & 0x40000000):
-                state = ((state & 0x3fffffff) << 1) | 1
-            else:
-                state = (state & 0x3fffffff) << 1
-        yield state & 0xff
-
-
 def size_list():
     return list(range(1, 16)) + [128]
 
@@ -122,8 +123,7 @@ def incrementing_payload(length):
 
 
 def prbs_payload(length):
-    gen = prbs31()
-    return bytearray([next(gen) for x in range(length)])
+    return bytearray(prbs31(invert=False).generate(length))
 
 
 if getattr(cocotb, 'top', None) is not None:
@@ -13,6 +13,12 @@ http://www.math.sci.hiroshima-u.ac.jp/~m-mat/MT/MT2002/CODES/mt19937ar.c
 
 """
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
 class mt19937(object):
     def __init__(self):
         self.mt = [0]*624
@@ -46,20 +52,87 @@ class mt19937(object):
                 i = 1
         self.mt[0] = 0x80000000
 
+    def _twist(self):
+        for k in range(623):
+            y = (self.mt[k] & 0x80000000) | (self.mt[k+1] & 0x7fffffff)
+            if k < 624 - 397:
+                self.mt[k] = self.mt[k+397] ^ (y >> 1) ^ (0x9908b0df if y & 1 else 0)
+            else:
+                self.mt[k] = self.mt[k+397-624] ^ (y >> 1) ^ (0x9908b0df if y & 1 else 0)
+
+        y = (self.mt[623] & 0x80000000) | (self.mt[0] & 0x7fffffff)
+        self.mt[623] = self.mt[396] ^ (y >> 1) ^ (0x9908b0df if y & 1 else 0)
+
+    def _twist_array(self, mt):
+        # vectorized twist of a NumPy copy of the state
+        # element k depends on the updated element k-227, so the update
+        # is done in slices of 227, which only depend on earlier slices
+        y = (mt[:-1] & np.uint32(0x80000000)) | (mt[1:] & np.uint32(0x7fffffff))
+        v = (y >> np.uint32(1)) ^ ((y & np.uint32(1)) * np.uint32(0x9908b0df))
+        for k in range(0, 623, 227):
+            end = min(k+227, 623)
+            if k == 0:
+                mt[k:end] = mt[k+397:end+397] ^ v[k:end]
+            else:
+                mt[k:end] = mt[k-227:end-227] ^ v[k:end]
+
+        y = (int(mt[623]) & 0x80000000) | (int(mt[0]) & 0x7fffffff)
+        mt[623] = int(mt[396]) ^ (y >> 1) ^ (0x9908b0df if y & 1 else 0)
+
+    def int32_array(self, n):
+        # next n outputs of int32(), as a NumPy uint32 array if NumPy is
+        # available, otherwise as a list; both give identical values
+        if self.mti == 625:
+            self.seed(5489)
+
+        if np is None:
+            out = []
+            while len(out) < n:
+                if self.mti >= 624:
+                    self._twist()
+                    self.mti = 0
+                k = min(624-self.mti, n-len(out))
+                out.extend(self.mt[self.mti:self.mti+k])
+                self.mti += k
+
+            for i, y in enumerate(out):
+                y ^= (y >> 11)
+                y ^= (y << 7) & 0x9d2c5680
+                y ^= (y << 15) & 0xefc60000
+                y ^= (y >> 18)
+                out[i] = y
+
+            return out
+
+        out = np.empty(n, dtype=np.uint32)
+        mt = np.array(self.mt, dtype=np.uint32)
+
+        i = 0
+        while i < n:
+            if self.mti >= 624:
+                self._twist_array(mt)
+                self.mti = 0
+            k = min(624-self.mti, n-i)
+            out[i:i+k] = mt[self.mti:self.mti+k]
+            self.mti += k
+            i += k
+
+        self.mt = [int(x) for x in mt]
+
+        y = out
+        y ^= (y >> np.uint32(11))
+        y ^= (y << np.uint32(7)) & np.uint32(0x9d2c5680)
+        y ^= (y << np.uint32(15)) & np.uint32(0xefc60000)
+        y ^= (y >> np.uint32(18))
+
+        return y
+
     def int32(self):
         if self.mti >= 624:
             if self.mti == 625:
                 self.seed(5489)
 
-            for k in range(623):
-                y = (self.mt[k] & 0x80000000) | (self.mt[k+1] & 0x7fffffff)
-                if k < 624 - 397:
-                    self.mt[k] = self.mt[k+397] ^ (y >> 1) ^ (0x9908b0df if y & 1 else 0)
-                else:
-                    self.mt[k] = self.mt[k+397-624] ^ (y >> 1) ^ (0x9908b0df if y & 1 else 0)
-
-            y = (self.mt[623] & 0x80000000) | (self.mt[0] & 0x7fffffff)
-            self.mt[623] = self.mt[396] ^ (y >> 1) ^ (0x9908b0df if y & 1 else 0)
+            self._twist()
             self.mti = 0
 
         y = self.mt[self.mti]
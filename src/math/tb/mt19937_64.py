@@ -13,6 +13,12 @@ http://www.math.sci.hiroshima-u.ac.jp/~m-mat/MT/VERSIONS/C-LANG/mt19937-64.c
 
 """
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
 class mt19937_64(object):
     def __init__(self):
         self.mt = [0]*312
@@ -46,20 +52,87 @@ class mt19937_64(object):
                 i = 1
         self.mt[0] = 1 << 63
 
+    def _twist(self):
+        for k in range(311):
+            y = (self.mt[k] & 0xFFFFFFFF80000000) | (self.mt[k+1] & 0x7fffffff)
+            if k < 312 - 156:
+                self.mt[k] = self.mt[k+156] ^ (y >> 1) ^ (0xB5026F5AA96619E9 if y & 1 else 0)
+            else:
+                self.mt[k] = self.mt[k+156-624] ^ (y >> 1) ^ (0xB5026F5AA96619E9 if y & 1 else 0)
+
+        y = (self.mt[311] & 0xFFFFFFFF80000000) | (self.mt[0] & 0x7fffffff)
+        self.mt[311] = self.mt[155] ^ (y >> 1) ^ (0xB5026F5AA96619E9 if y & 1 else 0)
+
+    def _twist_array(self, mt):
+        # vectorized twist of a NumPy copy of the state
+        # element k depends on the updated element k-156, so the update
+        # is done in slices of 156, which only depend on earlier slices
+        y = (mt[:-1] & np.uint64(0xFFFFFFFF80000000)) | (mt[1:] & np.uint64(0x7fffffff))
+        v = (y >> np.uint64(1)) ^ ((y & np.uint64(1)) * np.uint64(0xB5026F5AA96619E9))
+        for k in range(0, 311, 156):
+            end = min(k+156, 311)
+            if k == 0:
+                mt[k:end] = mt[k+156:end+156] ^ v[k:end]
+            else:
+                mt[k:end] = mt[k-156:end-156] ^ v[k:end]
+
+        y = (int(mt[311]) & 0xFFFFFFFF80000000) | (int(mt[0]) & 0x7fffffff)
+        mt[311] = int(mt[155]) ^ (y >> 1) ^ (0xB5026F5AA96619E9 if y & 1 else 0)
+
+    def int64_array(self, n):
+        # next n outputs of int64(), as a NumPy uint64 array if NumPy is
+        # available, otherwise as a list; both give identical values
+        if self.mti == 313:
+            self.seed(5489)
+
+        if np is None:
+            out = []
+            while len(out) < n:
+                if self.mti >= 312:
+                    self._twist()
+                    self.mti = 0
+                k = min(312-self.mti, n-len(out))
+                out.extend(self.mt[self.mti:self.mti+k])
+                self.mti += k
+
+            for i, y in enumerate(out):
+                y ^= (y >> 29) & 0x5555555555555555
+                y ^= (y << 17) & 0x71D67FFFEDA60000
+                y ^= (y << 37) & 0xFFF7EEE000000000
+                y ^= (y >> 43)
+                out[i] = y
+
+            return out
+
+        out = np.empty(n, dtype=np.uint64)
+        mt = np.array(self.mt, dtype=np.uint64)
+
+        i = 0
+        while i < n:
+            if self.mti >= 312:
+                self._twist_array(mt)
+                self.mti = 0
+            k = min(312-self.mti, n-i)
+            out[i:i+k] = mt[self.mti:self.mti+k]
+            self.mti += k
+            i += k
+
+        self.mt = [int(x) for x in mt]
+
+        y = out
+        y ^= (y >> np.uint64(29)) & np.uint64(0x5555555555555555)
+        y ^= (y << np.uint64(17)) & np.uint64(0x71D67FFFEDA60000)
+        y ^= (y << np.uint64(37)) & np.uint64(0xFFF7EEE000000000)
+        y ^= (y >> np.uint64(43))
+
+        return y
+
     def int64(self):
         if self.mti >= 312:
             if self.mti == 313:
                 self.seed(5489)
 
-            for k in range(311):
-                y = (self.mt[k] & 0xFFFFFFFF80000000) | (self.mt[k+1] & 0x7fffffff)
-                if k < 312 - 156:
-                    self.mt[k] = self.mt[k+156] ^ (y >> 1) ^ (0xB5026F5AA96619E9 if y & 1 else 0)
-                else:
-                    self.mt[k] = self.mt[k+156-624] ^ (y >> 1) ^ (0xB5026F5AA96619E9 if y & 1 else 0)
-
-            y = (self.mt[311] & 0xFFFFFFFF80000000) | (self.mt[0] & 0x7fffffff)
-            self.mt[311] = self.mt[155] ^ (y >> 1) ^ (0xB5026F5AA96619E9 if y & 1 else 0)
+            self._twist()
             self.mti = 0
 
         y = self.mt[self.mti]
@@ -62,7 +62,7 @@ class TB(object):
         await RisingEdge(self.dut.clk)
 
 
-async def run_test(dut, seed=None, backpressure_inserter=None):
+async def run_test(dut, seed=None, backpressure_inserter=None, count=2000):
 
     tb = TB(dut)
 
@@ -87,13 +87,14 @@ async def run_test(dut, seed=None, backpressure_inserter=None):
 
     tb.sink.clear()
 
-    for i in range(1000):
+    if dut.MT_W.value == 32:
+        ref = mt.int32_array(count)
+    else:
+        ref = mt.int64_array(count)
+
+    for i in range(count):
         frame = await tb.sink.recv()
-        if dut.MT_W.value == 32:
-            ref = mt.int32()
-        else:
-            ref = mt.int64()
-        assert frame.tdata[0] == ref
+        assert frame.tdata[0] == ref[i]
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
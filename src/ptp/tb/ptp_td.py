@@ -20,7 +20,190 @@ from cocotb.utils import get_sim_time
 from cocotbext.eth.reset import Reset
 
 
-class PtpTdSource(Reset):
+NS_PER_S = 1000000000
+
+
+class PtpTdTime:
+    """Closed-form model of the PTP TD timestamp
+
+    Instead of stepping the timestamp on every clock cycle, the state
+    (ToD, relative, fns, drift counter) is recorded as an epoch along with
+    the period and drift in effect at a particular cycle count.  The state
+    at any later cycle is then derived exactly from the number of elapsed
+    cycles.  Any update to the state or to the period starts a new epoch.
+
+    Epochs are kept in a fixed-size ring buffer, so the timestamp at any
+    past cycle covered by the retained epochs can be recovered by passing
+    the cycle number (see the cycle attribute) to the get_ts_* methods.
+    """
+
+    def _init_time(self, history=1024):
+        self.cycle = 0
+
+        self.period_ns = 0
+        self.period_fns = 0
+        self.drift_num = 0
+        self.drift_denom = 0
+
+        # epoch history ring buffer, one array per field:
+        # cycle, tod_s, tod_ns, rel_ns, fns, drift_cnt, inc, drift_num, drift_denom
+        self._hist_size = max(int(history), 1)
+        self._hist = [[0]*self._hist_size for k in range(9)]
+        self._hist_head = 1
+        self._hist_count = 1
+
+        self._epoch = (0, 0, 0, 0, 0, 0, 0, 0, 0)
+
+        self._state_cache = None
+        self._pps_cycle = None
+
+    @staticmethod
+    def _epoch_fns(epoch, k):
+        # total fns (including carry into ns) and drift counter k cycles after epoch
+        c0, tod_s, tod_ns, rel_ns, fns, drift_cnt, inc, num, denom = epoch
+
+        fns += k*inc
+
+        if denom:
+            if k > drift_cnt:
+                k -= drift_cnt + 1
+                fns += (k // denom + 1) * num
+                drift_cnt = denom - 1 - k % denom
+            else:
+                drift_cnt -= k
+
+        return fns, drift_cnt
+
+    def _get_epoch(self, cycle):
+        if cycle >= self._epoch[0]:
+            return self._epoch
+
+        size = self._hist_size
+        cycles = self._hist[0]
+        oldest = (self._hist_head - self._hist_count) % size
+
+        if cycle < cycles[oldest]:
+            raise ValueError(f"Timestamp history not available for cycle {cycle}")
+
+        # find most recent epoch starting at or before cycle
+        lo = 0
+        hi = self._hist_count-1
+        while lo < hi:
+            mid = (lo+hi+1) // 2
+            if cycles[(oldest+mid) % size] <= cycle:
+                lo = mid
+            else:
+                hi = mid-1
+
+        index = (oldest+lo) % size
+        return tuple(field[index] for field in self._hist)
+
+    def _get_state(self, cycle=None):
+        if cycle is None:
+            cycle = self.cycle
+
+        cache = self._state_cache
+        if cache is not None and cache[0] == cycle:
+            return cache[1]
+
+        epoch = self._get_epoch(cycle)
+        c0, tod_s, tod_ns, rel_ns, fns, drift_cnt = epoch[:6]
+        k = cycle - c0
+
+        if k > 0:
+            fns, drift_cnt = self._epoch_fns(epoch, k)
+
+            ns_inc = fns >> 32
+            fns &= 0xffffffff
+
+            rel_ns = (rel_ns + ns_inc) & 0xffffffffffff
+
+            s_inc, tod_ns = divmod(tod_ns + ns_inc, NS_PER_S)
+            tod_s += s_inc
+
+        state = (tod_s, tod_ns, rel_ns, fns, drift_cnt)
+        self._state_cache = (cycle, state)
+        return state
+
+    def _set_state(self, tod_s, tod_ns, rel_ns, fns, drift_cnt):
+        inc = (self.period_ns << 32) + self.period_fns
+        self._epoch = (self.cycle, int(tod_s), int(tod_ns), int(rel_ns), int(fns), int(drift_cnt),
+            inc, self.drift_num, self.drift_denom)
+
+        size = self._hist_size
+        index = (self._hist_head-1) % size
+        if self._hist[0][index] != self.cycle:
+            # new epoch, overwriting the oldest entry when full
+            index = self._hist_head
+            self._hist_head = (index+1) % size
+            self._hist_count = min(self._hist_count+1, size)
+        # else: replace epoch started in the same cycle
+
+        for field, val in zip(self._hist, self._epoch):
+            field[index] = val
+
+        self._state_cache = None
+        self._update_pps_cycle()
+
+    def _update_pps_cycle(self):
+        epoch = self._epoch
+        c0, tod_s, tod_ns, rel_ns, fns, drift_cnt, inc, num, denom = epoch
+
+        if denom:
+            rate = inc + Fraction(num, denom)
+        else:
+            rate = inc
+
+        if rate <= 0:
+            self._pps_cycle = None
+            return
+
+        k0 = self.cycle - c0
+        if k0 > 0:
+            sec = (tod_ns + (self._epoch_fns(epoch, k0)[0] >> 32)) // NS_PER_S
+        else:
+            sec = 0
+
+        # find first cycle where the accumulated ns crosses the next second
+        target = ((sec+1)*NS_PER_S - tod_ns) << 32
+        k = max(k0+1, -(-(target - fns) // rate))
+        while self._epoch_fns(epoch, k)[0] < target:
+            k += 1
+        while k > k0+1 and self._epoch_fns(epoch, k-1)[0] >= target:
+            k -= 1
+
+        self._pps_cycle = c0 + int(k)
+
+    def _step(self):
+        self.cycle += 1
+
+        if self.cycle == self._pps_cycle:
+            self.log.info("Seconds rollover")
+            self.pps.set()
+            self._update_pps_cycle()
+
+    @property
+    def ts_tod_s(self):
+        return self._get_state()[0]
+
+    @property
+    def ts_tod_ns(self):
+        return self._get_state()[1]
+
+    @property
+    def ts_rel_ns(self):
+        return self._get_state()[2]
+
+    @property
+    def ts_fns(self):
+        return self._get_state()[3]
+
+    @property
+    def drift_cnt(self):
+        return self._get_state()[4]
+
+
+class PtpTdSource(PtpTdTime, Reset):
     def __init__(self,
             data=None,
             clock=None,
@@ -28,6 +211,7 @@ class PtpTdSource(Reset):
             reset_active_level=True,
             period_ns=6.4,
             td_delay=32,
+            ts_history=1024,
             *args, **kwargs):
 
         self.log = logging.getLogger(f"cocotb.{data._path}")
@@ -43,20 +227,17 @@ class PtpTdSource(Reset):
 
         self.ctx = Context(prec=60)
 
-        self.period_ns = 0
-        self.period_fns = 0
-        self.drift_num = 0
-        self.drift_denom = 0
-        self.drift_cnt = 0
-        self.set_period_ns(period_ns)
+        self.td_delay = td_delay
 
-        self.ts_fns = 0
+        self._msg_period = 256
 
-        self.ts_rel_ns = 0
-        self.ts_rel_updated = False
+        self.pps = Event()
+
+        self._init_time(ts_history)
+
+        self.set_period_ns(period_ns)
 
-        self.ts_tod_s = 0
-        self.ts_tod_ns = 0
+        self.ts_rel_updated = False
         self.ts_tod_updated = False
 
         self.ts_tod_offset_ns = 0
@@ -64,25 +245,23 @@ class PtpTdSource(Reset):
         self.ts_tod_alt_s = 0
         self.ts_tod_alt_offset_ns = 0
 
-        self.td_delay = td_delay
-
-        self.timestamp_delay = [(0, 0, 0, 0)]
-
         self.data.setimmediatevalue(1)
 
-        self.pps = Event()
-
         self._run_cr = None
 
         self._init_reset(reset, reset_active_level)
 
     def set_period(self, ns, fns):
+        state = self._get_state()
         self.period_ns = int(ns)
         self.period_fns = int(fns) & 0xffffffff
+        self._set_state(*state)
 
     def set_drift(self, num, denom):
+        state = self._get_state()
         self.drift_num = int(num)
         self.drift_denom = int(denom)
+        self._set_state(*state)
 
     def set_period_ns(self, t):
         t = Decimal(t)
@@ -103,9 +282,8 @@ class PtpTdSource(Reset):
         return p / Decimal(2**32)
 
     def set_ts_tod(self, ts_s, ts_ns, ts_fns):
-        self.ts_tod_s = int(ts_s)
-        self.ts_tod_ns = int(ts_ns)
-        self.ts_fns = int(ts_fns)
+        tod_s, tod_ns, rel_ns, fns, drift_cnt = self._get_state()
+        self._set_state(ts_s, ts_ns, rel_ns, ts_fns, drift_cnt)
         self.ts_tod_updated = True
 
     def set_ts_tod_64(self, ts):
@@ -125,26 +303,35 @@ class PtpTdSource(Reset):
     def set_ts_tod_sim_time(self):
         self.set_ts_tod_ns(Decimal(get_sim_time('fs')).scaleb(-6))
 
-    def get_ts_tod(self):
-        ts_tod_s, ts_tod_ns, ts_rel_ns, ts_fns = self.timestamp_delay[0]
+    def _get_delayed_state(self, cycle=None):
+        # timestamp as seen by the leaf clocks after the message and pipeline delay
+        if cycle is None:
+            cycle = self.cycle
+        cycle -= 14*17+self.td_delay
+        if cycle < 0:
+            return (0, 0, 0, 0, 0)
+        return self._get_state(cycle)
+
+    def get_ts_tod(self, cycle=None):
+        ts_tod_s, ts_tod_ns, ts_rel_ns, ts_fns, drift_cnt = self._get_delayed_state(cycle)
         return (ts_tod_s, ts_tod_ns, ts_fns)
 
-    def get_ts_tod_96(self):
-        ts_tod_s, ts_tod_ns, ts_fns = self.get_ts_tod()
+    def get_ts_tod_96(self, cycle=None):
+        ts_tod_s, ts_tod_ns, ts_fns = self.get_ts_tod(cycle)
         return (ts_tod_s << 48) | (ts_tod_ns << 16) | (ts_fns >> 16)
 
-    def get_ts_tod_ns(self):
-        ts_tod_s, ts_tod_ns, ts_fns = self.get_ts_tod()
+    def get_ts_tod_ns(self, cycle=None):
+        ts_tod_s, ts_tod_ns, ts_fns = self.get_ts_tod(cycle)
         ns = Decimal(ts_fns) / Decimal(2**32)
         ns = self.ctx.add(ns, Decimal(ts_tod_ns))
         return self.ctx.add(ns, Decimal(ts_tod_s).scaleb(9))
 
-    def get_ts_tod_s(self):
-        return self.get_ts_tod_ns().scaleb(-9, self.ctx)
+    def get_ts_tod_s(self, cycle=None):
+        return self.get_ts_tod_ns(cycle).scaleb(-9, self.ctx)
 
     def set_ts_rel(self, ts_ns, ts_fns):
-        self.ts_rel_ns = int(ts_ns)
-        self.ts_fns = int(ts_fns)
+        tod_s, tod_ns, rel_ns, fns, drift_cnt = self._get_state()
+        self._set_state(tod_s, tod_ns, ts_ns, ts_fns, drift_cnt)
         self.ts_rel_updated = True
 
     def set_ts_rel_64(self, ts):
@@ -163,20 +350,20 @@ class PtpTdSource(Reset):
     def set_ts_rel_sim_time(self):
         self.set_ts_rel_ns(Decimal(get_sim_time('fs')).scaleb(-6))
 
-    def get_ts_rel(self):
-        ts_tod_s, ts_tod_ns, ts_rel_ns, ts_fns = self.timestamp_delay[0]
+    def get_ts_rel(self, cycle=None):
+        ts_tod_s, ts_tod_ns, ts_rel_ns, ts_fns, drift_cnt = self._get_delayed_state(cycle)
         return (ts_rel_ns, ts_fns)
 
-    def get_ts_rel_64(self):
-        ts_rel_ns, ts_fns = self.get_ts_rel()
+    def get_ts_rel_64(self, cycle=None):
+        ts_rel_ns, ts_fns = self.get_ts_rel(cycle)
         return (ts_rel_ns << 16) | (ts_fns >> 16)
 
-    def get_ts_rel_ns(self):
-        ts_rel_ns, ts_fns = self.get_ts_rel()
+    def get_ts_rel_ns(self, cycle=None):
+        ts_rel_ns, ts_fns = self.get_ts_rel(cycle)
         return self.ctx.add(Decimal(ts_fns) / Decimal(2**32), Decimal(ts_rel_ns))
 
-    def get_ts_rel_s(self):
-        return self.get_ts_rel_ns().scaleb(-9, self.ctx)
+    def get_ts_rel_s(self, cycle=None):
+        return self.get_ts_rel_ns(cycle).scaleb(-9, self.ctx)
 
     def _handle_reset(self, state):
         if state:
@@ -185,11 +372,7 @@ class PtpTdSource(Reset):
                 self._run_cr.kill()
                 self._run_cr = None
 
-            self.ts_tod_s = 0
-            self.ts_tod_ns = 0
-            self.ts_rel_ns = 0
-            self.ts_fns = 0
-            self.drift_cnt = 0
+            self._set_state(0, 0, 0, 0, 0)
 
             self.data.value = 1
         else:
@@ -197,148 +380,140 @@ class PtpTdSource(Reset):
             if self._run_cr is None:
                 self._run_cr = cocotb.start_soon(self._run())
 
-    async def _run(self):
-        clock_edge_event = RisingEdge(self.clock)
-        msg_index = 0
-        msg = None
-        msg_delay = 0
-        word = None
-        bit_index = 0
+    def _build_msg(self, msg_index):
+        ts_tod_s, ts_tod_ns, ts_rel_ns, ts_fns, drift_cnt = self._get_state()
 
-        while True:
-            await clock_edge_event
-
-            # delay timestamp
-            self.timestamp_delay.append((self.ts_tod_s, self.ts_tod_ns, self.ts_rel_ns, self.ts_fns))
-            while len(self.timestamp_delay) > 14*17+self.td_delay:
-                self.timestamp_delay.pop(0)
+        # compute offset for current second
+        self.ts_tod_offset_ns = (ts_tod_ns - ts_rel_ns) & 0xffffffff
 
-            # increment fns portion
-            self.ts_fns += ((self.period_ns << 32) + self.period_fns)
+        # compute alternate offset
+        if ts_tod_ns >> 27 == 7:
+            # latter portion of second; compute offset for next second
+            self.ts_tod_alt_s = ts_tod_s+1
+            self.ts_tod_alt_offset_ns = (self.ts_tod_offset_ns - 1000000000) & 0xffffffff
+        else:
+            # former portion of second; compute offset for previous second
+            self.ts_tod_alt_s = ts_tod_s-1
+            self.ts_tod_alt_offset_ns = (self.ts_tod_offset_ns + 1000000000) & 0xffffffff
 
-            if self.drift_denom:
-                if self.drift_cnt > 0:
-                    self.drift_cnt -= 1
-                else:
-                    self.drift_cnt = self.drift_denom-1
-                    self.ts_fns += self.drift_num
+        msg = []
 
-            ns_inc = self.ts_fns >> 32
-            self.ts_fns &= 0xffffffff
+        # word 0: control
+        ctrl = 0
+        ctrl |= msg_index & 0xf
+        ctrl |= bool(self.ts_rel_updated) << 8
+        ctrl |= bool(ts_tod_s & 1) << 9
+        self.ts_rel_updated = False
+        msg.append(ctrl)
+
+        if msg_index == 0:
+            # msg 0 word 1: current ToD TS ns 15:0
+            msg.append(ts_tod_ns & 0xffff)
+            # msg 0 word 2: current ToD TS ns 29:16 and flag bit
+            msg.append(((ts_tod_ns >> 16) & 0x3fff) | (0x8000 if self.ts_tod_updated else 0))
+            self.ts_tod_updated = False
+            # msg 0 word 3: current ToD TS seconds 15:0
+            msg.append(ts_tod_s & 0xffff)
+            # msg 0 word 4: current ToD TS seconds 31:16
+            msg.append((ts_tod_s >> 16) & 0xffff)
+            # msg 0 word 5: current ToD TS seconds 47:32
+            msg.append((ts_tod_s >> 32) & 0xffff)
+        elif msg_index == 1:
+            # msg 1 word 1: current ToD TS ns offset 15:0
+            msg.append(self.ts_tod_offset_ns & 0xffff)
+            # msg 1 word 2: current ToD TS ns offset 31:16
+            msg.append((self.ts_tod_offset_ns >> 16) & 0xffff)
+            # msg 1 word 3: drift num
+            msg.append(self.drift_num)
+            # msg 1 word 4: drift denom
+            msg.append(self.drift_denom)
+            # msg 1 word 5: drift state
+            msg.append(drift_cnt)
+        elif msg_index == 2:
+            # msg 2 word 1: alternate ToD TS ns offset 15:0
+            msg.append(self.ts_tod_alt_offset_ns & 0xffff)
+            # msg 2 word 2: alternate ToD TS ns offset 31:16
+            msg.append((self.ts_tod_alt_offset_ns >> 16) & 0xffff)
+            # msg 2 word 3: alternate ToD TS seconds 15:0
+            msg.append(self.ts_tod_alt_s & 0xffff)
+            # msg 2 word 4: alternate ToD TS seconds 31:16
+            msg.append((self.ts_tod_alt_s >> 16) & 0xffff)
+            # msg 2 word 5: alternate ToD TS seconds 47:32
+            msg.append((self.ts_tod_alt_s >> 32) & 0xffff)
+
+        # word 6: current fns 15:0
+        msg.append(ts_fns & 0xffff)
+        # word 7: current fns 31:16
+        msg.append((ts_fns >> 16) & 0xffff)
+        # word 8: current relative TS ns 15:0
+        msg.append(ts_rel_ns & 0xffff)
+        # word 9: current relative TS ns 31:16
+        msg.append((ts_rel_ns >> 16) & 0xffff)
+        # word 10: current relative TS ns 47:32
+        msg.append((ts_rel_ns >> 32) & 0xffff)
+        # word 11: current phase increment fns 15:0
+        msg.append(self.period_fns & 0xffff)
+        # word 12: current phase increment fns 31:16
+        msg.append((self.period_fns >> 16) & 0xffff)
+        # word 13: current phase increment ns 7:0 + crc
+        msg.append(self.period_ns & 0xff)
+
+        return msg
+
+    def _serialize_msg(self, msg):
+        # pack message into bit stream, one bit per clock cycle
+        # each word is sent as a start bit (0) followed by 16 data bits, LSB first,
+        # and the line idles high for the remainder of the message period
+        bits = 0
+        for k, word in enumerate(msg):
+            bits |= (word & 0xffff) << (17*k+1)
+        bits |= ((1 << self._msg_period) - 1) & ~((1 << 17*len(msg)) - 1)
+
+        # determine offsets where the line changes level, starting from idle
+        changes = (bits ^ ((bits << 1) | 1)) & ((1 << self._msg_period) - 1)
+        sched = []
+        while changes:
+            lsb = changes & -changes
+            sched.append(lsb.bit_length()-1)
+            changes ^= lsb
+        sched.append(self._msg_period)
+        return sched
 
-            # increment relative timestamp
-            self.ts_rel_ns = (self.ts_rel_ns + ns_inc) & 0xffffffffffff
+    async def _run(self):
+        clock_edge_event = RisingEdge(self.clock)
+        msg_index = 0
+        offset = 0
+        sched = [self._msg_period]
+        sched_index = 0
+        next_change = self._msg_period
+        level = 1
 
-            # increment ToD timestamp
-            self.ts_tod_ns = self.ts_tod_ns + ns_inc
+        while True:
+            await clock_edge_event
 
-            if self.ts_tod_ns >= 1000000000:
-                self.log.info("Seconds rollover")
-                self.pps.set()
-                self.ts_tod_s += 1
-                self.ts_tod_ns -= 1000000000
+            # timestamp is derived from the cycle count
+            self._step()
 
-            # compute offset for current second
-            self.ts_tod_offset_ns = (self.ts_tod_ns - self.ts_rel_ns) & 0xffffffff
+            if offset == 0:
+                # build and serialize message
+                sched = self._serialize_msg(self._build_msg(msg_index))
+                sched_index = 0
+                next_change = sched[0]
+                msg_index = (msg_index + 1) % 3
 
-            # compute alternate offset
-            if self.ts_tod_ns >> 27 == 7:
-                # latter portion of second; compute offset for next second
-                self.ts_tod_alt_s = self.ts_tod_s+1
-                self.ts_tod_alt_offset_ns = (self.ts_tod_offset_ns - 1000000000) & 0xffffffff
-            else:
-                # former portion of second; compute offset for previous second
-                self.ts_tod_alt_s = self.ts_tod_s-1
-                self.ts_tod_alt_offset_ns = (self.ts_tod_offset_ns + 1000000000) & 0xffffffff
-
-            if msg_delay <= 0:
-                # build message
-
-                msg = []
-
-                # word 0: control
-                ctrl = 0
-                ctrl |= msg_index & 0xf
-                ctrl |= bool(self.ts_rel_updated) << 8
-                ctrl |= bool(self.ts_tod_s & 1) << 9
-                self.ts_rel_updated = False
-                msg.append(ctrl)
-
-                if msg_index == 0:
-                    # msg 0 word 1: current ToD TS ns 15:0
-                    msg.append(self.ts_tod_ns & 0xffff)
-                    # msg 0 word 2: current ToD TS ns 29:16 and flag bit
-                    msg.append(((self.ts_tod_ns >> 16) & 0x3fff) | (0x8000 if self.ts_tod_updated else 0))
-                    self.ts_tod_updated = False
-                    # msg 0 word 3: current ToD TS seconds 15:0
-                    msg.append(self.ts_tod_s & 0xffff)
-                    # msg 0 word 4: current ToD TS seconds 31:16
-                    msg.append((self.ts_tod_s >> 16) & 0xffff)
-                    # msg 0 word 5: current ToD TS seconds 47:32
-                    msg.append((self.ts_tod_s >> 32) & 0xffff)
-                    msg_index = 1
-                elif msg_index == 1:
-                    # msg 1 word 1: current ToD TS ns offset 15:0
-                    msg.append(self.ts_tod_offset_ns & 0xffff)
-                    # msg 1 word 2: current ToD TS ns offset 31:16
-                    msg.append((self.ts_tod_offset_ns >> 16) & 0xffff)
-                    # msg 1 word 3: drift num
-                    msg.append(self.drift_num)
-                    # msg 1 word 4: drift denom
-                    msg.append(self.drift_denom)
-                    # msg 1 word 5: drift state
-                    msg.append(self.drift_cnt)
-                    msg_index = 2
-                elif msg_index == 2:
-                    # msg 2 word 1: alternate ToD TS ns offset 15:0
-                    msg.append(self.ts_tod_alt_offset_ns & 0xffff)
-                    # msg 2 word 2: alternate ToD TS ns offset 31:16
-                    msg.append((self.ts_tod_alt_offset_ns >> 16) & 0xffff)
-                    # msg 2 word 3: alternate ToD TS seconds 15:0
-                    msg.append(self.ts_tod_alt_s & 0xffff)
-                    # msg 2 word 4: alternate ToD TS seconds 31:16
-                    msg.append((self.ts_tod_alt_s >> 16) & 0xffff)
-                    # msg 2 word 5: alternate ToD TS seconds 47:32
-                    msg.append((self.ts_tod_alt_s >> 32) & 0xffff)
-                    msg_index = 0
-
-                # word 6: current fns 15:0
-                msg.append(self.ts_fns & 0xffff)
-                # word 7: current fns 31:16
-                msg.append((self.ts_fns >> 16) & 0xffff)
-                # word 8: current relative TS ns 15:0
-                msg.append(self.ts_rel_ns & 0xffff)
-                # word 9: current relative TS ns 31:16
-                msg.append((self.ts_rel_ns >> 16) & 0xffff)
-                # word 10: current relative TS ns 47:32
-                msg.append((self.ts_rel_ns >> 32) & 0xffff)
-                # word 11: current phase increment fns 15:0
-                msg.append(self.period_fns & 0xffff)
-                # word 12: current phase increment fns 31:16
-                msg.append((self.period_fns >> 16) & 0xffff)
-                # word 13: current phase increment ns 7:0 + crc
-                msg.append(self.period_ns & 0xff)
-
-                msg_delay = 255
-            else:
-                msg_delay -= 1
+            # only drive the line when the level changes
+            if offset == next_change:
+                level ^= 1
+                self.data.value = level
+                sched_index += 1
+                next_change = sched[sched_index]
 
-            # serialize message
-            if word is None:
-                if msg:
-                    word = msg.pop(0)
-                    bit_index = 0
-                    self.data.value = 0
-                else:
-                    self.data.value = 1
-            else:
-                self.data.value = bool((word >> bit_index) & 1)
-                bit_index += 1
-                if bit_index == 16:
-                    word = None
+            offset += 1
+            if offset == self._msg_period:
+                offset = 0
 
 
-class PtpTdSink(Reset):
+class PtpTdSink(PtpTdTime, Reset):
     def __init__(self,
             data=None,
             clock=None,
@@ -346,6 +521,7 @@ class PtpTdSink(Reset):
             reset_active_level=True,
             period_ns=6.4,
             td_delay=32,
+            ts_history=1024,
             *args, **kwargs):
 
         self.log = logging.getLogger(f"cocotb.{data._path}")
@@ -361,29 +537,17 @@ class PtpTdSink(Reset):
 
         self.ctx = Context(prec=60)
 
-        self.period_ns = 0
-        self.period_fns = 0
-        self.drift_num = 0
-        self.drift_denom = 0
-
-        self.ts_fns = 0
+        self.td_delay = td_delay
 
-        self.ts_rel_ns = 0
+        self.pps = Event()
 
-        self.ts_tod_s = 0
-        self.ts_tod_ns = 0
+        self._init_time(ts_history)
 
         self.ts_tod_offset_ns = 0
 
         self.ts_tod_alt_s = 0
         self.ts_tod_alt_offset_ns = 0
 
-        self.td_delay = td_delay
-
-        self.drift_cnt = 0
-
-        self.pps = Event()
-
         self._run_cr = None
 
         self._init_reset(reset, reset_active_level)
@@ -394,35 +558,37 @@ class PtpTdSink(Reset):
             return p + Decimal(self.drift_num) / Decimal(self.drift_denom)
         return p / Decimal(2**32)
 
-    def get_ts_tod(self):
-        return (self.ts_tod_s, self.ts_tod_ns, self.ts_fns)
+    def get_ts_tod(self, cycle=None):
+        ts_tod_s, ts_tod_ns, ts_rel_ns, ts_fns, drift_cnt = self._get_state(cycle)
+        return (ts_tod_s, ts_tod_ns, ts_fns)
 
-    def get_ts_tod_96(self):
-        ts_tod_s, ts_tod_ns, ts_fns = self.get_ts_tod()
+    def get_ts_tod_96(self, cycle=None):
+        ts_tod_s, ts_tod_ns, ts_fns = self.get_ts_tod(cycle)
         return (ts_tod_s << 48) | (ts_tod_ns << 16) | (ts_fns >> 16)
 
-    def get_ts_tod_ns(self):
-        ts_tod_s, ts_tod_ns, ts_fns = self.get_ts_tod()
+    def get_ts_tod_ns(self, cycle=None):
+        ts_tod_s, ts_tod_ns, ts_fns = self.get_ts_tod(cycle)
         ns = Decimal(ts_fns) / Decimal(2**32)
         ns = self.ctx.add(ns, Decimal(ts_tod_ns))
         return self.ctx.add(ns, Decimal(ts_tod_s).scaleb(9))
 
-    def get_ts_tod_s(self):
-        return self.get_ts_tod_ns().scaleb(-9, self.ctx)
+    def get_ts_tod_s(self, cycle=None):
+        return self.get_ts_tod_ns(cycle).scaleb(-9, self.ctx)
 
-    def get_ts_rel(self):
-        return (self.ts_rel_ns, self.ts_fns)
+    def get_ts_rel(self, cycle=None):
+        ts_tod_s, ts_tod_ns, ts_rel_ns, ts_fns, drift_cnt = self._get_state(cycle)
+        return (ts_rel_ns, ts_fns)
 
-    def get_ts_rel_64(self):
-        ts_rel_ns, ts_fns = self.get_ts_rel()
+    def get_ts_rel_64(self, cycle=None):
+        ts_rel_ns, ts_fns = self.get_ts_rel(cycle)
         return (ts_rel_ns << 16) | (ts_fns >> 16)
 
-    def get_ts_rel_ns(self):
-        ts_rel_ns, ts_fns = self.get_ts_rel()
+    def get_ts_rel_ns(self, cycle=None):
+        ts_rel_ns, ts_fns = self.get_ts_rel(cycle)
         return self.ctx.add(Decimal(ts_fns) / Decimal(2**32), Decimal(ts_rel_ns))
 
-    def get_ts_rel_s(self):
-        return self.get_ts_rel_ns().scaleb(-9, self.ctx)
+    def get_ts_rel_s(self, cycle=None):
+        return self.get_ts_rel_ns(cycle).scaleb(-9, self.ctx)
 
     def _handle_reset(self, state):
         if state:
@@ -431,11 +597,7 @@ class PtpTdSink(Reset):
                 self._run_cr.kill()
                 self._run_cr = None
 
-            self.ts_tod_s = 0
-            self.ts_tod_ns = 0
-            self.ts_rel_ns = 0
-            self.ts_fns = 0
-            self.drift_cnt = 0
+            self._set_state(0, 0, 0, 0, 0)
 
             self.data.value = 1
         else:
@@ -443,9 +605,94 @@ class PtpTdSink(Reset):
             if self._run_cr is None:
                 self._run_cr = cocotb.start_soon(self._run())
 
+    def _process_msg(self, msg):
+        self.log.info("process message %r", msg)
+
+        ts_tod_s, ts_tod_ns, ts_rel_ns, ts_fns, drift_cnt = self._get_state()
+
+        # word 0: control
+        msg_index = msg[0] & 0xf
+
+        if msg_index == 0:
+            # msg 0 word 1: current ToD TS ns 15:0
+            # msg 0 word 2: current ToD TS ns 29:16
+            val = ((msg[2] & 0x3fff) << 16) | msg[1]
+            if ts_tod_ns != val:
+                self.log.info("update ts_tod_ns: old 0x%x, new 0x%x", ts_tod_ns, val)
+                ts_tod_ns = val
+            # msg 0 word 3: current ToD TS seconds 15:0
+            # msg 0 word 4: current ToD TS seconds 31:16
+            # msg 0 word 5: current ToD TS seconds 47:32
+            val = (msg[5] << 32) | (msg[4] << 16) | msg[3]
+            if ts_tod_s != val:
+                self.log.info("update ts_tod_s: old 0x%x, new 0x%x", ts_tod_s, val)
+                ts_tod_s = val
+        elif msg_index == 1:
+            # msg 1 word 1: current ToD TS ns offset 15:0
+            # msg 1 word 2: current ToD TS ns offset 31:16
+            val = (msg[2] << 16) | msg[1]
+            if self.ts_tod_offset_ns != val:
+                self.log.info("update ts_tod_offset_ns: old 0x%x, new 0x%x", self.ts_tod_offset_ns, val)
+                self.ts_tod_offset_ns = val
+            # msg 1 word 3: drift num
+            val = msg[3]
+            if self.drift_num != val:
+                self.log.info("update drift_num: old 0x%x, new 0x%x", self.drift_num, val)
+                self.drift_num = val
+            # msg 1 word 4: drift denom
+            val = msg[4]
+            if self.drift_denom != val:
+                self.log.info("update drift_denom: old 0x%x, new 0x%x", self.drift_denom, val)
+                self.drift_denom = val
+            # msg 1 word 5: drift state
+            val = msg[5]
+            if drift_cnt != val:
+                self.log.info("update drift_cnt: old 0x%x, new 0x%x", drift_cnt, val)
+                drift_cnt = val
+        elif msg_index == 2:
+            # msg 2 word 1: alternate ToD TS ns offset 15:0
+            # msg 2 word 2: alternate ToD TS ns offset 31:16
+            val = (msg[2] << 16) | msg[1]
+            if self.ts_tod_alt_offset_ns != val:
+                self.log.info("update ts_tod_alt_offset_ns: old 0x%x, new 0x%x", self.ts_tod_alt_offset_ns, val)
+                self.ts_tod_alt_offset_ns = val
+            # msg 2 word 3: alternate ToD TS seconds 15:0
+            # msg 2 word 4: alternate ToD TS seconds 31:16
+            # msg 2 word 5: alternate ToD TS seconds 47:32
+            val = (msg[5] << 32) | (msg[4] << 16) | msg[3]
+            if self.ts_tod_alt_s != val:
+                self.log.info("update ts_tod_alt_s: old 0x%x, new 0x%x", self.ts_tod_alt_s, val)
+                self.ts_tod_alt_s = val
+
+        # word 6: current fns 15:0
+        # word 7: current fns 31:16
+        val = (msg[7] << 16) | msg[6]
+        if ts_fns != val:
+            self.log.info("update ts_fns: old 0x%x, new 0x%x", ts_fns, val)
+            ts_fns = val
+        # word 8: current relative TS ns 15:0
+        # word 9: current relative TS ns 31:16
+        # word 10: current relative TS ns 47:32
+        val = (msg[10] << 32) | (msg[9] << 16) | msg[8]
+        if ts_rel_ns != val:
+            self.log.info("update ts_rel_ns: old 0x%x, new 0x%x", ts_rel_ns, val)
+            ts_rel_ns = val
+        # word 11: current phase increment fns 15:0
+        # word 12: current phase increment fns 31:16
+        val = (msg[12] << 16) | msg[11]
+        if self.period_fns != val:
+            self.log.info("update period_fns: old 0x%x, new 0x%x", self.period_fns, val)
+            self.period_fns = val
+        # word 13: current phase increment ns 7:0 + crc
+        val = msg[13] & 0xff
+        if self.period_ns != val:
+            self.log.info("update period_ns: old 0x%x, new 0x%x", self.period_ns, val)
+            self.period_ns = val
+
+        self._set_state(ts_tod_s, ts_tod_ns, ts_rel_ns, ts_fns, drift_cnt)
+
     async def _run(self):
         clock_edge_event = RisingEdge(self.clock)
-        msg_index = 0
         msg = None
         msg_delay = 0
         cur_msg = []
@@ -457,117 +704,15 @@ class PtpTdSink(Reset):
 
             sdi_sample = int(self.data.value)
 
-            # increment fns portion
-            self.ts_fns += ((self.period_ns << 32) + self.period_fns)
-
-            if self.drift_denom:
-                if self.drift_cnt > 0:
-                    self.drift_cnt -= 1
-                else:
-                    self.drift_cnt = self.drift_denom-1
-                    self.ts_fns += self.drift_num
-
-            ns_inc = self.ts_fns >> 32
-            self.ts_fns &= 0xffffffff
-
-            # increment relative timestamp
-            self.ts_rel_ns = (self.ts_rel_ns + ns_inc) & 0xffffffffffff
-
-            # increment ToD timestamp
-            self.ts_tod_ns = self.ts_tod_ns + ns_inc
-
-            if self.ts_tod_ns >= 1000000000:
-                self.log.info("Seconds rollover")
-                self.pps.set()
-                self.ts_tod_s += 1
-                self.ts_tod_ns -= 1000000000
+            # timestamp is derived from the cycle count
+            self._step()
 
             # process messages
             if msg_delay > 0:
                 msg_delay -= 1
 
             if msg_delay == 0 and msg:
-                self.log.info("process message %r", msg)
-
-                # word 0: control
-                msg_index = msg[0] & 0xf
-
-                if msg_index == 0:
-                    # msg 0 word 1: current ToD TS ns 15:0
-                    # msg 0 word 2: current ToD TS ns 29:16
-                    val = ((msg[2] & 0x3fff) << 16) | msg[1]
-                    if self.ts_tod_ns != val:
-                        self.log.info("update ts_tod_ns: old 0x%x, new 0x%x", self.ts_tod_ns, val)
-                        self.ts_tod_ns = val
-                    # msg 0 word 3: current ToD TS seconds 15:0
-                    # msg 0 word 4: current ToD TS seconds 31:16
-                    # msg 0 word 5: current ToD TS seconds 47:32
-                    val = (msg[5] << 32) | (msg[4] << 16) | msg[3]
-                    if self.ts_tod_s != val:
-                        self.log.info("update ts_tod_s: old 0x%x, new 0x%x", self.ts_tod_s, val)
-                        self.ts_tod_s = val
-                elif msg_index == 1:
-                    # msg 1 word 1: current ToD TS ns offset 15:0
-                    # msg 1 word 2: current ToD TS ns offset 31:16
-                    val = (msg[2] << 16) | msg[1]
-                    if self.ts_tod_offset_ns != val:
-                        self.log.info("update ts_tod_offset_ns: old 0x%x, new 0x%x", self.ts_tod_offset_ns, val)
-                        self.ts_tod_offset_ns = val
-                    # msg 1 word 3: drift num
-                    val = msg[3]
-                    if self.drift_num != val:
-                        self.log.info("update drift_num: old 0x%x, new 0x%x", self.drift_num, val)
-                        self.drift_num = val
-                    # msg 1 word 4: drift denom
-                    val = msg[4]
-                    if self.drift_denom != val:
-                        self.log.info("update drift_denom: old 0x%x, new 0x%x", self.drift_denom, val)
-                        self.drift_denom = val
-                    # msg 1 word 5: drift state
-                    val = msg[5]
-                    if self.drift_cnt != val:
-                        self.log.info("update drift_cnt: old 0x%x, new 0x%x", self.drift_cnt, val)
-                        self.drift_cnt = val
-                elif msg_index == 2:
-                    # msg 2 word 1: alternate ToD TS ns offset 15:0
-                    # msg 2 word 2: alternate ToD TS ns offset 31:16
-                    val = (msg[2] << 16) | msg[1]
-                    if self.ts_tod_alt_offset_ns != val:
-                        self.log.info("update ts_tod_alt_offset_ns: old 0x%x, new 0x%x", self.ts_tod_alt_offset_ns, val)
-                        self.ts_tod_alt_offset_ns = val
-                    # msg 2 word 3: alternate ToD TS seconds 15:0
-                    # msg 2 word 4: alternate ToD TS seconds 31:16
-                    # msg 2 word 5: alternate ToD TS seconds 47:32
-                    val = (msg[5] << 32) | (msg[4] << 16) | msg[3]
-                    if self.ts_tod_alt_s != val:
-                        self.log.info("update ts_tod_alt_s: old 0x%x, new 0x%x", self.ts_tod_alt_s, val)
-                        self.ts_tod_alt_s = val
-
-                # word 6: current fns 15:0
-                # word 7: current fns 31:16
-                val = (msg[7] << 16) | msg[6]
-                if self.ts_fns != val:
-                    self.log.info("update ts_fns: old 0x%x, new 0x%x", self.ts_fns, val)
-                    self.ts_fns = val
-                # word 8: current relative TS ns 15:0
-                # word 9: current relative TS ns 31:16
-                # word 10: current relative TS ns 47:32
-                val = (msg[10] << 32) | (msg[9] << 16) | msg[8]
-                if self.ts_rel_ns != val:
-                    self.log.info("update ts_rel_ns: old 0x%x, new 0x%x", self.ts_rel_ns, val)
-                    self.ts_rel_ns = val
-                # word 11: current phase increment fns 15:0
-                # word 12: current phase increment fns 31:16
-                val = (msg[12] << 16) | msg[11]
-                if self.period_fns != val:
-                    self.log.info("update period_fns: old 0x%x, new 0x%x", self.period_fns, val)
-                    self.period_fns = val
-                # word 13: current phase increment ns 7:0 + crc
-                val = msg[13] & 0xff
-                if self.period_ns != val:
-                    self.log.info("update period_ns: old 0x%x, new 0x%x", self.period_ns, val)
-                    self.period_ns = val
-
+                self._process_msg(msg)
                 msg = None
 
             # deserialize message
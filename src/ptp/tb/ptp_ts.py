@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: CERN-OHL-S-2.0
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+from fractions import Fraction
+
+from cocotb.utils import get_sim_time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Timestamp formats
+#
+# relative: ns in the upper bits, fractional ns in the lower fns_w bits
+#   64-bit: 48 bit ns, 16 bit fns
+#   48-bit: 32 bit ns, 16 bit fns
+#
+# ToD: seconds in the upper bits, then 32 bits of ns (30 used), then fns_w
+# bits of fractional ns
+#   96-bit: 48 bit s, 32 bit ns, 16 bit fns
+#
+# Internal PTP TD state carries fractional ns as a separate 32-bit fns field.
+#
+# Conversions to femtoseconds round down; conversions to ns are exact
+# (Fraction).
+
+FS_PER_NS = 1000000
+NS_PER_S = 1000000000
+FS_PER_S = FS_PER_NS*NS_PER_S
+
+
+def sim_time_fs():
+    return int(get_sim_time('fs'))
+
+
+def ns_fns_to_fs(ns, fns=0, fns_w=32):
+    return ns*FS_PER_NS + ((fns*FS_PER_NS) >> fns_w)
+
+
+def tod_to_fs(s, ns, fns=0, fns_w=32):
+    return (s*NS_PER_S + ns)*FS_PER_NS + ((fns*FS_PER_NS) >> fns_w)
+
+
+def ts_rel_to_fs(ts, fns_w=16):
+    return (int(ts)*FS_PER_NS) >> fns_w
+
+
+def ts_rel_to_ns(ts, fns_w=16):
+    return Fraction(int(ts), 1 << fns_w)
+
+
+def ts_tod_to_fs(ts, fns_w=16):
+    ts = int(ts)
+    return tod_to_fs(ts >> (32+fns_w), (ts >> fns_w) & 0xffffffff, ts & ((1 << fns_w)-1), fns_w)
+
+
+def ts_tod_to_ns(ts, fns_w=16):
+    ts = int(ts)
+    return (ts >> (32+fns_w))*NS_PER_S + Fraction(ts & ((1 << (32+fns_w))-1), 1 << fns_w)
+
+
+def fs_to_ts_rel(fs, fns_w=16):
+    # round up so that values produced by ts_rel_to_fs convert back exactly
+    return -((-fs << fns_w) // FS_PER_NS)
+
+
+def fs_to_ts_tod(fs, fns_w=16):
+    s, fs = divmod(fs, FS_PER_S)
+    return (s << (32+fns_w)) | -((-fs << fns_w) // FS_PER_NS)
+
+
+# int64 bounds on ns so that the fs result (ns*FS_PER_NS, plus or minus
+# less than FS_PER_NS) cannot overflow
+_NS_MAX = (2**63-1)//FS_PER_NS - 1
+_NS_MIN = -_NS_MAX
+
+# int64 bound on seconds so that s*NS_PER_S (plus the ns field and base)
+# cannot overflow
+_S_MAX = (2**63-1)//NS_PER_S - 2
+
+
+def _ns_fns_to_fs_array(ns, fns, fns_w, base_fs):
+    # ns and fns are int64 arrays with the base already subtracted from ns;
+    # fall back to Python ints if the result does not fit in int64
+    if ns.size and (ns.min() < _NS_MIN or ns.max() > _NS_MAX):
+        return [n*FS_PER_NS + ((f*FS_PER_NS) >> fns_w) - base_fs for n, f in zip(ns.tolist(), fns.tolist())]
+    return ns*FS_PER_NS + ((fns*FS_PER_NS) >> fns_w) - base_fs
+
+
+def ts_rel_to_fs_array(ts, fns_w=16, base_fs=0):
+    # convert a batch of relative timestamps to fs, relative to base_fs
+    # returns a NumPy int64 array if NumPy is available and the results
+    # fit in int64, otherwise a list
+    base_ns, base_rem = divmod(base_fs, FS_PER_NS)
+    if np is None or abs(base_ns) > _NS_MAX:
+        return [((int(t)*FS_PER_NS) >> fns_w) - base_fs for t in ts]
+
+    ts = np.asarray(ts, dtype=np.uint64)
+    ns = (ts >> np.uint64(fns_w)).astype(np.int64) - base_ns
+    fns = (ts & np.uint64((1 << fns_w)-1)).astype(np.int64)
+    return _ns_fns_to_fs_array(ns, fns, fns_w, base_rem)
+
+
+def ts_tod_to_fs_array(ts, fns_w=16, base_fs=0):
+    # convert a batch of ToD timestamps to fs, relative to base_fs
+    # returns a NumPy int64 array if NumPy is available and the results
+    # fit in int64, otherwise a list
+    if np is None:
+        return [ts_tod_to_fs(t, fns_w) - base_fs for t in ts]
+
+    lo_w = 32+fns_w
+    ts = [int(t) for t in ts]
+
+    # subtract the base before scaling to fs, as absolute ToD values in fs
+    # do not fit in int64
+    base_s, base_rem = divmod(base_fs, FS_PER_S)
+    base_ns, base_rem = divmod(base_rem, FS_PER_NS)
+
+    # seconds must be checked before scaling to ns, which can overflow too
+    s = [(t >> lo_w) - base_s for t in ts]
+    if s and (min(s) < -_S_MAX or max(s) > _S_MAX):
+        return [ts_tod_to_fs(t, fns_w) - base_fs for t in ts]
+
+    s = np.array(s, dtype=np.int64)
+    lo = np.array([t & ((1 << lo_w)-1) for t in ts], dtype=np.uint64)
+    ns = s*NS_PER_S + (lo >> np.uint64(fns_w)).astype(np.int64) - base_ns
+    fns = (lo & np.uint64((1 << fns_w)-1)).astype(np.int64)
+    return _ns_fns_to_fs_array(ns, fns, fns_w, base_rem)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: CERN-OHL-S-2.0
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+import logging
+from array import array
+from collections import deque
+from fractions import Fraction
+from math import isqrt
+
+import cocotb
+from cocotb.triggers import RisingEdge
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ptp_ts import sim_time_fs
+
+
+class PtpTsStats:
+    """Running statistics of a timestamp offset
+
+    All times and offsets are integer femtoseconds.  Only running sums are
+    kept, so memory use is constant regardless of the number of samples.
+    Optionally, a decimated capture of (time, offset) samples is kept in a
+    fixed-size buffer; when the buffer fills, every other sample is
+    discarded and the decimation factor is doubled.  dropped counts
+    samples that were discarded before reaching the statistics (see
+    PtpTsAnalyzer).
+    """
+
+    def __init__(self, lock_threshold=None, capture_decimation=0, capture_size=65536):
+        self.lock_threshold = lock_threshold
+        self.capture_decimation = capture_decimation
+        self.capture_size = capture_size
+
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.dropped = 0
+        self.first = None
+        self.last = None
+        self.min = None
+        self.max = None
+
+        self._t0 = None
+        self._sum = 0
+        self._sum_sq = 0
+        self._sum_t = 0
+        self._sum_t_sq = 0
+        self._sum_t_offset = 0
+
+        self._lock_start = None
+
+        self._cap_dec = self.capture_decimation
+        self._cap_count = 0
+        if self._cap_dec:
+            if np is not None:
+                self._cap_t = np.zeros(self.capture_size, dtype=np.int64)
+                self._cap_offset = np.zeros(self.capture_size, dtype=np.int64)
+            else:
+                self._cap_t = array('q', [0])*self.capture_size
+                self._cap_offset = array('q', [0])*self.capture_size
+        else:
+            self._cap_t = None
+            self._cap_offset = None
+
+    def add(self, t, offset):
+        if self._t0 is None:
+            self._t0 = t
+            self.first = offset
+            self.min = offset
+            self.max = offset
+
+        index = self.count
+        self.count += 1
+        self.last = offset
+        if offset < self.min:
+            self.min = offset
+        if offset > self.max:
+            self.max = offset
+
+        dt = t - self._t0
+        self._sum += offset
+        self._sum_sq += offset*offset
+        self._sum_t += dt
+        self._sum_t_sq += dt*dt
+        self._sum_t_offset += dt*offset
+
+        if self.lock_threshold is not None:
+            if abs(offset) <= self.lock_threshold:
+                if self._lock_start is None:
+                    self._lock_start = t
+            else:
+                self._lock_start = None
+
+        if self._cap_dec and index % self._cap_dec == 0:
+            if self._cap_count >= self.capture_size:
+                # buffer full; drop every other sample and halve the rate
+                n = self._cap_count // 2
+                self._cap_t[:n] = self._cap_t[0:self._cap_count:2]
+                self._cap_offset[:n] = self._cap_offset[0:self._cap_count:2]
+                self._cap_count = n
+                self._cap_dec *= 2
+            if index % self._cap_dec == 0:
+                self._cap_t[self._cap_count] = t
+                self._cap_offset[self._cap_count] = offset
+                self._cap_count += 1
+
+    @property
+    def mean(self):
+        if not self.count:
+            return None
+        return round(Fraction(self._sum, self.count))
+
+    @property
+    def max_abs(self):
+        if not self.count:
+            return None
+        return max(abs(self.min), abs(self.max))
+
+    @property
+    def jitter(self):
+        # RMS deviation from the mean
+        if not self.count:
+            return None
+        return isqrt(self.count*self._sum_sq - self._sum*self._sum) // self.count
+
+    @property
+    def drift(self):
+        # least-squares slope of offset vs. time (fs per fs)
+        den = self.count*self._sum_t_sq - self._sum_t*self._sum_t
+        if not den:
+            return None
+        return Fraction(self.count*self._sum_t_offset - self._sum_t*self._sum, den)
+
+    @property
+    def locked(self):
+        return self._lock_start is not None
+
+    @property
+    def lock_time(self):
+        # time from the first sample to the start of the current locked run
+        if self._lock_start is None:
+            return None
+        return self._lock_start - self._t0
+
+    def get_capture(self):
+        if not self._cap_dec:
+            return None, None
+        return self._cap_t[:self._cap_count], self._cap_offset[:self._cap_count]
+
+    def __str__(self):
+        if not self.count:
+            if self.dropped:
+                return f"no samples, {self.dropped} dropped"
+            return "no samples"
+        s = f"mean {self.mean/1e6} ns, max {self.max_abs/1e6} ns, jitter {self.jitter/1e6} ns"
+        if self.drift is not None:
+            s += f", drift {float(self.drift)*1e9:.3f} ppb"
+        if self.lock_threshold is not None:
+            if self.locked:
+                s += f", lock time {self.lock_time/1e6} ns"
+            else:
+                s += ", not locked"
+        if self.dropped:
+            s += f", {self.dropped} dropped"
+        return s
+
+
+class PtpTsAnalyzer:
+    """Streaming comparison of timestamps against a reference
+
+    ts is a list of callables returning the timestamps under test in integer
+    femtoseconds, sampled on clock.  ref_ts is a matching list of callables
+    returning the reference timestamps, sampled on ref_clock; the reference
+    is linearly interpolated to the time of each sample.  If ref_ts is None,
+    simulation time is used as the reference.  Results are accumulated in
+    one PtpTsStats object per timestamp.
+
+    At most max_pending samples are held waiting for the reference.  If
+    the reference clock falls further behind (slow or stopped reference),
+    the oldest samples are discarded, as are samples that cannot be
+    interpolated; these are counted in the dropped field of the stats.
+    """
+
+    def __init__(self, clock, ts, ref_clock=None, ref_ts=None, max_pending=1024, **kwargs):
+        self.log = logging.getLogger(f"cocotb.{clock._path}")
+        self.clock = clock
+        self.ts = list(ts)
+        self.ref_clock = ref_clock
+        self.ref_ts = list(ref_ts) if ref_ts is not None else None
+
+        if self.ref_ts is not None and len(self.ref_ts) != len(self.ts):
+            raise ValueError("Timestamp and reference lists must have the same length")
+
+        self.stats = [PtpTsStats(**kwargs) for k in self.ts]
+
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._warned = False
+        self._ref_sample = None
+
+        self._run_cr = cocotb.start_soon(self._run())
+        if self.ref_ts is not None:
+            self._run_ref_cr = cocotb.start_soon(self._run_ref())
+        else:
+            self._run_ref_cr = None
+
+    def reset(self):
+        self._pending.clear()
+        self._warned = False
+        for stats in self.stats:
+            stats.reset()
+
+    def _process(self, t, vals):
+        for stats, val in zip(self.stats, vals):
+            stats.add(t, val)
+
+    def _drop(self):
+        for stats in self.stats:
+            stats.dropped += 1
+
+    async def _run(self):
+        clock_edge_event = RisingEdge(self.clock)
+
+        while True:
+            await clock_edge_event
+
+            t = sim_time_fs()
+            vals = [f() for f in self.ts]
+
+            if self.ref_ts is None:
+                self._process(t, [val - t for val in vals])
+            else:
+                if len(self._pending) >= self.max_pending:
+                    self._pending.popleft()
+                    self._drop()
+                    if not self._warned:
+                        self.log.warning("Reference clock more than %d samples behind, dropping samples", self.max_pending)
+                        self._warned = True
+                self._pending.append((t, vals))
+
+    async def _run_ref(self):
+        clock_edge_event = RisingEdge(self.ref_clock)
+
+        while True:
+            await clock_edge_event
+
+            t2 = sim_time_fs()
+            r2 = [f() for f in self.ref_ts]
+
+            if self._ref_sample is not None:
+                t1, r1 = self._ref_sample
+                dt = t2 - t1
+
+                # interpolate reference to time of pending samples
+                while self._pending and self._pending[0][0] <= t2:
+                    t, vals = self._pending.popleft()
+                    if t < t1 or not dt:
+                        # cannot interpolate (before first reference sample)
+                        self._drop()
+                        continue
+                    self._process(t, [val - (a + (b-a)*(t-t1)//dt) for val, a, b in zip(vals, r1, r2)])
+
+            self._ref_sample = (t2, r2)
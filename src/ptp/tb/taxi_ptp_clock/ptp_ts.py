@@ -0,0 +1 @@
+../ptp_ts.py
\ No newline at end of file
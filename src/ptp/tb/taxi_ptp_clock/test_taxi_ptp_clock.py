@@ -11,14 +11,23 @@ Authors:
 
 import logging
 import os
-from decimal import Decimal
+import sys
 
 import cocotb_test.simulator
 
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge
-from cocotb.utils import get_sim_time
+
+try:
+    from ptp_ts import FS_PER_S, sim_time_fs, ts_rel_to_fs, ts_tod_to_fs
+except ImportError:
+    # attempt import from current directory
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+    try:
+        from ptp_ts import FS_PER_S, sim_time_fs, ts_rel_to_fs, ts_tod_to_fs
+    finally:
+        del sys.path[0]
 
 
 class TB:
@@ -60,19 +69,11 @@ class TB:
         await RisingEdge(self.dut.clk)
         await RisingEdge(self.dut.clk)
 
-    def get_output_ts_tod_ns(self):
-        ts = int(self.dut.output_ts_tod.value)
-        return Decimal(ts >> 48).scaleb(9) + (Decimal(ts & 0xffffffffffff) / Decimal(2**16))
-
-    def get_output_ts_tod_s(self):
-        return self.get_output_ts_tod_ns().scaleb(-9)
-
-    def get_output_ts_rel_ns(self):
-        ts = int(self.dut.output_ts_rel.value)
-        return Decimal(ts) / Decimal(2**16)
+    def get_output_ts_tod_fs(self):
+        return ts_tod_to_fs(self.dut.output_ts_tod.value)
 
-    def get_output_ts_rel_s(self):
-        return self.get_output_ts_rel_ns().scaleb(-9)
+    def get_output_ts_rel_fs(self):
+        return ts_rel_to_fs(self.dut.output_ts_rel.value)
 
 
 @cocotb.test()
@@ -84,33 +85,33 @@ async def run_default_rate(dut):
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
-    start_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    start_ts_tod = tb.get_output_ts_tod_ns()
-    start_ts_rel = tb.get_output_ts_rel_ns()
+    start_time = sim_time_fs()
+    start_ts_tod = tb.get_output_ts_tod_fs()
+    start_ts_rel = tb.get_output_ts_rel_fs()
 
     for k in range(10000):
         await RisingEdge(dut.clk)
 
-    stop_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    stop_ts_tod = tb.get_output_ts_tod_ns()
-    stop_ts_rel = tb.get_output_ts_rel_ns()
+    stop_time = sim_time_fs()
+    stop_ts_tod = tb.get_output_ts_tod_fs()
+    stop_ts_rel = tb.get_output_ts_rel_fs()
 
     time_delta = stop_time-start_time
     ts_tod_delta = stop_ts_tod-start_ts_tod
     ts_rel_delta = stop_ts_rel-start_ts_rel
 
-    tb.log.info("sim time delta : %s ns", time_delta)
-    tb.log.info("ToD ts delta   : %s ns", ts_tod_delta)
-    tb.log.info("Rel ts delta   : %s ns", ts_rel_delta)
+    tb.log.info("sim time delta : %s fs", time_delta)
+    tb.log.info("ToD ts delta   : %s fs", ts_tod_delta)
+    tb.log.info("Rel ts delta   : %s fs", ts_rel_delta)
 
     ts_tod_diff = time_delta - ts_tod_delta
     ts_rel_diff = time_delta - ts_rel_delta
 
-    tb.log.info("ToD ts diff    : %s ns", ts_tod_diff)
-    tb.log.info("Rel ts diff    : %s ns", ts_rel_diff)
+    tb.log.info("ToD ts diff    : %s fs", ts_tod_diff)
+    tb.log.info("Rel ts diff    : %s fs", ts_rel_diff)
 
-    assert abs(ts_tod_diff) < 1e-3
-    assert abs(ts_rel_diff) < 1e-3
+    assert abs(ts_tod_diff) < 1000
+    assert abs(ts_rel_diff) < 1000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
@@ -144,33 +145,33 @@ async def run_load_timestamps(dut):
 
     await RisingEdge(dut.clk)
 
-    start_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    start_ts_tod = tb.get_output_ts_tod_ns()
-    start_ts_rel = tb.get_output_ts_rel_ns()
+    start_time = sim_time_fs()
+    start_ts_tod = tb.get_output_ts_tod_fs()
+    start_ts_rel = tb.get_output_ts_rel_fs()
 
     for k in range(2000):
         await RisingEdge(dut.clk)
 
-    stop_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    stop_ts_tod = tb.get_output_ts_tod_ns()
-    stop_ts_rel = tb.get_output_ts_rel_ns()
+    stop_time = sim_time_fs()
+    stop_ts_tod = tb.get_output_ts_tod_fs()
+    stop_ts_rel = tb.get_output_ts_rel_fs()
 
     time_delta = stop_time-start_time
     ts_tod_delta = stop_ts_tod-start_ts_tod
     ts_rel_delta = stop_ts_rel-start_ts_rel
 
-    tb.log.info("sim time delta : %s ns", time_delta)
-    tb.log.info("ToD ts delta   : %s ns", ts_tod_delta)
-    tb.log.info("Rel ts delta   : %s ns", ts_rel_delta)
+    tb.log.info("sim time delta : %s fs", time_delta)
+    tb.log.info("ToD ts delta   : %s fs", ts_tod_delta)
+    tb.log.info("Rel ts delta   : %s fs", ts_rel_delta)
 
     ts_tod_diff = time_delta - ts_tod_delta
     ts_rel_diff = time_delta - ts_rel_delta
 
-    tb.log.info("ToD ts diff    : %s ns", ts_tod_diff)
-    tb.log.info("Rel ts diff    : %s ns", ts_rel_diff)
+    tb.log.info("ToD ts diff    : %s fs", ts_tod_diff)
+    tb.log.info("Rel ts diff    : %s fs", ts_rel_diff)
 
-    assert abs(ts_tod_diff) < 1e-3
-    assert abs(ts_rel_diff) < 1e-3
+    assert abs(ts_tod_diff) < 1000
+    assert abs(ts_rel_diff) < 1000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
@@ -198,9 +199,9 @@ async def run_seconds_increment(dut):
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
 
-    start_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    start_ts_tod = tb.get_output_ts_tod_ns()
-    start_ts_rel = tb.get_output_ts_rel_ns()
+    start_time = sim_time_fs()
+    start_ts_tod = tb.get_output_ts_tod_fs()
+    start_ts_rel = tb.get_output_ts_rel_fs()
 
     saw_pps = False
 
@@ -209,31 +210,31 @@ async def run_seconds_increment(dut):
 
         if int(dut.output_pps.value):
             saw_pps = True
-            tb.log.info("Got PPS with sink ToD TS %s", tb.get_output_ts_tod_ns())
-            assert (tb.get_output_ts_tod_s() - 1) < 6.4e-9
+            tb.log.info("Got PPS with sink ToD TS %s fs", tb.get_output_ts_tod_fs())
+            assert (tb.get_output_ts_tod_fs() - FS_PER_S) < 6400000
 
     assert saw_pps
 
-    stop_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    stop_ts_tod = tb.get_output_ts_tod_ns()
-    stop_ts_rel = tb.get_output_ts_rel_ns()
+    stop_time = sim_time_fs()
+    stop_ts_tod = tb.get_output_ts_tod_fs()
+    stop_ts_rel = tb.get_output_ts_rel_fs()
 
     time_delta = stop_time-start_time
     ts_tod_delta = stop_ts_tod-start_ts_tod
     ts_rel_delta = stop_ts_rel-start_ts_rel
 
-    tb.log.info("sim time delta : %s ns", time_delta)
-    tb.log.info("ToD ts delta   : %s ns", ts_tod_delta)
-    tb.log.info("Rel ts delta   : %s ns", ts_rel_delta)
+    tb.log.info("sim time delta : %s fs", time_delta)
+    tb.log.info("ToD ts delta   : %s fs", ts_tod_delta)
+    tb.log.info("Rel ts delta   : %s fs", ts_rel_delta)
 
     ts_tod_diff = time_delta - ts_tod_delta
     ts_rel_diff = time_delta - ts_rel_delta
 
-    tb.log.info("ToD ts diff    : %s ns", ts_tod_diff)
-    tb.log.info("Rel ts diff    : %s ns", ts_rel_diff)
+    tb.log.info("ToD ts diff    : %s fs", ts_tod_diff)
+    tb.log.info("Rel ts diff    : %s fs", ts_rel_diff)
 
-    assert abs(ts_tod_diff) < 1e-3
-    assert abs(ts_rel_diff) < 1e-3
+    assert abs(ts_tod_diff) < 1000
+    assert abs(ts_rel_diff) < 1000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
@@ -261,33 +262,33 @@ async def run_frequency_adjustment(dut):
     await RisingEdge(dut.clk)
 
     await RisingEdge(dut.clk)
-    start_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    start_ts_tod = tb.get_output_ts_tod_ns()
-    start_ts_rel = tb.get_output_ts_rel_ns()
+    start_time = sim_time_fs()
+    start_ts_tod = tb.get_output_ts_tod_fs()
+    start_ts_rel = tb.get_output_ts_rel_fs()
 
     for k in range(10000):
         await RisingEdge(dut.clk)
 
-    stop_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    stop_ts_tod = tb.get_output_ts_tod_ns()
-    stop_ts_rel = tb.get_output_ts_rel_ns()
+    stop_time = sim_time_fs()
+    stop_ts_tod = tb.get_output_ts_tod_fs()
+    stop_ts_rel = tb.get_output_ts_rel_fs()
 
     time_delta = stop_time-start_time
     ts_tod_delta = stop_ts_tod-start_ts_tod
     ts_rel_delta = stop_ts_rel-start_ts_rel
 
-    tb.log.info("sim time delta : %s ns", time_delta)
-    tb.log.info("ToD ts delta   : %s ns", ts_tod_delta)
-    tb.log.info("Rel ts delta   : %s ns", ts_rel_delta)
+    tb.log.info("sim time delta : %s fs", time_delta)
+    tb.log.info("ToD ts delta   : %s fs", ts_tod_delta)
+    tb.log.info("Rel ts delta   : %s fs", ts_rel_delta)
 
-    ts_tod_diff = time_delta - ts_tod_delta * Decimal(6.4/(6+(0x6624+2/5)/2**16))
-    ts_rel_diff = time_delta - ts_rel_delta * Decimal(6.4/(6+(0x6624+2/5)/2**16))
+    ts_tod_diff = time_delta - ts_tod_delta * 6.4/(6+(0x6624+2/5)/2**16)
+    ts_rel_diff = time_delta - ts_rel_delta * 6.4/(6+(0x6624+2/5)/2**16)
 
-    tb.log.info("ToD ts diff    : %s ns", ts_tod_diff)
-    tb.log.info("Rel ts diff    : %s ns", ts_rel_diff)
+    tb.log.info("ToD ts diff    : %s fs", ts_tod_diff)
+    tb.log.info("Rel ts diff    : %s fs", ts_rel_diff)
 
-    assert abs(ts_tod_diff) < 1e-3
-    assert abs(ts_rel_diff) < 1e-3
+    assert abs(ts_tod_diff) < 1000
+    assert abs(ts_rel_diff) < 1000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
@@ -313,33 +314,33 @@ async def run_drift_adjustment(dut):
     await RisingEdge(dut.clk)
 
     await RisingEdge(dut.clk)
-    start_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    start_ts_tod = tb.get_output_ts_tod_ns()
-    start_ts_rel = tb.get_output_ts_rel_ns()
+    start_time = sim_time_fs()
+    start_ts_tod = tb.get_output_ts_tod_fs()
+    start_ts_rel = tb.get_output_ts_rel_fs()
 
     for k in range(10000):
         await RisingEdge(dut.clk)
 
-    stop_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    stop_ts_tod = tb.get_output_ts_tod_ns()
-    stop_ts_rel = tb.get_output_ts_rel_ns()
+    stop_time = sim_time_fs()
+    stop_ts_tod = tb.get_output_ts_tod_fs()
+    stop_ts_rel = tb.get_output_ts_rel_fs()
 
     time_delta = stop_time-start_time
     ts_tod_delta = stop_ts_tod-start_ts_tod
     ts_rel_delta = stop_ts_rel-start_ts_rel
 
-    tb.log.info("sim time delta : %s ns", time_delta)
-    tb.log.info("ToD ts delta   : %s ns", ts_tod_delta)
-    tb.log.info("Rel ts delta   : %s ns", ts_rel_delta)
+    tb.log.info("sim time delta : %s fs", time_delta)
+    tb.log.info("ToD ts delta   : %s fs", ts_tod_delta)
+    tb.log.info("Rel ts delta   : %s fs", ts_rel_delta)
 
-    ts_tod_diff = time_delta - ts_tod_delta * Decimal(6.4/(6+(0x6666+20/5)/2**16))
-    ts_rel_diff = time_delta - ts_rel_delta * Decimal(6.4/(6+(0x6666+20/5)/2**16))
+    ts_tod_diff = time_delta - ts_tod_delta * 6.4/(6+(0x6666+20/5)/2**16)
+    ts_rel_diff = time_delta - ts_rel_delta * 6.4/(6+(0x6666+20/5)/2**16)
 
-    tb.log.info("ToD ts diff    : %s ns", ts_tod_diff)
-    tb.log.info("Rel ts diff    : %s ns", ts_rel_diff)
+    tb.log.info("ToD ts diff    : %s fs", ts_tod_diff)
+    tb.log.info("Rel ts diff    : %s fs", ts_rel_diff)
 
-    assert abs(ts_tod_diff) < 1e-3
-    assert abs(ts_rel_diff) < 1e-3
+    assert abs(ts_tod_diff) < 1000
+    assert abs(ts_rel_diff) < 1000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
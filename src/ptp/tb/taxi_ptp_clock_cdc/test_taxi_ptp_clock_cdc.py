@@ -11,6 +11,7 @@ Authors:
 
 import logging
 import os
+import sys
 from statistics import mean, stdev
 
 import pytest
@@ -19,10 +20,20 @@ import cocotb_test.simulator
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge, Timer
-from cocotb.utils import get_sim_steps, get_sim_time
+from cocotb.utils import get_sim_steps
 
 from cocotbext.eth import PtpClock
 
+try:
+    from ptp_ts import sim_time_fs, ts_rel_to_fs, ts_tod_to_fs
+except ImportError:
+    # attempt import from current directory
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+    try:
+        from ptp_ts import sim_time_fs, ts_rel_to_fs, ts_tod_to_fs
+    finally:
+        del sys.path[0]
+
 
 class TB:
     def __init__(self, dut):
@@ -104,19 +115,17 @@ class TB:
             await t
             self.dut.output_clk.value = 0
 
-    def get_input_ts_ns(self):
-        ts = int(self.dut.input_ts.value)
+    def get_input_ts_fs(self):
         if len(self.dut.input_ts) == 64:
-            return ts/2**16*1e-9
+            return ts_rel_to_fs(self.dut.input_ts.value)
         else:
-            return (ts >> 48) + ((ts & 0xffffffffffff)/2**16*1e-9)
+            return ts_tod_to_fs(self.dut.input_ts.value)
 
-    def get_output_ts_ns(self):
-        ts = int(self.dut.output_ts.value)
+    def get_output_ts_fs(self):
         if len(self.dut.output_ts) == 64:
-            return ts/2**16*1e-9
+            return ts_rel_to_fs(self.dut.output_ts.value)
         else:
-            return (ts >> 48) + ((ts & 0xffffffffffff)/2**16*1e-9)
+            return ts_tod_to_fs(self.dut.output_ts.value)
 
     async def measure_ts_diff(self, N=100):
         input_ts_lst = []
@@ -125,10 +134,10 @@ class TB:
         async def collect_timestamps(clk, get_ts, lst):
             while True:
                 await RisingEdge(clk)
-                lst.append((get_sim_time('sec'), get_ts()))
+                lst.append((sim_time_fs(), get_ts()))
 
-        input_cr = cocotb.start_soon(collect_timestamps(self.dut.input_clk, self.get_input_ts_ns, input_ts_lst))
-        output_cr = cocotb.start_soon(collect_timestamps(self.dut.output_clk, self.get_output_ts_ns, output_ts_lst))
+        input_cr = cocotb.start_soon(collect_timestamps(self.dut.input_clk, self.get_input_ts_fs, input_ts_lst))
+        output_cr = cocotb.start_soon(collect_timestamps(self.dut.output_clk, self.get_output_ts_fs, output_ts_lst))
 
         for k in range(N):
             await RisingEdge(self.dut.output_clk)
@@ -152,7 +161,7 @@ class TB:
             dt = its2[0] - its1[0]
             dts = its2[1] - its1[1]
 
-            its = its1[1]+dts/dt*(ots[0]-its1[0])
+            its = its1[1]+dts*(ots[0]-its1[0])//dt
 
             diffs.append(ots[1] - its)
 
@@ -180,8 +189,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 5
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 5000000
 
     await RisingEdge(dut.input_clk)
     tb.log.info("10 ppm slower")
@@ -197,8 +206,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 5
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 5000000
 
     await RisingEdge(dut.input_clk)
     tb.log.info("10 ppm faster")
@@ -214,8 +223,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 5
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 5000000
 
     await RisingEdge(dut.input_clk)
     tb.log.info("200 ppm slower")
@@ -231,8 +240,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 5
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 5000000
 
     await RisingEdge(dut.input_clk)
     tb.log.info("200 ppm faster")
@@ -248,8 +257,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 5
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 5000000
 
     await RisingEdge(dut.input_clk)
     tb.log.info("Coherent tracking (+/- 10 ppm)")
@@ -280,8 +289,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 6.4
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 6400000
 
     await RisingEdge(dut.input_clk)
     tb.log.info("Coherent tracking (+/- 200 ppm)")
@@ -312,8 +321,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 6.4
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 6400000
 
     await RisingEdge(dut.input_clk)
     tb.log.info("Slightly faster (6.3 ns)")
@@ -329,8 +338,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 5
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 5000000
 
     await RisingEdge(dut.input_clk)
     tb.log.info("Slightly slower (6.5 ns)")
@@ -346,8 +355,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 5
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 5000000
 
     await RisingEdge(dut.input_clk)
     tb.log.info("Significantly faster (250 MHz)")
@@ -363,8 +372,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     # diffs = await tb.measure_ts_diff()
-    # tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    # assert abs(mean(diffs)*1e9) < 5
+    # tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    # assert abs(mean(diffs)) < 5000000
 
     # await RisingEdge(dut.input_clk)
     # tb.log.info("Coherent tracking (250 MHz +0/-0.5%)")
@@ -395,8 +404,8 @@ async def run_test(dut):
     # assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 5
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 5000000
 
     await RisingEdge(dut.input_clk)
     tb.log.info("Significantly slower (100 MHz)")
@@ -412,8 +421,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 5
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 5000000
 
     await RisingEdge(dut.input_clk)
     tb.log.info("Significantly faster (390.625 MHz)")
@@ -429,8 +438,8 @@ async def run_test(dut):
     assert int(tb.dut.locked.value)
 
     diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference: {mean(diffs)*1e9} ns (stdev: {stdev(diffs)*1e9})")
-    assert abs(mean(diffs)*1e9) < 5
+    tb.log.info(f"Difference: {mean(diffs)/1e6} ns (stdev: {stdev(diffs)/1e6})")
+    assert abs(mean(diffs)) < 5000000
 
     await RisingEdge(dut.input_clk)
     await RisingEdge(dut.input_clk)
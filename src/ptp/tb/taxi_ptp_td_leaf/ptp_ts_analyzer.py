@@ -0,0 +1 @@
+../ptp_ts_analyzer.py
\ No newline at end of file
@@ -12,23 +12,25 @@ Authors:
 import logging
 import os
 import sys
-from decimal import Decimal
-from statistics import mean, stdev
 
 import cocotb_test.simulator
 
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge, Timer
-from cocotb.utils import get_sim_steps, get_sim_time
+from cocotb.utils import get_sim_steps
 
 try:
     from ptp_td import PtpTdSource
+    from ptp_ts import ns_fns_to_fs, tod_to_fs, ts_rel_to_fs, ts_tod_to_fs
+    from ptp_ts_analyzer import PtpTsAnalyzer
 except ImportError:
     # attempt import from current directory
     sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
     try:
         from ptp_td import PtpTdSource
+        from ptp_ts import ns_fns_to_fs, tod_to_fs, ts_rel_to_fs, ts_tod_to_fs
+        from ptp_ts_analyzer import PtpTsAnalyzer
     finally:
         del sys.path[0]
 
@@ -57,13 +59,13 @@ class TB:
         dut.clk.setimmediatevalue(0)
         cocotb.start_soon(self._run_clock())
 
-        self.ref_ts_rel = []
-        self.ref_ts_tod = []
-        self.output_ts_rel = []
-        self.output_ts_tod = []
-
-        cocotb.start_soon(self._run_collect_ref_ts())
-        cocotb.start_soon(self._run_collect_output_ts())
+        self.analyzer = PtpTsAnalyzer(
+            clock=dut.clk,
+            ts=[self.get_output_ts_rel_fs, self.get_output_ts_tod_fs],
+            ref_clock=dut.ptp_clk,
+            ref_ts=[self.get_ref_ts_rel_fs, self.get_ref_ts_tod_fs],
+            lock_threshold=5000000
+        )
 
     async def reset(self):
         self.dut.ptp_rst.setimmediatevalue(0)
@@ -98,13 +100,17 @@ class TB:
     def set_clock_period(self, period):
         self.clock_period = period
 
-    def get_output_ts_tod_ns(self):
-        ts = int(self.dut.output_ts_tod.value)
-        return Decimal(ts >> 48).scaleb(9) + (Decimal(ts & 0xffffffffffff) / Decimal(2**16))
+    def get_output_ts_tod_fs(self):
+        return ts_tod_to_fs(self.dut.output_ts_tod.value)
+
+    def get_output_ts_rel_fs(self):
+        return ts_rel_to_fs(self.dut.output_ts_rel.value)
 
-    def get_output_ts_rel_ns(self):
-        ts = int(self.dut.output_ts_rel.value)
-        return Decimal(ts) / Decimal(2**16)
+    def get_ref_ts_tod_fs(self):
+        return tod_to_fs(*self.ptp_td_source.get_ts_tod())
+
+    def get_ref_ts_rel_fs(self):
+        return ns_fns_to_fs(*self.ptp_td_source.get_ts_rel())
 
     async def _run_clock(self):
         period = None
@@ -119,61 +125,13 @@ class TB:
             await t
             self.dut.clk.value = 0
 
-    async def _run_collect_ref_ts(self):
-        clk_event = RisingEdge(self.dut.ptp_clk)
-        while True:
-            await clk_event
-            st = Decimal(get_sim_time('fs')).scaleb(-6)
-            self.ref_ts_rel.append((st, self.ptp_td_source.get_ts_rel_ns()))
-            self.ref_ts_tod.append((st, self.ptp_td_source.get_ts_tod_ns()))
-
-    async def _run_collect_output_ts(self):
-        clk_event = RisingEdge(self.dut.clk)
-        while True:
-            await clk_event
-            st = Decimal(get_sim_time('fs')).scaleb(-6)
-            self.output_ts_rel.append((st, self.get_output_ts_rel_ns()))
-            self.output_ts_tod.append((st, self.get_output_ts_tod_ns()))
-
-    def compute_ts_diff(self, ts_lst_1, ts_lst_2):
-        ts_lst_1 = [x for x in ts_lst_1]
-
-        diffs = []
-
-        its1 = ts_lst_1.pop(0)
-        its2 = ts_lst_1.pop(0)
-
-        for ots in ts_lst_2:
-            while its2[0] < ots[0] and ts_lst_1:
-                its1 = its2
-                its2 = ts_lst_1.pop(0)
-
-            if its2[0] < ots[0]:
-                break
-
-            dt = its2[0] - its1[0]
-            dts = its2[1] - its1[1]
-
-            its = its1[1]+dts/dt*(ots[0]-its1[0])
-
-            # diffs.append(ots[1] - its)
-            diffs.append(float(ots[1] - its))
-
-        return diffs
-
     async def measure_ts_diff(self, N=100):
-        self.ref_ts_rel = []
-        self.ref_ts_tod = []
-        self.output_ts_rel = []
-        self.output_ts_tod = []
+        self.analyzer.reset()
 
         for k in range(N):
             await RisingEdge(self.dut.clk)
 
-        rel_diffs = self.compute_ts_diff(self.ref_ts_rel, self.output_ts_rel)
-        tod_diffs = self.compute_ts_diff(self.ref_ts_tod, self.output_ts_tod)
-
-        return rel_diffs, tod_diffs
+        return self.analyzer.stats
 
 
 @cocotb.test()
@@ -200,11 +158,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("10 ppm slower")
@@ -219,11 +177,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("10 ppm faster")
@@ -238,11 +196,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("200 ppm slower")
@@ -257,11 +215,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("200 ppm faster")
@@ -276,11 +234,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("Coherent tracking (+/- 10 ppm)")
@@ -310,11 +268,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("Coherent tracking (+/- 200 ppm)")
@@ -344,11 +302,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("Slightly faster (6.3 ns)")
@@ -363,11 +321,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("Slightly slower (6.5 ns)")
@@ -382,11 +340,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("Significantly faster (250 MHz)")
@@ -401,11 +359,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("Coherent tracking (250 MHz +0/-0.5%)")
@@ -435,11 +393,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("Significantly slower (100 MHz)")
@@ -454,11 +412,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     tb.log.info("Significantly faster (390.625 MHz)")
@@ -473,11 +431,11 @@ async def run_test(dut):
 
     assert int(tb.dut.locked.value)
 
-    rel_diffs, tod_diffs = await tb.measure_ts_diff()
-    tb.log.info(f"Difference (rel): {mean(rel_diffs)} ns (stdev: {stdev(rel_diffs)})")
-    tb.log.info(f"Difference (ToD): {mean(tod_diffs)} ns (stdev: {stdev(tod_diffs)})")
-    assert abs(mean(rel_diffs)) < 5
-    assert abs(mean(tod_diffs)) < 5
+    rel_stats, tod_stats = await tb.measure_ts_diff()
+    tb.log.info("Difference (rel): %s", rel_stats)
+    tb.log.info("Difference (ToD): %s", tod_stats)
+    assert abs(rel_stats.mean) < 5000000
+    assert abs(tod_stats.mean) < 5000000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
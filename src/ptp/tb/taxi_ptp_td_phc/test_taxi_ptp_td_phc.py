@@ -12,22 +12,24 @@ Authors:
 import logging
 import os
 import sys
-from decimal import Decimal
 
 import cocotb_test.simulator
 
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge
-from cocotb.utils import get_sim_time
 
 try:
     from ptp_td import PtpTdSink
+    from ptp_ts import FS_PER_S, sim_time_fs, ns_fns_to_fs, tod_to_fs
+    from ptp_ts_analyzer import PtpTsAnalyzer
 except ImportError:
     # attempt import from current directory
     sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
     try:
         from ptp_td import PtpTdSink
+        from ptp_ts import FS_PER_S, sim_time_fs, ns_fns_to_fs, tod_to_fs
+        from ptp_ts_analyzer import PtpTsAnalyzer
     finally:
         del sys.path[0]
 
@@ -48,6 +50,12 @@ class TB:
             period_ns=6.4
         )
 
+        # compare sink timestamps against simulation time
+        self.analyzer = PtpTsAnalyzer(
+            clock=dut.clk,
+            ts=[self.get_sink_ts_rel_fs, self.get_sink_ts_tod_fs]
+        )
+
         dut.input_ts_rel_ns.setimmediatevalue(0)
         dut.input_ts_rel_valid.setimmediatevalue(0)
         dut.input_ts_rel_offset_ns.setimmediatevalue(0)
@@ -69,6 +77,12 @@ class TB:
         dut.input_drift_denom.setimmediatevalue(0)
         dut.input_drift_valid.setimmediatevalue(0)
 
+    def get_sink_ts_tod_fs(self):
+        return tod_to_fs(*self.ptp_td_sink.get_ts_tod())
+
+    def get_sink_ts_rel_fs(self):
+        return ns_fns_to_fs(*self.ptp_td_sink.get_ts_rel())
+
     async def reset(self):
         self.dut.rst.setimmediatevalue(0)
         await RisingEdge(self.dut.clk)
@@ -92,33 +106,41 @@ async def run_default_rate(dut):
         await RisingEdge(dut.clk)
 
     await RisingEdge(dut.clk)
-    start_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    start_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    start_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    start_time = sim_time_fs()
+    start_ts_tod = tb.get_sink_ts_tod_fs()
+    start_ts_rel = tb.get_sink_ts_rel_fs()
+    tb.analyzer.reset()
 
     for k in range(10000):
         await RisingEdge(dut.clk)
 
-    stop_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    stop_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    stop_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    stop_time = sim_time_fs()
+    stop_ts_tod = tb.get_sink_ts_tod_fs()
+    stop_ts_rel = tb.get_sink_ts_rel_fs()
 
     time_delta = stop_time-start_time
     ts_tod_delta = stop_ts_tod-start_ts_tod
     ts_rel_delta = stop_ts_rel-start_ts_rel
 
-    tb.log.info("sim time delta : %s ns", time_delta)
-    tb.log.info("ToD ts delta   : %s ns", ts_tod_delta)
-    tb.log.info("Rel ts delta   : %s ns", ts_rel_delta)
+    tb.log.info("sim time delta : %s fs", time_delta)
+    tb.log.info("ToD ts delta   : %s fs", ts_tod_delta)
+    tb.log.info("Rel ts delta   : %s fs", ts_rel_delta)
 
     ts_tod_diff = time_delta - ts_tod_delta
     ts_rel_diff = time_delta - ts_rel_delta
 
-    tb.log.info("ToD ts diff    : %s ns", ts_tod_diff)
-    tb.log.info("Rel ts diff    : %s ns", ts_rel_diff)
+    tb.log.info("ToD ts diff    : %s fs", ts_tod_diff)
+    tb.log.info("Rel ts diff    : %s fs", ts_rel_diff)
+
+    rel_stats, tod_stats = tb.analyzer.stats
+    tb.log.info("Rel ts vs. sim time: %s", rel_stats)
+    tb.log.info("ToD ts vs. sim time: %s", tod_stats)
 
-    assert abs(ts_tod_diff) < 1e-3
-    assert abs(ts_rel_diff) < 1e-3
+    assert rel_stats.max - rel_stats.min < 1000
+    assert tod_stats.max - tod_stats.min < 1000
+
+    assert abs(ts_tod_diff) < 1000
+    assert abs(ts_rel_diff) < 1000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
@@ -159,33 +181,41 @@ async def run_load_timestamps(dut):
     # assert tb.ptp_td_sink.get_ts_rel_ns() - (123456789 + (256*6-(14*17+32)-1)*6.4) < 6.4
 
     await RisingEdge(dut.clk)
-    start_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    start_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    start_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    start_time = sim_time_fs()
+    start_ts_tod = tb.get_sink_ts_tod_fs()
+    start_ts_rel = tb.get_sink_ts_rel_fs()
+    tb.analyzer.reset()
 
     for k in range(10000):
         await RisingEdge(dut.clk)
 
-    stop_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    stop_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    stop_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    stop_time = sim_time_fs()
+    stop_ts_tod = tb.get_sink_ts_tod_fs()
+    stop_ts_rel = tb.get_sink_ts_rel_fs()
 
     time_delta = stop_time-start_time
     ts_tod_delta = stop_ts_tod-start_ts_tod
     ts_rel_delta = stop_ts_rel-start_ts_rel
 
-    tb.log.info("sim time delta : %s ns", time_delta)
-    tb.log.info("ToD ts delta   : %s ns", ts_tod_delta)
-    tb.log.info("Rel ts delta   : %s ns", ts_rel_delta)
+    tb.log.info("sim time delta : %s fs", time_delta)
+    tb.log.info("ToD ts delta   : %s fs", ts_tod_delta)
+    tb.log.info("Rel ts delta   : %s fs", ts_rel_delta)
 
     ts_tod_diff = time_delta - ts_tod_delta
     ts_rel_diff = time_delta - ts_rel_delta
 
-    tb.log.info("ToD ts diff    : %s ns", ts_tod_diff)
-    tb.log.info("Rel ts diff    : %s ns", ts_rel_diff)
+    tb.log.info("ToD ts diff    : %s fs", ts_tod_diff)
+    tb.log.info("Rel ts diff    : %s fs", ts_rel_diff)
+
+    rel_stats, tod_stats = tb.analyzer.stats
+    tb.log.info("Rel ts vs. sim time: %s", rel_stats)
+    tb.log.info("ToD ts vs. sim time: %s", tod_stats)
+
+    assert rel_stats.max - rel_stats.min < 1000
+    assert tod_stats.max - tod_stats.min < 1000
 
-    assert abs(ts_tod_diff) < 1e-3
-    assert abs(ts_rel_diff) < 1e-3
+    assert abs(ts_tod_diff) < 1000
+    assert abs(ts_rel_diff) < 1000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
@@ -202,9 +232,9 @@ async def run_offsets(dut):
         await RisingEdge(dut.clk)
 
     await RisingEdge(dut.clk)
-    start_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    start_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    start_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    start_time = sim_time_fs()
+    start_ts_tod = tb.get_sink_ts_tod_fs()
+    start_ts_rel = tb.get_sink_ts_rel_fs()
 
     for k in range(2000):
         await RisingEdge(dut.clk)
@@ -305,26 +335,26 @@ async def run_offsets(dut):
     for k in range(10000):
         await RisingEdge(dut.clk)
 
-    stop_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    stop_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    stop_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    stop_time = sim_time_fs()
+    stop_ts_tod = tb.get_sink_ts_tod_fs()
+    stop_ts_rel = tb.get_sink_ts_rel_fs()
 
     time_delta = stop_time-start_time
     ts_tod_delta = stop_ts_tod-start_ts_tod
     ts_rel_delta = stop_ts_rel-start_ts_rel
 
-    tb.log.info("sim time delta : %s ns", time_delta)
-    tb.log.info("ToD ts delta   : %s ns", ts_tod_delta)
-    tb.log.info("Rel ts delta   : %s ns", ts_rel_delta)
+    tb.log.info("sim time delta : %s fs", time_delta)
+    tb.log.info("ToD ts delta   : %s fs", ts_tod_delta)
+    tb.log.info("Rel ts delta   : %s fs", ts_rel_delta)
 
-    ts_tod_diff = time_delta - ts_tod_delta + Decimal(0.03125) + Decimal(20000000)
-    ts_rel_diff = time_delta - ts_rel_delta + Decimal(0.03125) + Decimal(20000)
+    ts_tod_diff = time_delta - ts_tod_delta + 31250 + 20000000*1000000
+    ts_rel_diff = time_delta - ts_rel_delta + 31250 + 20000*1000000
 
-    tb.log.info("ToD ts diff    : %s ns", ts_tod_diff)
-    tb.log.info("Rel ts diff    : %s ns", ts_rel_diff)
+    tb.log.info("ToD ts diff    : %s fs", ts_tod_diff)
+    tb.log.info("Rel ts diff    : %s fs", ts_rel_diff)
 
-    assert abs(ts_tod_diff) < 1e-3
-    assert abs(ts_rel_diff) < 1e-3
+    assert abs(ts_tod_diff) < 1000
+    assert abs(ts_rel_diff) < 1000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
@@ -353,9 +383,9 @@ async def run_seconds_increment(dut):
         await RisingEdge(dut.clk)
 
     await RisingEdge(dut.clk)
-    start_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    start_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    start_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    start_time = sim_time_fs()
+    start_ts_tod = tb.get_sink_ts_tod_fs()
+    start_ts_rel = tb.get_sink_ts_rel_fs()
 
     saw_pps = False
 
@@ -364,31 +394,31 @@ async def run_seconds_increment(dut):
 
         if int(dut.output_pps.value):
             saw_pps = True
-            tb.log.info("Got PPS with sink ToD TS %s", tb.ptp_td_sink.get_ts_tod_ns())
-            assert (tb.ptp_td_sink.get_ts_tod_s() - 1) < 6.4e-9
+            tb.log.info("Got PPS with sink ToD TS %s fs", tb.get_sink_ts_tod_fs())
+            assert (tb.get_sink_ts_tod_fs() - FS_PER_S) < 6400000
 
     assert saw_pps
 
-    stop_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    stop_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    stop_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    stop_time = sim_time_fs()
+    stop_ts_tod = tb.get_sink_ts_tod_fs()
+    stop_ts_rel = tb.get_sink_ts_rel_fs()
 
     time_delta = stop_time-start_time
     ts_tod_delta = stop_ts_tod-start_ts_tod
     ts_rel_delta = stop_ts_rel-start_ts_rel
 
-    tb.log.info("sim time delta : %s ns", time_delta)
-    tb.log.info("ToD ts delta   : %s ns", ts_tod_delta)
-    tb.log.info("Rel ts delta   : %s ns", ts_rel_delta)
+    tb.log.info("sim time delta : %s fs", time_delta)
+    tb.log.info("ToD ts delta   : %s fs", ts_tod_delta)
+    tb.log.info("Rel ts delta   : %s fs", ts_rel_delta)
 
     ts_tod_diff = time_delta - ts_tod_delta
     ts_rel_diff = time_delta - ts_rel_delta
 
-    tb.log.info("ToD ts diff    : %s ns", ts_tod_diff)
-    tb.log.info("Rel ts diff    : %s ns", ts_rel_diff)
+    tb.log.info("ToD ts diff    : %s fs", ts_tod_diff)
+    tb.log.info("Rel ts diff    : %s fs", ts_rel_diff)
 
-    assert abs(ts_tod_diff) < 1e-3
-    assert abs(ts_rel_diff) < 1e-3
+    assert abs(ts_tod_diff) < 1000
+    assert abs(ts_rel_diff) < 1000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
@@ -415,33 +445,38 @@ async def run_frequency_adjustment(dut):
         await RisingEdge(dut.clk)
 
     await RisingEdge(dut.clk)
-    start_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    start_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    start_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    start_time = sim_time_fs()
+    start_ts_tod = tb.get_sink_ts_tod_fs()
+    start_ts_rel = tb.get_sink_ts_rel_fs()
+    tb.analyzer.reset()
 
     for k in range(10000):
         await RisingEdge(dut.clk)
 
-    stop_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    stop_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    stop_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    stop_time = sim_time_fs()
+    stop_ts_tod = tb.get_sink_ts_tod_fs()
+    stop_ts_rel = tb.get_sink_ts_rel_fs()
 
     time_delta = stop_time-start_time
     ts_tod_delta = stop_ts_tod-start_ts_tod
     ts_rel_delta = stop_ts_rel-start_ts_rel
 
-    tb.log.info("sim time delta : %s ns", time_delta)
-    tb.log.info("ToD ts delta   : %s ns", ts_tod_delta)
-    tb.log.info("Rel ts delta   : %s ns", ts_rel_delta)
+    tb.log.info("sim time delta : %s fs", time_delta)
+    tb.log.info("ToD ts delta   : %s fs", ts_tod_delta)
+    tb.log.info("Rel ts delta   : %s fs", ts_rel_delta)
 
-    ts_tod_diff = time_delta - ts_tod_delta * Decimal(6.4/(6+(0x66240000+2/5)/2**32))
-    ts_rel_diff = time_delta - ts_rel_delta * Decimal(6.4/(6+(0x66240000+2/5)/2**32))
+    ts_tod_diff = time_delta - ts_tod_delta * 6.4/(6+(0x66240000+2/5)/2**32)
+    ts_rel_diff = time_delta - ts_rel_delta * 6.4/(6+(0x66240000+2/5)/2**32)
 
-    tb.log.info("ToD ts diff    : %s ns", ts_tod_diff)
-    tb.log.info("Rel ts diff    : %s ns", ts_rel_diff)
+    tb.log.info("ToD ts diff    : %s fs", ts_tod_diff)
+    tb.log.info("Rel ts diff    : %s fs", ts_rel_diff)
 
-    assert abs(ts_tod_diff) < 1e-3
-    assert abs(ts_rel_diff) < 1e-3
+    rel_stats, tod_stats = tb.analyzer.stats
+    tb.log.info("Rel ts vs. sim time: %s", rel_stats)
+    tb.log.info("ToD ts vs. sim time: %s", tod_stats)
+
+    assert abs(ts_tod_diff) < 1000
+    assert abs(ts_rel_diff) < 1000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
@@ -466,33 +501,38 @@ async def run_drift_adjustment(dut):
         await RisingEdge(dut.clk)
 
     await RisingEdge(dut.clk)
-    start_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    start_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    start_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    start_time = sim_time_fs()
+    start_ts_tod = tb.get_sink_ts_tod_fs()
+    start_ts_rel = tb.get_sink_ts_rel_fs()
+    tb.analyzer.reset()
 
     for k in range(10000):
         await RisingEdge(dut.clk)
 
-    stop_time = Decimal(get_sim_time('fs')).scaleb(-6)
-    stop_ts_tod = tb.ptp_td_sink.get_ts_tod_ns()
-    stop_ts_rel = tb.ptp_td_sink.get_ts_rel_ns()
+    stop_time = sim_time_fs()
+    stop_ts_tod = tb.get_sink_ts_tod_fs()
+    stop_ts_rel = tb.get_sink_ts_rel_fs()
 
     time_delta = stop_time-start_time
     ts_tod_delta = stop_ts_tod-start_ts_tod
     ts_rel_delta = stop_ts_rel-start_ts_rel
 
-    tb.log.info("sim time delta : %s ns", time_delta)
-    tb.log.info("ToD ts delta   : %s ns", ts_tod_delta)
-    tb.log.info("Rel ts delta   : %s ns", ts_rel_delta)
+    tb.log.info("sim time delta : %s fs", time_delta)
+    tb.log.info("ToD ts delta   : %s fs", ts_tod_delta)
+    tb.log.info("Rel ts delta   : %s fs", ts_rel_delta)
+
+    ts_tod_diff = time_delta - ts_tod_delta * 6.4/(6+(0x66666666+20000/5)/2**32)
+    ts_rel_diff = time_delta - ts_rel_delta * 6.4/(6+(0x66666666+20000/5)/2**32)
 
-    ts_tod_diff = time_delta - ts_tod_delta * Decimal(6.4/(6+(0x66666666+20000/5)/2**32))
-    ts_rel_diff = time_delta - ts_rel_delta * Decimal(6.4/(6+(0x66666666+20000/5)/2**32))
+    tb.log.info("ToD ts diff    : %s fs", ts_tod_diff)
+    tb.log.info("Rel ts diff    : %s fs", ts_rel_diff)
 
-    tb.log.info("ToD ts diff    : %s ns", ts_tod_diff)
-    tb.log.info("Rel ts diff    : %s ns", ts_rel_diff)
+    rel_stats, tod_stats = tb.analyzer.stats
+    tb.log.info("Rel ts vs. sim time: %s", rel_stats)
+    tb.log.info("ToD ts vs. sim time: %s", tod_stats)
 
-    assert abs(ts_tod_diff) < 1e-3
-    assert abs(ts_rel_diff) < 1e-3
+    assert abs(ts_tod_diff) < 1000
+    assert abs(ts_rel_diff) < 1000
 
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
@@ -12,7 +12,7 @@ Authors:
 import logging
 import os
 import sys
-from decimal import Decimal
+from fractions import Fraction
 
 import cocotb_test.simulator
 
@@ -24,11 +24,13 @@ from cocotbext.axi import AxiStreamBus, AxiStreamFrame, AxiStreamSource, AxiStre
 
 try:
     from ptp_td import PtpTdSource
+    from ptp_ts import FS_PER_NS, NS_PER_S, tod_to_fs, ts_tod_to_fs, ts_tod_to_fs_array
 except ImportError:
     # attempt import from current directory
     sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
     try:
         from ptp_td import PtpTdSource
+        from ptp_ts import FS_PER_NS, NS_PER_S, tod_to_fs, ts_tod_to_fs, ts_tod_to_fs_array
     finally:
         del sys.path[0]
 
@@ -75,6 +77,8 @@ async def run_test(dut):
 
     await tb.reset()
 
+    out_tods = []
+
     for start_rel, start_tod in [
                 ('1234', '123456789.987654321'),
                 ('1234', '123456788.987654321'),
@@ -98,38 +102,49 @@ async def run_test(dut):
         for offset in ['0', '0.05', '-0.9']:
 
             tb.log.info(f"Offset {offset} sec")
-            ts_rel = tb.ptp_td_source.get_ts_rel_ns()
-            ts_tod = tb.ptp_td_source.get_ts_tod_ns()
+            offset_ns = int(Fraction(offset)*NS_PER_S)
+            ts_rel_ns, ts_rel_fns = tb.ptp_td_source.get_ts_rel()
+            ts_tod = tod_to_fs(*tb.ptp_td_source.get_ts_tod())
 
-            tb.log.info(f"Current rel ts: {ts_rel} ns")
-            tb.log.info(f"Current ToD ts: {ts_tod} ns")
+            tb.log.info(f"Current rel ts: {ts_rel_ns} ns + {ts_rel_fns:#010x} fns")
+            tb.log.info(f"Current ToD ts: {ts_tod} fs")
 
-            ts_rel += Decimal(offset).scaleb(9)
-            ts_tod += Decimal(offset).scaleb(9)
-            rel = int(ts_rel*2**16) & 0xffffffffffff
+            ts_rel_ns += offset_ns
+            ts_tod += offset_ns*FS_PER_NS
+            rel = ((ts_rel_ns << 16) | (ts_rel_fns >> 16)) & 0xffffffffffff
 
-            tb.log.info(f"Input rel ts: {ts_rel} ns")
-            tb.log.info(f"Input ToD ts: {ts_tod} ns")
+            tb.log.info(f"Input rel ts: {ts_rel_ns} ns + {ts_rel_fns:#010x} fns")
+            tb.log.info(f"Input ToD ts: {ts_tod} fs")
             tb.log.info(f"Input relative ts raw: {rel} ({rel:#x})")
 
             await tb.ts_source.send(AxiStreamFrame(tdata=[rel], tid=0))
             out_ts = await tb.ts_sink.recv()
 
             tod = out_ts.tdata[0]
+            out_tods.append(tod)
             tb.log.info(f"Output ToD ts raw: {tod} ({tod:#x})")
-            ns = Decimal(tod & 0xffff) / Decimal(2**16)
-            ns = tb.ptp_td_source.ctx.add(ns, Decimal((tod >> 16) & 0xffffffff))
-            tod = tb.ptp_td_source.ctx.add(ns, Decimal(tod >> 48).scaleb(9))
-            tb.log.info(f"Output ToD ts: {tod} ns")
+            ns = (tod >> 16) & 0xffffffff
+            tod = ts_tod_to_fs(tod)
+            tb.log.info(f"Output ToD ts: {tod} fs")
 
             tb.log.info(f"Output ns portion only: {ns} ns")
 
             diff = tod - ts_tod
-            tb.log.info(f"Difference: {diff} ns")
+            tb.log.info(f"Difference: {diff} fs")
 
-            assert abs(diff) < 1e-3
+            assert abs(diff) < 1000
             assert ns < 1000000000
 
+    # batch conversion must match the scalar conversion, both absolute and
+    # relative to a nearby base
+    ref = [ts_tod_to_fs(t) for t in out_tods]
+    for base_fs in [0, ref[0]]:
+        assert [int(v) for v in ts_tod_to_fs_array(out_tods, base_fs=base_fs)] == [v-base_fs for v in ref]
+
+    # seconds fields where the ns value alone overflows int64
+    big = [(2**47 << 48) | (5 << 16) | 106, ((2**48-1) << 48) | (999999999 << 16) | 0xffff]
+    assert [int(v) for v in ts_tod_to_fs_array(big)] == [ts_tod_to_fs(t) for t in big]
+
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
 
@@ -0,0 +1 @@
+../../axis/tb/cobs.py
\ No newline at end of file
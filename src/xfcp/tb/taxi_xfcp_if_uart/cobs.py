@@ -0,0 +1 @@
+../cobs.py
\ No newline at end of file
@@ -25,12 +25,12 @@ from cocotbext.axi import AxiStreamBus, AxiStreamSource, AxiStreamSink
 from cocotbext.uart import UartSource, UartSink
 
 try:
-    from xfcp import XfcpFrame
+    from xfcp import XfcpFrame, XfcpFrameDecoder
 except ImportError:
     # attempt import from current directory
     sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
     try:
-        from xfcp import XfcpFrame
+        from xfcp import XfcpFrame, XfcpFrameDecoder
     finally:
         del sys.path[0]
 
@@ -70,6 +70,8 @@ async def run_test_tx(dut, payload_lengths=None, payload_data=None):
 
     await tb.reset()
 
+    decoder = XfcpFrameDecoder()
+
     for test_data in [payload_data(x) for x in payload_lengths()]:
 
         pkt = XfcpFrame()
@@ -80,14 +82,12 @@ async def run_test_tx(dut, payload_lengths=None, payload_data=None):
 
         await tb.dsp_source.write(pkt.build())
 
-        rx_data = bytearray()
-        while True:
-            b = await tb.uart_sink.read(1)
-            if b[0] == 0:
-                break
-            rx_data.extend(b)
+        rx_pkts = []
+        while not rx_pkts:
+            rx_pkts = decoder.feed(await tb.uart_sink.read())
 
-        rx_pkt = XfcpFrame.parse_cobs(rx_data)
+        assert len(rx_pkts) == 1
+        rx_pkt = rx_pkts[0]
 
         print(rx_pkt)
         assert rx_pkt == pkt
@@ -21,6 +21,7 @@ import pytest
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge
+from cocotb.utils import get_sim_time
 from cocotb.regression import TestFactory
 
 from cocotbext.axi import AxiStreamBus, AxiStreamSource, AxiStreamSink
@@ -28,11 +29,15 @@ from cocotbext.axi import AxiBus, AxiRam
 
 try:
     from xfcp import XfcpFrame
+    from xfcp_bridge import XfcpSimTransport
+    from xfcp_client import XfcpClient, XfcpMemoryNode
 except ImportError:
     # attempt import from current directory
     sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
     try:
         from xfcp import XfcpFrame
+        from xfcp_bridge import XfcpSimTransport
+        from xfcp_client import XfcpClient, XfcpMemoryNode
     finally:
         del sys.path[0]
 
@@ -159,6 +164,64 @@ async def run_test_read(dut, idle_inserter=None, backpressure_inserter=None):
     await RisingEdge(dut.clk)
 
 
+async def run_test_bulk(dut, idle_inserter=None, backpressure_inserter=None, size=4096, chunk=256, window=8):
+
+    tb = TB(dut)
+
+    await tb.reset()
+
+    tb.set_idle_generator(idle_inserter)
+    tb.set_backpressure_generator(backpressure_inserter)
+
+    # drive the DUT through the host-side client
+    transport = XfcpSimTransport(tb.usp_source, tb.usp_sink, dut.clk)
+    client = XfcpClient(transport, timeout=None)
+
+    id = await transport.run(client.identify([]))
+    tb.log.info("ID: %s", id)
+
+    node = XfcpMemoryNode(client, [], id, max_payload=chunk, window=window)
+
+    base = 0x1000
+    test_data = bytearray([x % 251 for x in range(size)])
+
+    for write in [True, False]:
+        tb.log.info("Bulk %s: %d bytes in %d byte requests, window %d",
+            "write" if write else "read", size, node.chunk_size*node.word_bytes, window)
+
+        start_time = get_sim_time('ns')
+        request_count = client.request_count
+
+        if write:
+            await transport.run(node.write(base, test_data))
+        else:
+            rx_data = await transport.run(node.read(base, size // node.word_bytes))
+
+        elapsed = get_sim_time('ns') - start_time
+
+        tb.log.info("Bulk %s: %d bytes in %d requests, %d ns (%.2f MB/s)",
+            "write" if write else "read", size, client.request_count-request_count,
+            elapsed, size/elapsed*1e3)
+
+        if write:
+            for k in range(100):
+                await RisingEdge(dut.clk)
+
+            assert tb.axi_ram.read(base, size) == test_data
+        else:
+            assert rx_data == test_data
+
+    assert client.stray_count == 0
+
+    await transport.run(client.close())
+    assert transport.loop.is_closed()
+
+    assert tb.usp_sink.empty()
+
+    await RisingEdge(dut.clk)
+    await RisingEdge(dut.clk)
+
+
 async def run_test_id(dut, idle_inserter=None, backpressure_inserter=None):
 
     tb = TB(dut)
@@ -193,7 +256,7 @@ def cycle_pause():
 
 if getattr(cocotb, 'top', None) is not None:
 
-    for test in [run_test_write, run_test_read, run_test_id]:
+    for test in [run_test_write, run_test_read, run_test_bulk, run_test_id]:
 
         factory = TestFactory(test)
         factory.add_option("idle_inserter", [None, cycle_pause])
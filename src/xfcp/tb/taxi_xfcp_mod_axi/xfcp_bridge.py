@@ -0,0 +1 @@
+../xfcp_bridge.py
\ No newline at end of file
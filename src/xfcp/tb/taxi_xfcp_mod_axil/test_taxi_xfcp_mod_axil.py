@@ -28,11 +28,13 @@ from cocotbext.axi import AxiLiteBus, AxiLiteRam
 
 try:
     from xfcp import XfcpFrame
+    from xfcp_bridge import XfcpSocketBridge
 except ImportError:
     # attempt import from current directory
     sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
     try:
         from xfcp import XfcpFrame
+        from xfcp_bridge import XfcpSocketBridge
     finally:
         del sys.path[0]
 
@@ -187,6 +189,28 @@ async def run_test_id(dut, idle_inserter=None, backpressure_inserter=None):
     await RisingEdge(dut.clk)
 
 
+# serve the DUT to host-side XFCP tools on XFCP_BRIDGE (host:port or a Unix
+# socket path) until the client disconnects; run with TESTCASE=run_bridge
+@cocotb.test(skip=not os.getenv("XFCP_BRIDGE"))
+async def run_bridge(dut):
+
+    tb = TB(dut)
+
+    await tb.reset()
+
+    bridge = XfcpSocketBridge(os.getenv("XFCP_BRIDGE"), tb.usp_source, tb.usp_sink)
+
+    await bridge.wait_connect()
+    await bridge.wait_disconnect()
+
+    tb.log.info("Bridge: %d frames in, %d frames out", bridge.rx_frame_count, bridge.tx_frame_count)
+
+    bridge.close()
+
+    await RisingEdge(dut.clk)
+    await RisingEdge(dut.clk)
+
+
 def cycle_pause():
     return itertools.cycle([1, 1, 1, 0])
 
@@ -10,63 +10,7 @@ Authors:
 
 import struct
 
-
-def cobs_encode(block):
-    block = bytes(block)
-    enc = bytearray()
-
-    seg = bytearray()
-    code = 1
-
-    new_data = True
-
-    for b in block:
-        if b == 0:
-            enc.append(code)
-            enc.extend(seg)
-            code = 1
-            seg = bytearray()
-            new_data = True
-        else:
-            code += 1
-            seg.append(b)
-            new_data = True
-            if code == 255:
-                enc.append(code)
-                enc.extend(seg)
-                code = 1
-                seg = bytearray()
-                new_data = False
-
-    if new_data:
-        enc.append(code)
-        enc.extend(seg)
-
-    return bytes(enc)
-
-
-def cobs_decode(block):
-    block = bytes(block)
-    dec = bytearray()
-
-    code = 0
-
-    i = 0
-
-    if 0 in block:
-        return None
-
-    while i < len(block):
-        code = block[i]
-        i += 1
-        if i+code-1 > len(block):
-            return None
-        dec.extend(block[i:i+code-1])
-        i += code-1
-        if code < 255 and i < len(block):
-            dec.append(0)
-
-    return bytes(dec)
+from cobs import cobs_encode, cobs_decode, CobsFrameDecoder
 
 
 class XfcpFrame(object):
@@ -157,3 +101,20 @@ class XfcpFrame(object):
 
     def __repr__(self):
         return f"XfcpFrame(payload={self.payload!r}, path={self.path!r}, rpath={self.rpath!r}, ptype={self.ptype})"
+
+
+class XfcpFrameDecoder(CobsFrameDecoder):
+    """Incremental decoder for a COBS-framed XFCP byte stream
+
+    feed() accepts arbitrary-size chunks (for example, bytes read from a
+    UART) and returns the list of XfcpFrame objects completed by that chunk.
+    """
+
+    def decode_frame(self, block):
+        data = cobs_decode(block)
+        if not data:
+            return None
+        try:
+            return XfcpFrame.parse(data)
+        except (AssertionError, IndexError):
+            return None
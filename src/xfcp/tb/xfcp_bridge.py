@@ -0,0 +1,291 @@
+# SPDX-License-Identifier: MIT
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+import asyncio
+import logging
+import os
+import select
+import socket
+from collections import deque
+
+import cocotb
+from cocotb.triggers import Event, RisingEdge, Timer
+
+from cobs import cobs_encode, CobsFrameDecoder
+from xfcp import XfcpFrame
+
+
+class XfcpSocketBridge:
+    """Expose an XFCP port of a running simulation on a local socket
+
+    Host-side tools connect to address (a (host, port) tuple or "host:port"
+    string for TCP, anything else is a Unix socket path) and exchange a
+    COBS-framed XFCP byte stream, exactly as over a UART, so the same
+    scripts run against the simulation and the hardware.
+
+    With framed=True, source and sink are AXI stream models on the XFCP
+    upstream port (xfcp_usp_ds/xfcp_usp_us) and each COBS frame maps to
+    one AXI stream frame.  With framed=False, source and sink are byte
+    stream models (UartSource/UartSink on the UART pins) and bytes are
+    passed through unchanged.
+
+    The socket is polled every poll_interval of simulation time; all data
+    waiting on the socket is forwarded at once, and everything the DUT has
+    produced is sent in one write.  The socket is never blocking: output
+    the host has not yet accepted is buffered and retried on each poll,
+    so a host that stops reading does not stall the simulation.  After idle_polls polls with no
+    traffic, each poll also waits up to idle_timeout seconds of real time
+    for the host, so an idle link does not spin the simulator.
+    """
+
+    def __init__(self, address, source, sink, framed=True, poll_interval=1, poll_unit='us',
+            idle_polls=100, idle_timeout=0.001):
+        self.log = logging.getLogger("cocotb.xfcp_bridge")
+
+        self.source = source
+        self.sink = sink
+        self.framed = framed
+        self.poll_interval = poll_interval
+        self.poll_unit = poll_unit
+        self.idle_polls = idle_polls
+        self.idle_timeout = idle_timeout
+
+        self.rx_frame_count = 0
+        self.tx_frame_count = 0
+        self.rx_byte_count = 0
+        self.tx_byte_count = 0
+        self.drop_count = 0
+
+        if isinstance(address, str) and ':' in address and '/' not in address:
+            host, port = address.rsplit(':', 1)
+            address = (host, int(port))
+
+        if isinstance(address, tuple):
+            self.listen_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        else:
+            if os.path.exists(address):
+                os.unlink(address)
+            self.listen_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        self.listen_sock.bind(address)
+        self.listen_sock.listen(1)
+        self.listen_sock.setblocking(False)
+        self.address = self.listen_sock.getsockname()
+
+        self.log.info("XFCP bridge listening on %s", self.address)
+
+        self.sock = None
+        self.decoder = CobsFrameDecoder()
+        self.tx_buf = bytearray()
+
+        self._connect_event = Event()
+        self._disconnect_event = Event()
+
+        self._run_rx_cr = cocotb.start_soon(self._run_rx())
+        self._run_tx_cr = cocotb.start_soon(self._run_tx())
+
+    async def wait_connect(self):
+        await self._connect_event.wait()
+
+    async def wait_disconnect(self):
+        await self._disconnect_event.wait()
+
+    def close(self):
+        self._run_rx_cr.kill()
+        self._run_tx_cr.kill()
+        self._close_client()
+        self.listen_sock.close()
+        if self.listen_sock.family == socket.AF_UNIX and isinstance(self.address, str):
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+    def _close_client(self):
+        if self.sock is not None:
+            self.log.info("XFCP bridge client disconnected")
+            self.sock.close()
+            self.sock = None
+            self.tx_buf.clear()
+            self._connect_event.clear()
+            self._disconnect_event.set()
+
+    def _send(self, data):
+        if self.sock is None:
+            return
+        self.tx_buf += data
+        self._flush()
+
+    def _flush(self):
+        # send as much of the buffered output as the socket will take
+        while self.sock is not None and self.tx_buf:
+            try:
+                n = self.sock.send(self.tx_buf)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                self._close_client()
+                break
+            self.tx_byte_count += n
+            del self.tx_buf[:n]
+
+    def _poll(self, timeout):
+        if self.sock is None:
+            r, _, _ = select.select([self.listen_sock], [], [], timeout)
+            if not r:
+                return b''
+            self.sock, addr = self.listen_sock.accept()
+            self.sock.setblocking(False)
+            self.decoder.reset()
+            self.log.info("XFCP bridge client connected from %s", addr)
+            self._disconnect_event.clear()
+            self._connect_event.set()
+            timeout = 0
+
+        self._flush()
+
+        data = bytearray()
+        while self.sock is not None:
+            r, _, _ = select.select([self.sock], [], [], timeout)
+            if not r:
+                break
+            try:
+                d = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                d = b''
+            if not d:
+                self._close_client()
+                break
+            data += d
+            timeout = 0
+
+        return data
+
+    async def _run_rx(self):
+        # host to simulation
+        idle = 0
+
+        while True:
+            await Timer(self.poll_interval, self.poll_unit)
+
+            data = self._poll(self.idle_timeout if idle >= self.idle_polls else 0)
+
+            if not data:
+                idle += 1
+                continue
+
+            idle = 0
+            self.rx_byte_count += len(data)
+
+            if self.framed:
+                for frame in self.decoder.feed(data):
+                    self.rx_frame_count += 1
+                    await self.source.send(frame)
+            else:
+                await self.source.write(data)
+
+    async def _run_tx(self):
+        # simulation to host
+        while True:
+            if self.framed:
+                frames = [await self.sink.recv()]
+                while not self.sink.empty():
+                    frames.append(self.sink.recv_nowait())
+
+                data = bytearray()
+                for frame in frames:
+                    if frame.tuser:
+                        # frame marked bad by the DUT
+                        self.drop_count += 1
+                        continue
+                    data += cobs_encode(frame.tdata)
+                    data.append(0)
+                    self.tx_frame_count += 1
+            else:
+                data = await self.sink.read()
+
+            self._send(data)
+
+
+class XfcpSimTransport:
+    """Run the asyncio XFCP client against a simulated XFCP port
+
+    cocotb does not run an asyncio event loop, so this owns one and steps
+    it from run() on every clock edge.  Frames sent by the client go to
+    source and frames from sink are passed to the client; source and sink
+    are AXI stream models on the XFCP upstream port (xfcp_usp_ds and
+    xfcp_usp_us).  Use the client without a timeout, as the event loop
+    only advances with the simulation.  Finish with
+    run(client.close()), which also closes the event loop.
+    """
+
+    def __init__(self, source, sink, clock, steps=8):
+        self.source = source
+        self.sink = sink
+        self.clock = clock
+        self.steps = steps
+
+        self.loop = asyncio.new_event_loop()
+        self._closing = False
+        self._tx_queue = deque()
+        self._rx_queue = asyncio.Queue()
+
+    # transport interface, used by XfcpClient on the asyncio side
+
+    def send(self, frame):
+        self._tx_queue.append(frame)
+
+    async def flush(self):
+        pass
+
+    async def recv(self):
+        return await self._rx_queue.get()
+
+    async def close(self):
+        # the loop is still running this coroutine; run() closes it
+        self._closing = True
+
+    # simulation side
+
+    def _step(self):
+        # run the callbacks that are ready, without blocking
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+
+    async def run(self, coro):
+        """Run an asyncio coroutine to completion and return its result"""
+        task = self.loop.create_task(coro)
+
+        while True:
+            for k in range(self.steps):
+                if task.done():
+                    break
+                self._step()
+
+            while self._tx_queue:
+                await self.source.send(self._tx_queue.popleft().build())
+
+            if task.done():
+                if self._closing:
+                    self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+                    self.loop.close()
+                return task.result()
+
+            await RisingEdge(self.clock)
+
+            while not self.sink.empty():
+                frame = self.sink.recv_nowait()
+                if frame.tuser:
+                    # frame marked bad by the DUT
+                    continue
+                self._rx_queue.put_nowait(XfcpFrame.parse(frame.tdata))
@@ -0,0 +1,612 @@
+# SPDX-License-Identifier: MIT
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+from collections import deque
+
+from xfcp import XfcpFrame, XfcpFrameDecoder
+
+
+# packet types; responses are the request type with the LSB set
+READ_REQ = 0x10
+READ_RESP = 0x11
+WRITE_REQ = 0x12
+WRITE_RESP = 0x13
+I2C_REQ = 0x2C
+I2C_RESP = 0x2D
+ID_REQ = 0xFE
+ID_RESP = 0xFF
+
+# rpath values must not collide with the 0xFE/0xFF header tags
+MAX_TAGS = 0xFE
+
+
+class XfcpError(Exception):
+    pass
+
+
+class XfcpStreamTransport:
+    """XFCP over a COBS-framed byte stream
+
+    Wraps an asyncio StreamReader/StreamWriter pair, such as a serial port,
+    pty, or TCP/Unix socket.  send() only queues data; several frames sent
+    back to back are written out together on the next flush().
+    """
+
+    def __init__(self, reader, writer, max_len=None):
+        self.reader = reader
+        self.writer = writer
+        self.decoder = XfcpFrameDecoder(max_len)
+        self._rx_queue = deque()
+
+    def send(self, frame):
+        self.writer.write(frame.build_cobs())
+
+    async def flush(self):
+        await self.writer.drain()
+
+    async def recv(self):
+        while not self._rx_queue:
+            data = await self.reader.read(65536)
+            if not data:
+                raise ConnectionError("XFCP connection closed")
+            self._rx_queue.extend(self.decoder.feed(data))
+        return self._rx_queue.popleft()
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, NotImplementedError):
+            pass
+
+
+async def open_tcp(host, port, **kwargs):
+    reader, writer = await asyncio.open_connection(host, port)
+    return XfcpStreamTransport(reader, writer, **kwargs)
+
+
+async def open_unix(path, **kwargs):
+    reader, writer = await asyncio.open_unix_connection(path)
+    return XfcpStreamTransport(reader, writer, **kwargs)
+
+
+async def open_serial(port, baudrate=115200, **kwargs):
+    # raw POSIX serial port or pty
+    import termios
+    import tty
+
+    fd = os.open(port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    try:
+        tty.setraw(fd)
+        speed = getattr(termios, f"B{baudrate}", None)
+        if speed is None:
+            raise ValueError(f"Unsupported baud rate: {baudrate}")
+        attr = termios.tcgetattr(fd)
+        attr[4] = attr[5] = speed
+        termios.tcsetattr(fd, termios.TCSANOW, attr)
+    except BaseException:
+        os.close(fd)
+        raise
+
+    loop = asyncio.get_running_loop()
+
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader),
+        os.fdopen(fd, 'rb', buffering=0))
+
+    wtransport, wprotocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin,
+        os.fdopen(os.dup(fd), 'wb', buffering=0))
+    writer = asyncio.StreamWriter(wtransport, wprotocol, reader, loop)
+
+    return XfcpStreamTransport(reader, writer, **kwargs)
+
+
+class XfcpUdpTransport(asyncio.DatagramProtocol):
+    """XFCP over UDP, one unencoded frame per datagram"""
+
+    def __init__(self):
+        self.transport = None
+        self.error_count = 0
+        self._rx_queue = asyncio.Queue()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            frame = XfcpFrame.parse(data)
+        except (AssertionError, IndexError):
+            self.error_count += 1
+            return
+        self._rx_queue.put_nowait(frame)
+
+    def error_received(self, exc):
+        self.error_count += 1
+
+    def connection_lost(self, exc):
+        self._rx_queue.put_nowait(None)
+
+    def send(self, frame):
+        self.transport.sendto(frame.build())
+
+    async def flush(self):
+        pass
+
+    async def recv(self):
+        frame = await self._rx_queue.get()
+        if frame is None:
+            raise ConnectionError("XFCP UDP transport closed")
+        return frame
+
+    async def close(self):
+        self.transport.close()
+
+
+async def open_udp(host, port=14000, local_addr=None):
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(XfcpUdpTransport,
+        remote_addr=(host, port), local_addr=local_addr)
+    return protocol
+
+
+class XfcpClient:
+    """Pipelined XFCP client
+
+    Each request is tagged with a one-byte rpath, which XFCP modules echo
+    back in the response, so any number of requests (up to max_in_flight)
+    can be outstanding at once, to the same or to different paths.
+    Responses are matched to requests by tag as they arrive, in any order.
+
+    For lossy transports (UDP), set retries to resend a request with the
+    same tag each time timeout expires without a response.  Only use this
+    with idempotent requests (memory reads and writes, ID).
+    """
+
+    def __init__(self, transport, timeout=1.0, max_in_flight=64, retries=0):
+        self.log = logging.getLogger("xfcp")
+
+        self.transport = transport
+        self.timeout = timeout
+
+        if not 0 < max_in_flight <= MAX_TAGS:
+            raise ValueError(f"max_in_flight must be between 1 and {MAX_TAGS}")
+
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+
+        self.request_count = 0
+        self.retransmit_count = 0
+        self.timeout_count = 0
+        self.stray_count = 0
+
+        # tags are reused in FIFO order to keep late responses from
+        # matching a new request for as long as possible
+        self._free_tags = deque(range(MAX_TAGS))
+        self._pending = {}
+        self._sem = asyncio.Semaphore(max_in_flight)
+        self._rx_task = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def start(self):
+        if self._rx_task is None:
+            self._rx_task = asyncio.get_running_loop().create_task(self._run_rx())
+
+    async def close(self):
+        if self._rx_task is not None:
+            self._rx_task.cancel()
+            try:
+                await self._rx_task
+            except (asyncio.CancelledError, ConnectionError):
+                pass
+            self._rx_task = None
+        await self.transport.close()
+
+    async def request(self, path, ptype, payload=b'', timeout=None):
+        self.start()
+
+        if timeout is None:
+            timeout = self.timeout
+
+        path = list(path)
+
+        async with self._sem:
+            tag = self._free_tags.popleft()
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[tag] = (path, fut)
+
+            frame = XfcpFrame(bytes(payload), path, [tag], ptype)
+            self.request_count += 1
+
+            try:
+                for attempt in range(self.retries+1):
+                    if attempt:
+                        self.retransmit_count += 1
+                        self.log.debug("Retransmit %d: %s", attempt, frame)
+                    self.transport.send(frame)
+                    await self.transport.flush()
+                    try:
+                        resp = await asyncio.wait_for(asyncio.shield(fut), timeout)
+                        break
+                    except asyncio.TimeoutError:
+                        if attempt == self.retries:
+                            self.timeout_count += 1
+                            raise
+            finally:
+                del self._pending[tag]
+                self._free_tags.append(tag)
+
+        if resp.ptype != ptype | 1:
+            raise XfcpError(f"Unexpected response type 0x{resp.ptype:02x} to request type 0x{ptype:02x} on path {path}")
+
+        return resp
+
+    async def _run_rx(self):
+        try:
+            while True:
+                frame = await self.transport.recv()
+
+                entry = None
+                if len(frame.rpath) == 1:
+                    entry = self._pending.get(frame.rpath[0])
+
+                if entry is None or entry[0] != frame.path or entry[1].done():
+                    self.stray_count += 1
+                    self.log.warning("Unexpected frame: %s", frame)
+                    continue
+
+                entry[1].set_result(frame)
+        except ConnectionError as ex:
+            for path, fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(ex)
+            raise
+
+    async def identify(self, path, timeout=None):
+        resp = await self.request(path, ID_REQ, timeout=timeout)
+        return XfcpId(resp.payload)
+
+    async def open_node(self, path, id=None):
+        # identify the module at path and wrap it in the matching driver
+        if id is None:
+            id = await self.identify(path)
+        return node_class(id.type)(self, path, id)
+
+    async def probe(self, path, timeout=None):
+        # identify, returning None if nothing answers at path
+        try:
+            return await self.identify(path, timeout)
+        except (asyncio.TimeoutError, XfcpError):
+            return None
+
+    async def enumerate(self, path=(), cache=None, timeout=None):
+        """Enumerate the XFCP tree below path
+
+        All ports of each switch are probed concurrently, so the walk takes
+        one round trip (or one timeout, for unconnected ports) per level.
+        Returns a dict mapping path tuples to nodes.
+
+        If cache names a file, the result is stored there keyed by the ID
+        response of the module at path, and a later enumeration of the same
+        design is served from the cache after a single ID request.  Give the
+        root switch a distinctive XFCP_EXT_ID/XFCP_EXT_ID_STR (a build ID,
+        for example) so that different designs do not share a cache entry.
+        """
+        path = tuple(path)
+        root_id = await self.identify(path)
+
+        key = f"{list(path)}:{root_id.data.hex()}"
+
+        if cache is not None:
+            entries = load_enum_cache(cache).get(key)
+            if entries is not None:
+                self.log.debug("Enumeration cache hit for %s", key)
+                return {tuple(p): await self.open_node(p, XfcpId(bytes.fromhex(d))) for p, d in entries}
+
+        ids = {path: root_id}
+
+        async def walk(p, id):
+            if node_class(id.type) is not XfcpSwitchNode:
+                return
+            child_ids = await asyncio.gather(*[self.probe(p+(k,), timeout) for k in range(id.data[3])])
+            children = [(p+(k,), cid) for k, cid in enumerate(child_ids) if cid is not None]
+            ids.update(children)
+            await asyncio.gather(*[walk(cp, cid) for cp, cid in children])
+
+        await walk(path, root_id)
+
+        if cache is not None:
+            save_enum_cache(cache, key, [(list(p), ids[p].data.hex()) for p in sorted(ids)])
+
+        return {p: await self.open_node(p, ids[p]) for p in sorted(ids)}
+
+
+class XfcpId:
+    """Parsed XFCP ID response
+
+    32 bytes: 16-bit module type, type-specific binary fields, and a 16 byte
+    string at offset 16.  Extended IDs add 16 bytes of binary data and a
+    16 byte string.
+    """
+
+    def __init__(self, data):
+        self.data = bytes(data)
+
+        if len(self.data) < 32:
+            raise XfcpError(f"ID response too short ({len(self.data)} bytes)")
+
+        self.type = struct.unpack_from('<H', self.data)[0]
+        self.str = self._str(self.data[16:32])
+
+        if len(self.data) >= 64:
+            self.ext_id = self.data[32:48]
+            self.ext_str = self._str(self.data[48:64])
+        else:
+            self.ext_id = None
+            self.ext_str = None
+
+    @staticmethod
+    def _str(b):
+        return b.split(b'\x00', 1)[0].decode('ascii', errors='replace')
+
+    def __repr__(self):
+        return f"XfcpId(type=0x{self.type:04x}, str={self.str!r}, ext_str={self.ext_str!r})"
+
+
+class XfcpNode:
+    """Generic XFCP module at path"""
+
+    def __init__(self, client, path, id):
+        self.client = client
+        self.path = list(path)
+        self.id = id
+
+    async def request(self, ptype, payload=b'', timeout=None):
+        return await self.client.request(self.path, ptype, payload, timeout)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(path={self.path!r}, id={self.id!r})"
+
+
+class XfcpSwitchNode(XfcpNode):
+    """taxi_xfcp_switch"""
+
+    def __init__(self, client, path, id):
+        super().__init__(client, path, id)
+        self.port_count = id.data[3]
+
+
+class XfcpMemoryNode(XfcpNode):
+    """Memory-mapped bus master: taxi_xfcp_mod_axi, _axil, and _apb
+
+    Commands are read (0x10) and write (0x12), each with a little-endian
+    address and count in words; field widths come from the ID response.
+    Transfers longer than chunk_size words are split into chunk_size
+    requests, with up to window requests in flight at once; responses are
+    placed by address as they arrive.
+    """
+
+    def __init__(self, client, path, id, max_payload=1024, window=16):
+        super().__init__(client, path, id)
+
+        self.addr_width, self.data_width, self.word_size, self.count_size = struct.unpack_from('<4H', id.data, 2)
+
+        self.word_bytes = max(1, (self.word_size+7)//8)
+        byte_aw = (self.word_bytes-1).bit_length()
+        self.addr_bytes = (self.addr_width+byte_aw+7)//8
+        self.count_bytes = (self.count_size+7)//8
+        self.max_count = 2**self.count_size-1
+
+        self.chunk_size = max(1, min(self.max_count, max_payload // self.word_bytes))
+        self.window = window
+
+    def _header(self, addr, count):
+        if not 0 < count <= self.max_count:
+            raise ValueError(f"Count out of range: {count}")
+        return addr.to_bytes(self.addr_bytes, 'little') + count.to_bytes(self.count_bytes, 'little')
+
+    async def _read(self, addr, count, timeout=None):
+        hdr = self._header(addr, count)
+        resp = await self.request(READ_REQ, hdr, timeout)
+        data = resp.payload[len(hdr):]
+        if resp.payload[:len(hdr)] != hdr or len(data) != count*self.word_bytes:
+            raise XfcpError(f"Malformed read response from {self.path}: {resp}")
+        return data
+
+    async def _write(self, addr, data, timeout=None):
+        hdr = self._header(addr, len(data)//self.word_bytes)
+        resp = await self.request(WRITE_REQ, hdr+data, timeout)
+        if resp.payload[:len(hdr)] != hdr:
+            raise XfcpError(f"Malformed write response from {self.path}: {resp}")
+
+    async def _run_chunks(self, count, op, window):
+        # run op(offset, n) over count words in chunk_size pieces with
+        # window workers pulling from a shared iterator
+        chunks = iter(range(0, count, self.chunk_size))
+
+        async def worker():
+            for offset in chunks:
+                await op(offset, min(self.chunk_size, count-offset))
+
+        workers = [asyncio.ensure_future(worker()) for k in range(min(window or self.window, -(-count // self.chunk_size)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for w in workers:
+                w.cancel()
+            raise
+
+    async def read(self, addr, count, timeout=None, window=None):
+        # count in words; returns count*word_bytes bytes
+        if count <= self.chunk_size:
+            return await self._read(addr, count, timeout)
+
+        wb = self.word_bytes
+        data = bytearray(count*wb)
+
+        async def op(offset, n):
+            data[offset*wb:(offset+n)*wb] = await self._read(addr+offset, n, timeout)
+
+        await self._run_chunks(count, op, window)
+        return bytes(data)
+
+    async def write(self, addr, data, timeout=None, window=None):
+        data = bytes(data)
+        wb = self.word_bytes
+        if len(data) % wb:
+            raise ValueError(f"Data length ({len(data)} bytes) must be a multiple of the word size ({wb} bytes)")
+        count = len(data)//wb
+
+        if count <= self.chunk_size:
+            return await self._write(addr, data, timeout)
+
+        mv = memoryview(data)
+
+        async def op(offset, n):
+            await self._write(addr+offset, mv[offset*wb:(offset+n)*wb], timeout)
+
+        await self._run_chunks(count, op, window)
+
+    async def _read_bytes(self, addr, n):
+        # read n bytes, at least one word; on modules with words wider than
+        # n bytes, the low bytes of the word at addr
+        data = await self.read(addr, max(1, n // self.word_bytes))
+        return data[:n]
+
+    async def read_word(self, addr):
+        return struct.unpack('<H', await self._read_bytes(addr, 2))[0]
+
+    async def read_dword(self, addr):
+        return struct.unpack('<I', await self._read_bytes(addr, 4))[0]
+
+    async def read_qword(self, addr):
+        return struct.unpack('<Q', await self._read_bytes(addr, 8))[0]
+
+    async def write_word(self, addr, val):
+        await self.write(addr, struct.pack('<H', val))
+
+    async def write_dword(self, addr, val):
+        await self.write(addr, struct.pack('<I', val))
+
+    async def write_qword(self, addr, val):
+        await self.write(addr, struct.pack('<Q', val))
+
+
+class XfcpI2cNode(XfcpNode):
+    """taxi_xfcp_mod_i2c_master
+
+    A request is a sequence of command bytes: 0x80|addr sets the I2C
+    address, 0x40 queries status, 0x60 sets the prescaler (16 bit LE), and
+    otherwise bits 0-3 are start/read/write/stop with bit 4 indicating that
+    a count byte follows.  The response echoes the commands with read data
+    and status bytes inserted after the command that produced them.
+    """
+
+    STATUS_BUSY = 0x01
+    STATUS_BUS_CONTROL = 0x02
+    STATUS_BUS_ACTIVE = 0x04
+    STATUS_MISSED_ACK = 0x08
+
+    CMD_START = 0x01
+    CMD_READ = 0x02
+    CMD_WRITE = 0x04
+    CMD_STOP = 0x08
+    CMD_COUNT = 0x10
+
+    async def get_status(self):
+        resp = await self.request(I2C_REQ, b'\x40')
+        return resp.payload[-1]
+
+    async def set_prescale(self, val):
+        await self.request(I2C_REQ, b'\x60'+struct.pack('<H', val))
+
+    async def write_i2c(self, addr, data):
+        await self.write_read_i2c(addr, data, 0)
+
+    async def read_i2c(self, addr, length):
+        return await self.write_read_i2c(addr, b'', length)
+
+    async def write_read_i2c(self, addr, data, length):
+        # write data (if any), then read length bytes (if any), with a
+        # repeated start in between and a stop at the end
+        data = bytes(data)
+        cmd = bytearray([0x80 | (addr & 0x7f)])
+        rd_offset = []
+
+        for k in range(0, len(data), 255):
+            chunk = data[k:k+255]
+            last = k+255 >= len(data) and not length
+            cmd.append(self.CMD_COUNT | self.CMD_WRITE | (self.CMD_STOP if last else 0))
+            cmd.append(len(chunk))
+            cmd.extend(chunk)
+
+        for k in range(0, length, 255):
+            n = min(255, length-k)
+            last = k+255 >= length
+            cmd.append(self.CMD_COUNT | self.CMD_READ | (self.CMD_STOP if last else 0))
+            cmd.append(n)
+            # read data is inserted into the response after the count
+            rd_offset.append((len(cmd)+sum(x[1] for x in rd_offset), n))
+
+        resp = await self.request(I2C_REQ, cmd)
+
+        rd_data = bytearray()
+        for offset, n in rd_offset:
+            rd_data.extend(resp.payload[offset:offset+n])
+
+        if len(rd_data) != length:
+            raise XfcpError(f"Malformed I2C response from {self.path}: {resp}")
+
+        return bytes(rd_data)
+
+
+def load_enum_cache(filename):
+    try:
+        with open(filename, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != 1:
+        return {}
+    return cache.get('designs', {})
+
+
+def save_enum_cache(filename, key, entries):
+    designs = load_enum_cache(filename)
+    designs[key] = entries
+    tmp = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'version': 1, 'designs': designs}, f)
+    os.replace(tmp, filename)
+
+
+# module type to driver class, checked in order as (mask, value, class)
+node_types = [
+    (0xFF00, 0x0100, XfcpSwitchNode),
+    (0x8000, 0x8000, XfcpMemoryNode),
+    (0xFF00, 0x2C00, XfcpI2cNode),
+]
+
+
+def node_class(id_type):
+    for mask, value, cls in node_types:
+        if id_type & mask == value:
+            return cls
+    return XfcpNode
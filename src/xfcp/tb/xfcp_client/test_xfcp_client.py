@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: CERN-OHL-S-2.0
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+try:
+    from xfcp_client import XfcpClient, XfcpMemoryNode, XfcpSwitchNode, open_udp
+    from xfcp_model import XfcpSwitchModel, XfcpMemoryModel, start_udp_server
+except ImportError:
+    # attempt import from current directory
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+    try:
+        from xfcp_client import XfcpClient, XfcpMemoryNode, XfcpSwitchNode, open_udp
+        from xfcp_model import XfcpSwitchModel, XfcpMemoryModel, start_udp_server
+    finally:
+        del sys.path[0]
+
+
+# client tests against the in-process XFCP models over local UDP; no
+# simulator required
+
+
+def build_tree(root_str="XFCP Switch"):
+    return XfcpSwitchModel([
+        XfcpMemoryModel(),
+        XfcpSwitchModel([None, XfcpMemoryModel(id_str="APB Master")]),
+        None,
+        XfcpSwitchModel([XfcpMemoryModel(id_str="AXI Master")]),
+    ], id_str=root_str)
+
+
+async def run_with_server(root, coro_fn, retries=2, **kwargs):
+    server = await start_udp_server(root, **kwargs)
+    host, port = server.transport.get_extra_info('sockname')[:2]
+    try:
+        async with XfcpClient(await open_udp(host, port), timeout=0.05, retries=retries) as client:
+            return await coro_fn(client, server)
+    finally:
+        server.transport.close()
+
+
+def test_xfcp_client_enumerate(tmp_path):
+    cache = os.path.join(tmp_path, "xfcp_enum.json")
+
+    expected = {
+        (): "XFCP Switch",
+        (0,): "AXIL Master",
+        (1,): "XFCP Switch",
+        (1, 1): "APB Master",
+        (3,): "XFCP Switch",
+        (3, 0): "AXI Master",
+    }
+
+    async def enumerate_tree(root, cache):
+        async def run(client, server):
+            nodes = await client.enumerate(cache=cache, timeout=0.05)
+            return nodes, client.request_count
+        return await run_with_server(root, run)
+
+    async def run():
+        root = build_tree()
+
+        # walk without a cache
+        nodes, count = await enumerate_tree(root, None)
+        assert {p: n.id.str for p, n in nodes.items()} == expected
+        assert isinstance(nodes[(1,)], XfcpSwitchNode)
+        assert isinstance(nodes[(1, 1)], XfcpMemoryNode)
+        assert nodes[(1,)].port_count == 2
+        assert count > len(expected)
+
+        # cache miss: full walk, result stored
+        nodes, count = await enumerate_tree(root, cache)
+        assert {p: n.id.str for p, n in nodes.items()} == expected
+        assert count > len(expected)
+        assert os.path.exists(cache)
+
+        # cache hit: only the root ID request
+        nodes, count = await enumerate_tree(root, cache)
+        assert {p: n.id.str for p, n in nodes.items()} == expected
+        assert isinstance(nodes[(1,)], XfcpSwitchNode)
+        assert isinstance(nodes[(1, 1)], XfcpMemoryNode)
+        assert count == 1
+
+        # changed design (different root ID): cache entry not used
+        root = build_tree("XFCP Switch 2")
+        root.ports[2] = XfcpMemoryModel(id_str="New Master")
+        nodes, count = await enumerate_tree(root, cache)
+        assert nodes[()].id.str == "XFCP Switch 2"
+        assert nodes[(2,)].id.str == "New Master"
+        assert count > 1
+
+        # both designs are now cached
+        nodes, count = await enumerate_tree(build_tree(), cache)
+        assert (2,) not in nodes
+        assert count == 1
+
+    asyncio.run(run())
+
+
+def test_xfcp_client_wide_word():
+    # scalar reads on a module with 32-bit words still read one word
+    async def run(client, server):
+        node = await client.open_node([0])
+        assert node.word_bytes == 4
+
+        await node.write(0x10, bytes.fromhex('0123456789abcdef'))
+        assert await node.read_word(0x10) == 0x2301
+        assert await node.read_dword(0x10) == 0x67452301
+        assert await node.read_qword(0x10) == 0xefcdab8967452301
+
+        with pytest.raises(ValueError, match=r"multiple of the word size \(4 bytes\)"):
+            await node.write(0x10, bytes(2))
+
+    root = XfcpSwitchModel([XfcpMemoryModel(word_size=32)])
+    asyncio.run(run_with_server(root, run))
+
+
+def test_xfcp_client_udp_loss():
+    # lost requests are retransmitted, duplicate responses are counted as
+    # strays and otherwise ignored
+    async def run(client, server):
+        node = await client.open_node([3, 0])
+        assert node.id.str == "AXI Master"
+        node.chunk_size = 256
+        data = bytes((k*7) % 256 for k in range(8192))
+
+        await node.write(0x100, data, window=8)
+        assert await node.read(0x100, len(data), window=8) == data
+
+        for k in range(64):
+            await node.write_dword(k*4, k*0x01010101)
+        for k in range(64):
+            assert await node.read_dword(k*4) == k*0x01010101
+
+        assert server.dup_count > 0
+        assert client.timeout_count == 0
+
+        # every dropped request was sent again
+        assert client.retransmit_count >= server.drop_count > 0
+
+        # every duplicate is a stray; retransmits can add late ones
+        assert server.dup_count <= client.stray_count <= server.dup_count + client.retransmit_count
+
+    asyncio.run(run_with_server(build_tree(), run, retries=8, loss=0.1, duplicate=0.1, seed=1))
@@ -0,0 +1 @@
+../xfcp.py
\ No newline at end of file
@@ -0,0 +1 @@
+../xfcp_client.py
\ No newline at end of file
@@ -0,0 +1 @@
+../xfcp_model.py
\ No newline at end of file
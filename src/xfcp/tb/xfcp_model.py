@@ -0,0 +1,216 @@
+# SPDX-License-Identifier: MIT
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import struct
+import time
+
+from xfcp import XfcpFrame
+from xfcp_client import READ_REQ, READ_RESP, WRITE_REQ, WRITE_RESP, ID_REQ, ID_RESP
+from xfcp_client import XfcpClient, XfcpMemoryNode, open_udp
+
+
+class XfcpModuleModel:
+    """In-process model of an XFCP module
+
+    handle() takes a request frame addressed to this module (path already
+    consumed) and returns a list of response frames.
+    """
+
+    def __init__(self, id_type=0, id_str="", id_data=b''):
+        self.id_type = id_type
+        self.id_str = id_str
+        self.id_data = bytes(id_data)
+
+    def build_id(self):
+        data = bytearray(32)
+        struct.pack_into('<H', data, 0, self.id_type)
+        data[2:2+len(self.id_data)] = self.id_data
+        s = self.id_str.encode('ascii')[:16]
+        data[16:16+len(s)] = s
+        return bytes(data)
+
+    def handle(self, frame):
+        if frame.path:
+            return []
+        if frame.ptype == ID_REQ:
+            return [XfcpFrame(self.build_id(), [], list(frame.rpath), ID_RESP)]
+        return self.handle_request(frame)
+
+    def handle_request(self, frame):
+        return []
+
+
+class XfcpSwitchModel(XfcpModuleModel):
+    """Model of taxi_xfcp_switch
+
+    ports is a list of downstream module models (None for an unconnected
+    port).  Requests are routed on the first path byte, and the port is
+    prepended to the path of responses, as in the RTL.
+    """
+
+    def __init__(self, ports, id_str="XFCP Switch"):
+        self.ports = list(ports)
+        super().__init__(0x0100, id_str, bytes([1, len(self.ports)]))
+
+    def handle(self, frame):
+        if not frame.path:
+            return super().handle(frame)
+
+        port = frame.path[0]
+        if port >= len(self.ports) or self.ports[port] is None:
+            return []
+
+        resps = self.ports[port].handle(XfcpFrame(frame.payload, frame.path[1:], list(frame.rpath), frame.ptype))
+        for resp in resps:
+            resp.path = [port] + resp.path
+        return resps
+
+
+class XfcpMemoryModel(XfcpModuleModel):
+    """Model of taxi_xfcp_mod_axil (or _axi/_apb) with a RAM behind it"""
+
+    def __init__(self, size=2**16, addr_width=32, data_width=32, word_size=8, count_size=16,
+            id_type=0x8001, id_str="AXIL Master"):
+        super().__init__(0x8000 | id_type, id_str,
+            struct.pack('<4H', addr_width, data_width, word_size, count_size))
+        self.mem = bytearray(size)
+        self.word_bytes = max(1, (word_size+7)//8)
+        self.addr_bytes = (addr_width+(self.word_bytes-1).bit_length()+7)//8
+        self.count_bytes = (count_size+7)//8
+
+    def handle_request(self, frame):
+        hdr_len = self.addr_bytes+self.count_bytes
+        if frame.ptype not in {READ_REQ, WRITE_REQ} or len(frame.payload) < hdr_len:
+            return []
+
+        hdr = frame.payload[:hdr_len]
+        addr = int.from_bytes(hdr[:self.addr_bytes], 'little') % len(self.mem)
+        count = int.from_bytes(hdr[self.addr_bytes:], 'little')*self.word_bytes
+
+        if addr+count > len(self.mem):
+            return []
+
+        if frame.ptype == READ_REQ:
+            return [XfcpFrame(hdr+self.mem[addr:addr+count], [], list(frame.rpath), READ_RESP)]
+
+        data = frame.payload[hdr_len:hdr_len+count]
+        self.mem[addr:addr+len(data)] = data
+        return [XfcpFrame(hdr, [], list(frame.rpath), WRITE_RESP)]
+
+
+class XfcpUdpServer(asyncio.DatagramProtocol):
+    """Local UDP stand-in for an XFCP device
+
+    Answers each request datagram from the in-process model root.  loss
+    drops that fraction of requests, to exercise client retransmission,
+    and duplicate sends that fraction of responses twice, to exercise
+    stray response handling.  seed makes the choices repeatable.
+    """
+
+    def __init__(self, root, loss=0.0, duplicate=0.0, seed=None):
+        self.root = root
+        self.loss = loss
+        self.duplicate = duplicate
+        self.rng = random.Random(seed)
+        self.transport = None
+        self.rx_count = 0
+        self.drop_count = 0
+        self.dup_count = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.rx_count += 1
+        if self.loss and self.rng.random() < self.loss:
+            self.drop_count += 1
+            return
+        try:
+            frame = XfcpFrame.parse(data)
+        except (AssertionError, IndexError):
+            self.drop_count += 1
+            return
+        for resp in self.root.handle(frame):
+            self.transport.sendto(resp.build(), addr)
+            if self.duplicate and self.rng.random() < self.duplicate:
+                self.dup_count += 1
+                self.transport.sendto(resp.build(), addr)
+
+
+async def start_udp_server(root, host='127.0.0.1', port=0, **kwargs):
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(lambda: XfcpUdpServer(root, **kwargs),
+        local_addr=(host, port))
+    return server
+
+
+async def benchmark(count=10000, size=65536, window=16, loss=0.0):
+    root = XfcpSwitchModel([XfcpMemoryModel(), None, XfcpMemoryModel(id_str="APB Master"), None])
+    server = await start_udp_server(root, loss=loss)
+    host, port = server.transport.get_extra_info('sockname')[:2]
+
+    async with XfcpClient(await open_udp(host, port), timeout=0.05, retries=10) as client:
+        nodes = await client.enumerate(timeout=0.05)
+        for path, node in nodes.items():
+            print(f"{list(path)}: {node.id.str}")
+
+        node = next(n for n in nodes.values() if isinstance(n, XfcpMemoryNode))
+
+        # sequential single requests
+        lat = []
+        for k in range(count):
+            t = time.perf_counter()
+            await node.read_dword((k*4) % 4096)
+            lat.append(time.perf_counter()-t)
+        lat.sort()
+        print(f"Read latency: p50 {lat[len(lat)//2]*1e6:.1f} us, p99 {lat[len(lat)*99//100]*1e6:.1f} us, max {lat[-1]*1e6:.1f} us")
+
+        # concurrent single requests
+        t = time.perf_counter()
+        await asyncio.gather(*[node.read_dword((k*4) % 4096) for k in range(count)])
+        t = time.perf_counter()-t
+        print(f"Concurrent reads: {count/t:.0f} requests/s")
+
+        # bulk transfers
+        data = random.randbytes(size)
+        for w in sorted({1, window}):
+            t = time.perf_counter()
+            await node.write(0, data, window=w)
+            t1 = time.perf_counter()
+            assert await node.read(0, size, window=w) == data
+            t2 = time.perf_counter()
+            print(f"Bulk window {w}: write {size/(t1-t)/1e6:.2f} MB/s, read {size/(t2-t1)/1e6:.2f} MB/s")
+
+        print(f"Requests: {client.request_count}, retransmits: {client.retransmit_count}, "
+            f"timeouts: {client.timeout_count}, stray responses: {client.stray_count}")
+
+    server.transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XFCP UDP client benchmark against a local stand-in server")
+    parser.add_argument('-n', '--count', type=int, default=10000, help="Single request count")
+    parser.add_argument('-s', '--size', type=int, default=65536, help="Bulk transfer size")
+    parser.add_argument('-w', '--window', type=int, default=16, help="Bulk transfer window")
+    parser.add_argument('-l', '--loss', type=float, default=0.0, help="Request loss rate")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    asyncio.run(benchmark(args.count, args.size, args.window, args.loss))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: CERN-OHL-S-2.0
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _prep(data, offset):
+    # zero bytes before offset (keeping 16-bit word alignment relative to
+    # the start of the packet) and pad to an even length
+    data = bytes(data)
+    if offset:
+        data = bytes(min(offset, len(data))) + data[offset:]
+    if len(data) & 1:
+        data += b'\x00'
+    return data
+
+
+def ones_sum(data, offset=0):
+    """Ones-complement sum of big-endian 16-bit words
+
+    Matches the checksum output of zircon_ip_len_cksum with START_OFFSET
+    set to offset: bytes before offset are skipped, words are aligned to
+    the start of data, and an odd final byte is padded with zero.
+    """
+    data = _prep(data, offset)
+    # 2**16 == 1 mod 0xffff, so the sum of the words mod 0xffff is the
+    # value of the whole buffer mod 0xffff
+    r = int.from_bytes(data, 'big') % 0xffff
+    if r:
+        return r
+    return 0xffff if any(data) else 0
+
+
+def checksum(data, offset=0):
+    # Internet checksum (complement of the ones-complement sum)
+    return ~ones_sum(data, offset) & 0xffff
+
+
+def ones_sum_batch(pkts, offset=0):
+    """ones_sum() over a list of packets, returns a list of sums
+
+    With NumPy, the packets are packed into one buffer, viewed as
+    big-endian uint16, and summed per packet with a single reduceat;
+    the few words before offset are then subtracted.
+    """
+    if np is None:
+        return [ones_sum(p, offset) for p in pkts]
+
+    if not pkts:
+        return []
+
+    pkts = [bytes(p) for p in pkts]
+    counts = np.array([(len(p)+1)//2 for p in pkts], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    buf = b''.join([p+b'\x00' if len(p) & 1 else p for p in pkts])
+    words = np.frombuffer(buf, dtype='>u2')
+
+    nonempty = counts > 0
+    totals = np.zeros(len(pkts), dtype=np.uint64)
+    if words.size:
+        totals[nonempty] = np.add.reduceat(words, starts[nonempty], dtype=np.uint64)
+
+    if offset and words.size:
+        # subtract the words (or high byte) before offset in each packet
+        idx = starts[:, None] + np.arange((offset+1)//2)
+        valid = idx < (starts+counts)[:, None]
+        pre = words[np.where(valid, idx, 0)].astype(np.uint64) * valid
+        if offset & 1:
+            pre[:, -1] &= np.uint64(0xff00)
+        totals -= pre.sum(axis=1, dtype=np.uint64)
+
+    # end-around carry fold: zero only if all words are zero
+    sums = np.where(totals == 0, 0, (totals-1) % 0xffff + 1)
+    return sums.astype(np.uint16).tolist()
+
+
+def len_cksum_batch(pkts, start_offset=14):
+    # expected (length, checksum) metadata from zircon_ip_len_cksum
+    return list(zip([len(p) for p in pkts], ones_sum_batch(pkts, start_offset)))
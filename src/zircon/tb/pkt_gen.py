@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: CERN-OHL-S-2.0
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+import ipaddress
+import random
+import struct
+
+from scapy.packet import NoPayload
+from scapy.layers.l2 import Ether, Dot1Q, Dot1AD, ARP
+from scapy.layers.inet import IP, ICMP, UDP, TCP
+from scapy.layers.inet import IPOption_MTU_Probe
+from scapy.layers.inet6 import IPv6, ICMPv6ND_NS, _ICMPv6
+from scapy.layers.inet6 import IPv6ExtHdrFragment, IPv6ExtHdrHopByHop, RouterAlert
+
+from ip_cksum import ones_sum
+
+
+def _pack_mac(mac):
+    if isinstance(mac, (bytes, bytearray)):
+        return bytes(mac)
+    return bytes.fromhex(mac.replace(':', ''))
+
+
+def _pack_ip(ip):
+    if isinstance(ip, (bytes, bytearray)):
+        return bytes(ip)
+    if not isinstance(ip, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+        ip = ipaddress.ip_address(ip)
+    return ip.packed
+
+
+class PacketTemplate:
+    """Pre-built packet header with known field offsets
+
+    pkt is a scapy header stack (without payload), built once.  build()
+    copies the header bytes, patches addresses, ports, IDs, lengths and
+    checksums in place, and appends the payload, giving the same bytes as
+    building the equivalent scapy packet.  has_payload marks templates
+    that normally carry a payload (not ARP, IP with no next header, etc.).
+    """
+
+    def __init__(self, pkt, has_payload=True, name=None):
+        self.pkt = pkt
+        self.has_payload = has_payload
+        self.name = name or pkt.summary()
+        self.header = bytes(pkt)
+
+        def offset(cls):
+            # offset of the first layer that is an instance of cls
+            layer = pkt
+            while not isinstance(layer, NoPayload):
+                if isinstance(layer, cls):
+                    return len(self.header) - len(bytes(layer))
+                layer = layer.payload
+            return None
+
+        self.ip_off = offset(IP)
+        self.ip6_off = offset(IPv6)
+
+        self.ip_hlen = (self.header[self.ip_off] & 0xf)*4 if self.ip_off is not None else 0
+
+        self.l4_off = None
+        self.l4_proto = None
+        for cls, proto in [(TCP, 6), (UDP, 17), (ICMP, 1), (_ICMPv6, 58)]:
+            self.l4_off = offset(cls)
+            if self.l4_off is not None:
+                self.l4_proto = proto
+                break
+
+        self.ip_version = 4 if self.ip_off is not None else 6 if self.ip6_off is not None else None
+
+    def build(self, payload=b'', eth_src=None, eth_dst=None, ip_src=None, ip_dst=None,
+            sport=None, dport=None, ip_id=None):
+        pkt = bytearray(self.header)
+        pkt += payload
+
+        if eth_dst is not None:
+            pkt[0:6] = _pack_mac(eth_dst)
+        if eth_src is not None:
+            pkt[6:12] = _pack_mac(eth_src)
+
+        if self.ip_off is not None:
+            o = self.ip_off
+            if ip_src is not None:
+                pkt[o+12:o+16] = _pack_ip(ip_src)
+            if ip_dst is not None:
+                pkt[o+16:o+20] = _pack_ip(ip_dst)
+            if ip_id is not None:
+                struct.pack_into('>H', pkt, o+4, ip_id & 0xffff)
+            struct.pack_into('>H', pkt, o+2, len(pkt)-o)
+            struct.pack_into('>H', pkt, o+10, 0)
+            struct.pack_into('>H', pkt, o+10, ~ones_sum(pkt[o:o+self.ip_hlen]) & 0xffff)
+            pseudo = pkt[o+12:o+20]
+
+        if self.ip6_off is not None:
+            o = self.ip6_off
+            if ip_src is not None:
+                pkt[o+8:o+24] = _pack_ip(ip_src)
+            if ip_dst is not None:
+                pkt[o+24:o+40] = _pack_ip(ip_dst)
+            if ip_id is not None:
+                # flow label
+                w = struct.unpack_from('>L', pkt, o)[0]
+                struct.pack_into('>L', pkt, o, (w & 0xfff00000) | (ip_id & 0xfffff))
+            struct.pack_into('>H', pkt, o+4, len(pkt)-o-40)
+            pseudo = pkt[o+8:o+40]
+
+        if self.l4_off is not None:
+            o = self.l4_off
+            l4_len = len(pkt)-o
+
+            if self.l4_proto == 6:
+                csum_off = o+16
+            elif self.l4_proto == 17:
+                csum_off = o+6
+                struct.pack_into('>H', pkt, o+4, l4_len)
+            else:
+                csum_off = o+2
+
+            if self.l4_proto in (6, 17):
+                if sport is not None:
+                    struct.pack_into('>H', pkt, o, sport)
+                if dport is not None:
+                    struct.pack_into('>H', pkt, o+2, dport)
+
+            struct.pack_into('>H', pkt, csum_off, 0)
+
+            if self.l4_proto == 1:
+                s = ones_sum(pkt[o:])
+            elif self.ip_version == 4:
+                s = ones_sum(pseudo + struct.pack('>xBH', self.l4_proto, l4_len) + pkt[o:])
+            else:
+                s = ones_sum(pseudo + struct.pack('>L3xB', l4_len, self.l4_proto) + pkt[o:])
+
+            csum = ~s & 0xffff
+            if csum == 0 and self.l4_proto == 17:
+                csum = 0xffff
+            struct.pack_into('>H', pkt, csum_off, csum)
+
+        return bytes(pkt)
+
+
+def l2_headers():
+    # L2 header variants used by the zircon testbenches
+    hdrs = []
+
+    # Ethernet
+    hdrs.append(Ether(src='5A:51:52:53:54:55', dst='DA:D1:D2:D3:D4:D5'))
+
+    # Ethernet with 802.1Q VLAN
+    hdrs.append(Ether(src='5A:51:52:53:54:55', dst='DA:D1:D2:D3:D4:D5') / Dot1Q(vlan=123))
+
+    # Ethernet with 802.1Q QinQ
+    hdrs.append(Ether(src='5A:51:52:53:54:55', dst='DA:D1:D2:D3:D4:D5') / Dot1AD(vlan=456))
+
+    # Ethernet with 802.1Q QinQ and VLAN
+    hdrs.append(Ether(src='5A:51:52:53:54:55', dst='DA:D1:D2:D3:D4:D5') / Dot1AD(vlan=456) / Dot1Q(vlan=123))
+
+    return hdrs
+
+
+def l3_headers():
+    # L3 header variants used by the zircon testbenches
+    hdrs = []
+
+    # IPv4
+    hdrs.append(IP(src='10.1.0.1', dst='10.2.0.1'))
+
+    # IPv4 (fragmented)
+    hdrs.append(IP(src='10.1.0.1', dst='10.2.0.1', flags=1))
+
+    # IPv4 with options
+    hdrs.append(IP(src='10.1.0.1', dst='10.2.0.1', options=[IPOption_MTU_Probe()]))
+
+    # IPv6
+    hdrs.append(IPv6(src='fd12:3456:789a:1::1', dst='fd12:3456:789a:2::1'))
+
+    # IPv6 with extensions (fragmented)
+    hdrs.append(IPv6(src='fd12:3456:789a:1::1', dst='fd12:3456:789a:2::1') / IPv6ExtHdrFragment())
+
+    # IPv6 with extensions
+    hdrs.append(IPv6(src='fd12:3456:789a:1::1', dst='fd12:3456:789a:2::1') / IPv6ExtHdrHopByHop(options=[RouterAlert()]))
+
+    # IPv6 with extensions 2
+    hdrs.append(IPv6(src='fd12:3456:789a:1::1', dst='fd12:3456:789a:2::1') /
+        IPv6ExtHdrHopByHop(options=[RouterAlert(), RouterAlert(), RouterAlert(), RouterAlert()]))
+
+    return hdrs
+
+
+def default_templates():
+    """Every L2/L3/L4 combination exercised by the zircon testbenches"""
+    templates = []
+
+    for l2hdr in l2_headers():
+
+        # Raw ethernet
+        templates.append(PacketTemplate(l2hdr.copy()))
+
+        # ARP
+        arp = ARP(hwtype=1, ptype=0x0800, hwlen=6, plen=4, op=2,
+            hwsrc='5A:51:52:53:54:55', psrc='192.168.1.100',
+            hwdst='DA:D1:D2:D3:D4:D5', pdst='192.168.1.101')
+        templates.append(PacketTemplate(l2hdr / arp, has_payload=False))
+
+        for l3hdr in l3_headers():
+
+            # IP (empty) and IP (unsupported protocol)
+            if IP in l3hdr:
+                hdr = l3hdr.copy()
+                hdr.proto = 59
+                templates.append(PacketTemplate(l2hdr / hdr, has_payload=False))
+                templates.append(PacketTemplate(l2hdr / hdr))
+            else:
+                templates.append(PacketTemplate(l2hdr / l3hdr, has_payload=False))
+                templates.append(PacketTemplate(l2hdr / l3hdr))
+
+            if IP in l3hdr:
+                # ICMP
+                templates.append(PacketTemplate(l2hdr / l3hdr / ICMP(type=8)))
+
+            if IPv6 in l3hdr:
+                # ICMPv6 / NDP
+                templates.append(PacketTemplate(l2hdr / l3hdr / ICMPv6ND_NS(tgt='::'), has_payload=False))
+
+            # UDP (empty) and UDP
+            udp = UDP(sport=0, dport=0x1000)
+            templates.append(PacketTemplate(l2hdr / l3hdr / udp, has_payload=False))
+            templates.append(PacketTemplate(l2hdr / l3hdr / udp))
+
+            # TCP and TCP with options (empty and with payload)
+            for opts in [[], [('Timestamp', (0, 0))]]:
+                tcp = TCP(sport=0, dport=0x1000, seq=54321, ack=12345, window=8192, options=opts)
+                templates.append(PacketTemplate(l2hdr / l3hdr / tcp, has_payload=False))
+                templates.append(PacketTemplate(l2hdr / l3hdr / tcp))
+
+    return templates
+
+
+class PacketGenerator:
+    """Bulk packet generator built on PacketTemplate
+
+    combinations() builds every template once with a fixed payload, and
+    packets() builds randomized variants (random template, addresses,
+    ports, IDs and payload length between min_payload and max_payload).
+    """
+
+    def __init__(self, templates=None, seed=None, min_payload=0, max_payload=256):
+        self.templates = default_templates() if templates is None else list(templates)
+        self.rng = random.Random(seed)
+        self.min_payload = min_payload
+        self.max_payload = max_payload
+
+    def combinations(self, payload=bytes(range(64))):
+        return [t.build(payload if t.has_payload else b'', ip_id=k, sport=k, dport=0x1000+k)
+            for k, t in enumerate(self.templates)]
+
+    def packets(self, count):
+        rng = self.rng
+        templates = self.templates
+        pkts = []
+
+        for k in range(count):
+            t = rng.choice(templates)
+
+            if t.has_payload:
+                payload = rng.randbytes(rng.randint(self.min_payload, self.max_payload))
+            else:
+                payload = b''
+
+            addr_len = 16 if t.ip_version == 6 else 4
+
+            pkts.append(t.build(payload,
+                ip_src=rng.randbytes(addr_len), ip_dst=rng.randbytes(addr_len),
+                sport=rng.getrandbits(16), dport=rng.getrandbits(16),
+                ip_id=rng.getrandbits(20)))
+
+        return pkts
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: CERN-OHL-S-2.0
+"""
+
+Copyright (c) 2025 FPGA Ninja, LLC
+
+Authors:
+- Alex Forencich
+
+"""
+
+import ipaddress
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# default RSS key from the Microsoft RSS specification
+DEFAULT_KEY = bytes([
+    0x6d, 0x5a, 0x56, 0xda, 0x25, 0x5b, 0x0e, 0xc2,
+    0x41, 0x67, 0x25, 0x3d, 0x43, 0xa3, 0x8f, 0xb0,
+    0xd0, 0xca, 0x2b, 0xcb, 0xae, 0x7b, 0x30, 0xb4,
+    0x77, 0xcb, 0x2d, 0xa3, 0x80, 0x30, 0xf2, 0x0c,
+    0x6a, 0x42, 0xb7, 0x3b, 0xbe, 0xac, 0x01, 0xfa
+])
+
+
+def _ip_packed(ip):
+    if isinstance(ip, (bytes, bytearray)):
+        return bytes(ip)
+    if not isinstance(ip, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+        ip = ipaddress.ip_address(ip)
+    return ip.packed
+
+
+def tuple_pack(src_ip, dest_ip, src_port=None, dest_port=None):
+    data = _ip_packed(src_ip) + _ip_packed(dest_ip)
+    if src_port is not None and dest_port is not None:
+        data += src_port.to_bytes(2, 'big') + dest_port.to_bytes(2, 'big')
+    return data
+
+
+class ToeplitzHash:
+    """Toeplitz (RSS) hash reference
+
+    The hash of each input byte depends only on its value and position, so
+    the key is expanded into one 256-entry table of 32-bit values per byte
+    position (len(key)-4 positions) and the hash of a tuple is the XOR of
+    one lookup per byte.  hash_batch() hashes many tuples at once, using
+    NumPy when it is available.
+    """
+
+    def __init__(self, key=DEFAULT_KEY):
+        self.key = bytes(key)
+        self.max_len = len(self.key)-4
+
+        key = int.from_bytes(self.key, 'big')
+        k = len(self.key)*8-32
+
+        self.tables = []
+        for i in range(self.max_len):
+            # hash of each bit of this byte position, MSB first
+            bits = [(key >> (k-i*8-j)) & 0xffffffff for j in range(8)]
+            t = [0]*256
+            for v in range(1, 256):
+                low = v & -v
+                t[v] = t[v ^ low] ^ bits[7-(low.bit_length()-1)]
+            self.tables.append(t)
+
+        self._np_tables = None
+
+    def hash(self, data):
+        if len(data) > self.max_len:
+            raise ValueError(f"Input longer than {self.max_len} bytes")
+        h = 0
+        for t, b in zip(self.tables, data):
+            h ^= t[b]
+        return h
+
+    __call__ = hash
+
+    def hash_batch(self, data):
+        # hash a list of byte strings, returns a list of hashes
+        data = [bytes(d) for d in data]
+
+        if np is None:
+            return [self.hash(d) for d in data]
+
+        if self._np_tables is None:
+            self._np_tables = np.array(self.tables, dtype=np.uint32)
+
+        # group by length so each group is one 2D array
+        groups = {}
+        for k, d in enumerate(data):
+            groups.setdefault(len(d), []).append(k)
+
+        out = [0]*len(data)
+        for length, idx in groups.items():
+            if length > self.max_len:
+                raise ValueError(f"Input longer than {self.max_len} bytes")
+            if length == 0:
+                continue
+            arr = np.frombuffer(b''.join(data[k] for k in idx), dtype=np.uint8).reshape(-1, length)
+            h = np.bitwise_xor.reduce(self._np_tables[np.arange(length), arr], axis=1)
+            for k, v in zip(idx, h.tolist()):
+                out[k] = v
+        return out
+
+    def hash_tuples(self, tuples):
+        # hash a list of (src_ip, dest_ip[, src_port, dest_port]) tuples
+        return self.hash_batch([tuple_pack(*t) for t in tuples])
@@ -0,0 +1 @@
+../pkt_gen.py
\ No newline at end of file
@@ -12,15 +12,11 @@ Authors:
 import logging
 import os
 import struct
+import sys
 
 import scapy.config
-import scapy.utils
-import scapy.pton_ntop
-from scapy.layers.l2 import Ether, Dot1Q, Dot1AD, ARP
-from scapy.layers.inet import IP, ICMP, UDP, TCP
-from scapy.layers.inet import IPOption_MTU_Probe
-from scapy.layers.inet6 import IPv6, ICMPv6ND_NS
-from scapy.layers.inet6 import IPv6ExtHdrFragment, IPv6ExtHdrHopByHop, RouterAlert
+from scapy.layers.l2 import Ether
+from scapy.layers.inet import UDP, TCP
 
 import cocotb_test.simulator
 
@@ -31,6 +27,18 @@ from cocotb.regression import TestFactory
 
 from cocotbext.axi import AxiStreamBus, AxiStreamSource, AxiStreamSink, AxiStreamFrame
 
+try:
+    from ip_cksum import len_cksum_batch
+    from pkt_gen import PacketGenerator
+except ImportError:
+    # attempt import from current directory
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+    try:
+        from ip_cksum import len_cksum_batch
+        from pkt_gen import PacketGenerator
+    finally:
+        del sys.path[0]
+
 
 # don't hide ports
 scapy.config.conf.noenum.add(TCP.sport, TCP.dport)
@@ -62,149 +70,23 @@ class TB:
         await RisingEdge(self.dut.clk)
 
 
-async def run_test(dut):
+async def run_test(dut, random_count=1024, seed=1):
 
     tb = TB(dut)
 
     await tb.reset()
 
-    test_pkts = []
-
-    payload = bytearray(range(64))
-
-    ip_id = 0
-
-    l2hdrs = []
-
-    # Ethernet
-    eth = Ether(src='5A:51:52:53:54:55', dst='DA:D1:D2:D3:D4:D5')
-    l2hdrs.append(eth)
-
-    # Ethernet with 802.1Q VLAN
-    eth = Ether(src='5A:51:52:53:54:55', dst='DA:D1:D2:D3:D4:D5')
-    vlan = Dot1Q(vlan=123)
-    l2hdrs.append(eth / vlan)
-
-    # Ethernet with 802.1Q QinQ
-    eth = Ether(src='5A:51:52:53:54:55', dst='DA:D1:D2:D3:D4:D5')
-    vlan = Dot1AD(vlan=456)
-    l2hdrs.append(eth / vlan)
-
-    # Ethernet with 802.1Q QinQ and VLAN
-    eth = Ether(src='5A:51:52:53:54:55', dst='DA:D1:D2:D3:D4:D5')
-    vlan = Dot1AD(vlan=456) / Dot1Q(vlan=123)
-    l2hdrs.append(eth / vlan)
-
-    for l2hdr in l2hdrs:
-
-        # Raw ethernet
-        test_pkts.append(l2hdr / payload)
-
-        # ARP
-        arp = ARP(hwtype=1, ptype=0x0800, hwlen=6, plen=4, op=2,
-            hwsrc='5A:51:52:53:54:55', psrc='192.168.1.100',
-            hwdst='DA:D1:D2:D3:D4:D5', pdst='192.168.1.101')
-        test_pkts.append(l2hdr / arp)
-
-        l3hdrs = []
-
-        # IPv4
-        ip = IP(src='10.1.0.1', dst='10.2.0.1', id=ip_id)
-        l3hdrs.append(ip)
-
-        # IPv4 (fragmented)
-        ip = IP(src='10.1.0.1', dst='10.2.0.1', flags=1, id=ip_id)
-        l3hdrs.append(ip)
-
-        # IPv4 with options
-        ip = IP(src='10.1.0.1', dst='10.2.0.1', id=ip_id, options=[IPOption_MTU_Probe()])
-        l3hdrs.append(ip)
-
-        # IPv6
-        ip6 = IPv6(src='fd12:3456:789a:1::1', dst='fd12:3456:789a:2::1', fl=ip_id)
-        l3hdrs.append(ip6)
-
-        # IPv6 with extensions (fragmented)
-        ip6 = IPv6(src='fd12:3456:789a:1::1', dst='fd12:3456:789a:2::1', fl=ip_id)
-        frag = IPv6ExtHdrFragment()
-        l3hdrs.append(ip6 / frag)
-
-        # IPv6 with extensions
-        ip6 = IPv6(src='fd12:3456:789a:1::1', dst='fd12:3456:789a:2::1', fl=ip_id)
-        hbh = IPv6ExtHdrHopByHop(options=[RouterAlert()])
-        l3hdrs.append(ip6 / hbh)
-
-        # IPv6 with extensions 2
-        ip6 = IPv6(src='fd12:3456:789a:1::1', dst='fd12:3456:789a:2::1', fl=ip_id)
-        hbh = IPv6ExtHdrHopByHop(options=[RouterAlert(), RouterAlert(), RouterAlert(), RouterAlert()])
-        l3hdrs.append(ip6 / hbh)
-
-        for l3hdr in l3hdrs:
-
-            l3hdr = l3hdr.copy()
-            if IP in l3hdr:
-                l3hdr.id = ip_id
-            if IPv6 in l3hdr:
-                l3hdr.fl = ip_id
-
-            # IP (empty)
-            if IP in l3hdr:
-                hdr = l3hdr.copy()
-                hdr.proto = 59
-                test_pkts.append(l2hdr / hdr)
-            else:
-                test_pkts.append(l2hdr / l3hdr)
-
-            # IP (unsupported protocol)
-            if IP in l3hdr:
-                hdr = l3hdr.copy()
-                hdr.proto = 59
-                test_pkts.append(l2hdr / hdr / payload)
-            else:
-                test_pkts.append(l2hdr / l3hdr / payload)
-
-            if IP in l3hdr:
-                # ICMP
-                icmp = ICMP(type=8)
-                test_pkts.append(l2hdr / l3hdr / icmp / payload)
-
-            if IPv6 in l3hdr:
-                # ICMPv6 / NDP
-                ns = ICMPv6ND_NS(tgt='::')
-                test_pkts.append(l2hdr / l3hdr / ns)
-
-            # UDP (empty)
-            udp = UDP(sport=ip_id, dport=0x1000+ip_id)
-            test_pkts.append(l2hdr / l3hdr / udp)
-
-            # UDP
-            udp = UDP(sport=ip_id, dport=0x1000+ip_id)
-            test_pkts.append(l2hdr / l3hdr / udp / payload)
-
-            # TCP (empty)
-            tcp = TCP(sport=ip_id, dport=0x1000+ip_id, seq=54321, ack=12345, window=8192)
-            test_pkts.append(l2hdr / l3hdr / tcp)
-
-            # TCP with options (empty)
-            tcp = TCP(sport=ip_id, dport=0x1000+ip_id, seq=54321, ack=12345, window=8192, options=[('Timestamp',(0,0))])
-            test_pkts.append(l2hdr / l3hdr / tcp)
-
-            # TCP
-            tcp = TCP(sport=ip_id, dport=0x1000+ip_id, seq=54321, ack=12345, window=8192)
-            test_pkts.append(l2hdr / l3hdr / tcp / payload)
+    # every L2/L3/L4 combination, then randomized variants
+    gen = PacketGenerator(seed=seed)
 
-            # TCP with options
-            tcp = TCP(sport=ip_id, dport=0x1000+ip_id, seq=54321, ack=12345, window=8192, options=[('Timestamp',(0,0))])
-            test_pkts.append(l2hdr / l3hdr / tcp / payload)
+    test_frames = gen.combinations()
+    test_frames += gen.packets(random_count)
 
-            ip_id += 1
-
-    for pkt in test_pkts:
-        tb.log.info("Packet: %r", pkt)
-
-        pkt_b = pkt.build()
+    ref_meta = len_cksum_batch(test_frames, 14)
 
-        rx_csum = ~scapy.utils.checksum(bytes(pkt_b[14:])) & 0xffff
+    for k, (pkt_b, (ref_len, rx_csum)) in enumerate(zip(test_frames, ref_meta)):
+        if k < len(gen.templates):
+            tb.log.info("Packet: %r", Ether(pkt_b))
 
         await tb.pkt_source.send(AxiStreamFrame(pkt_b))
 
@@ -217,7 +99,7 @@ async def run_test(dut):
         tb.log.info("Payload length: %d", pkt_len)
         tb.log.info("Packet checksum: 0x%04x", pkt_sum)
 
-        assert pkt_len == len(pkt_b)
+        assert pkt_len == ref_len
         assert pkt_sum == rx_csum
 
     await RisingEdge(dut.clk)
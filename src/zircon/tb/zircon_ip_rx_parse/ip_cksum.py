@@ -0,0 +1 @@
+../ip_cksum.py
\ No newline at end of file
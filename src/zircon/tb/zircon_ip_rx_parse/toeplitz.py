@@ -0,0 +1 @@
+../toeplitz.py
\ No newline at end of file